@@ -0,0 +1,83 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional
+
+
+class TTLCache:
+    """
+    Потокобезопасный LRU-кэш с ограничением по числу записей и времени жизни.
+    ttl <= 0 — записи не устаревают; maxsize <= 0 — кэш выключен.
+    weigh(значение) — вес записи (например, длина текста); суммарный вес
+    не больше maxweight (<= 0 — без ограничения), самые старые записи
+    вытесняются, запись тяжелее maxweight не кладётся.
+    """
+
+    def __init__(
+        self,
+        maxsize: int = 512,
+        ttl: float = 600.0,
+        maxweight: int = 0,
+        weigh: Optional[Callable[[Any], int]] = None,
+    ):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.maxweight = maxweight
+        self.weigh = weigh or (lambda value: 0)
+        self.weight = 0
+        # ключ -> (срок, значение, вес)
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                self.misses += 1
+                return None
+            expires, value, weight = item
+            if expires is not None and expires < time.monotonic():
+                del self._data[key]
+                self.weight -= weight
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: Hashable, value: Any) -> None:
+        if self.maxsize <= 0:
+            return
+        weight = self.weigh(value)
+        if 0 < self.maxweight < weight:
+            return
+        expires = time.monotonic() + self.ttl if self.ttl > 0 else None
+        with self._lock:
+            old = self._data.pop(key, None)
+            if old is not None:
+                self.weight -= old[2]
+            self._data[key] = (expires, value, weight)
+            self.weight += weight
+            while len(self._data) > self.maxsize or 0 < self.maxweight < self.weight:
+                self.weight -= self._data.popitem(last=False)[1][2]
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], Any]) -> Any:
+        value = self.get(key)
+        if value is None:
+            value = compute()
+            self.put(key, value)
+        return value
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self.weight = 0
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "hits": self.hits, "misses": self.misses, "size": len(self._data), "maxsize": self.maxsize,
+                "weight": self.weight, "maxweight": self.maxweight,
+            }
@@ -0,0 +1,179 @@
+"""
+Пакетная перегенерация корпуса: jsons/pn*.json -> TTL + XLSX.
+
+    python -m api.corpus jsons triplets --workers 8 [--store triples.sqlite]
+
+Файлы обрабатываются в пуле процессов тем же конвейером, что и API
+(generate_structural_triples -> generate_ttl / XLSX). Входы, содержимое
+которых не менялось с прошлого запуска (sha256 в манифесте выходной
+папки), пропускаются. --store дополнительно кладёт структурные тройки каждого
+файла в хранилище SQLite (core.triple_store) под именем файла; запись
+идёт из главного процесса.
+"""
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from core.triple_store import TripleStore
+from core.ttl_generator import TTL_STYLES, write_chunks
+
+from .fastjson import decode_graph
+from .main import generate_structural_triples, iter_ttl, triples_to_xlsx_bytes
+
+MANIFEST_NAME = ".corpus_manifest.json"
+FORMATS = ("ttl", "xlsx")
+
+
+def file_hash(path: Path) -> str:
+    return hashlib.sha256(path.read_bytes()).hexdigest()
+
+
+def convert_file(
+    src: str,
+    out_dir: str,
+    formats: List[str],
+    ttl_style: str = "turtle",
+    compress: bool = False,
+    with_rows: bool = False,
+) -> Dict[str, Any]:
+    """
+    Один входной файл -> <stem>.ttl / <stem>.xlsx. Ошибка не роняет весь прогон.
+    with_rows — вернуть и строки троек (для хранилища) в "rows".
+    """
+    t0 = time.perf_counter()
+    src_path = Path(src)
+    try:
+        graph = decode_graph(src_path.read_bytes())
+        structural = generate_structural_triples(graph)
+        out = Path(out_dir)
+        if "ttl" in formats:
+            name = f"{src_path.stem}.{'nt' if ttl_style == 'ntriples' else 'ttl'}{'.gz' if compress else ''}"
+            write_chunks(out / name, iter_ttl(graph, structural, style=ttl_style), compress)
+        if "xlsx" in formats:
+            (out / f"{src_path.stem}.xlsx").write_bytes(triples_to_xlsx_bytes(structural[0], graph))
+        res = {"src": src, "triples": len(structural[0]), "seconds": time.perf_counter() - t0}
+        if with_rows:
+            d = graph.doc
+            res["rows"] = [(t.subject, t.predicate, t.object, d.id, d.page, d.text) for t in structural[0]]
+        return res
+    except Exception as ex:
+        return {"src": src, "error": f"{type(ex).__name__}: {ex}", "seconds": time.perf_counter() - t0}
+
+
+def load_manifest(out_dir: Path) -> Dict[str, Any]:
+    path = out_dir / MANIFEST_NAME
+    if not path.exists():
+        return {}
+    try:
+        return json.loads(path.read_text(encoding="utf-8"))
+    except ValueError:
+        return {}
+
+
+def save_manifest(out_dir: Path, manifest: Dict[str, Any]) -> None:
+    tmp = out_dir / (MANIFEST_NAME + ".tmp")
+    tmp.write_text(json.dumps(manifest, ensure_ascii=False, indent=1, sort_keys=True), encoding="utf-8")
+    os.replace(tmp, out_dir / MANIFEST_NAME)
+
+
+def run(
+    src_dir: str,
+    out_dir: str,
+    pattern: str = "*.json",
+    formats: Optional[List[str]] = None,
+    workers: Optional[int] = None,
+    force: bool = False,
+    ttl_style: str = "turtle",
+    compress: bool = False,
+    store: Optional[str] = None,
+) -> int:
+    formats = [f for f in (formats or FORMATS) if f in FORMATS]
+    src = Path(src_dir)
+    out = Path(out_dir)
+    out.mkdir(parents=True, exist_ok=True)
+
+    # вариант вывода входит в манифест: смена стиля/сжатия — повод перегенерировать
+    variant = formats if ttl_style == "turtle" and not compress else formats + [ttl_style] + (["gz"] if compress else [])
+    if store:
+        variant = variant + [f"store:{Path(store).resolve()}"]
+    manifest = load_manifest(out)
+    inputs = sorted(src.rglob(pattern))
+    todo: List[Path] = []
+    hashes: Dict[str, str] = {}
+    for p in inputs:
+        key = str(p.relative_to(src))
+        h = hashes[key] = file_hash(p)
+        prev = manifest.get(key)
+        if not force and prev and prev.get("sha256") == h and prev.get("formats") == variant:
+            continue
+        todo.append(p)
+
+    skipped = len(inputs) - len(todo)
+    print(f"{len(inputs)} files, {len(todo)} to convert, {skipped} unchanged", flush=True)
+
+    t0 = time.perf_counter()
+    done = failed = triples = 0
+    workers = workers or os.cpu_count() or 1
+    chunksize = max(1, len(todo) // (workers * 8))
+    triple_store = TripleStore(store) if store else None
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        results = pool.map(
+            convert_file,
+            [str(p) for p in todo],
+            [str(out)] * len(todo),
+            [formats] * len(todo),
+            [ttl_style] * len(todo),
+            [compress] * len(todo),
+            [triple_store is not None] * len(todo),
+            chunksize=chunksize,
+        )
+        for p, res in zip(todo, results):
+            key = str(p.relative_to(src))
+            if "error" in res:
+                failed += 1
+                print(f"  FAIL {key}  {res['seconds'] * 1000:8.1f} ms  {res['error']}", flush=True)
+                manifest.pop(key, None)
+                continue
+            done += 1
+            triples += res["triples"]
+            if triple_store is not None:
+                triple_store.load_rows(res.pop("rows"), source=key)
+            manifest[key] = {"sha256": hashes[key], "formats": variant}
+            print(f"  ok   {key}  {res['seconds'] * 1000:8.1f} ms  {res['triples']} triples", flush=True)
+
+    if triple_store is not None:
+        triple_store.close()
+    save_manifest(out, manifest)
+    wall = time.perf_counter() - t0
+    rate = done / wall if wall > 0 else 0.0
+    print(
+        f"converted {done}, failed {failed}, skipped {skipped} in {wall:.2f}s "
+        f"({rate:.1f} files/s, {triples} triples, {workers} workers)"
+    )
+    return 1 if failed else 0
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description="Конвертация каталога графов редактора в TTL/XLSX.")
+    ap.add_argument("src", nargs="?", default="jsons", help="каталог с графами (по умолчанию jsons)")
+    ap.add_argument("out", nargs="?", default="triplets", help="куда писать результаты (по умолчанию triplets)")
+    ap.add_argument("--pattern", default="*.json", help="маска входных файлов (рекурсивно)")
+    ap.add_argument("--formats", nargs="+", choices=FORMATS, default=list(FORMATS))
+    ap.add_argument("--workers", type=int, default=None, help="число процессов (по умолчанию — все ядра)")
+    ap.add_argument("--ttl-style", choices=TTL_STYLES, default="turtle",
+                    help="turtle — строка на утверждение, compact — блок на субъект, ntriples — .nt")
+    ap.add_argument("--gzip", action="store_true", help="сжимать TTL/N-Triples (.gz)")
+    ap.add_argument("--force", action="store_true", help="игнорировать манифест и конвертировать всё")
+    ap.add_argument("--store", default=None, help="файл SQLite: сохранить структурные тройки (core.triple_store)")
+    args = ap.parse_args(argv)
+    return run(args.src, args.out, args.pattern, args.formats, args.workers, args.force, args.ttl_style, args.gzip, args.store)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
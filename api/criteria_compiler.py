@@ -0,0 +1,310 @@
+"""
+Компилятор критериев: NNF-выражения рекомендаций -> битовые проверки.
+
+Каждому критерию корпуса — бит; профиль пациента — целое (маска его
+критериев). Выражение сворачивается в план из групп:
+  ("and", P, N, подгруппы): (m & P) == P, (m & N) == 0 и все подгруппы;
+  ("or",  P, N, подгруппы): m & P, (m & N) != N или одна из подгрупп;
+вложенные И в И (ИЛИ в ИЛИ) сливаются, так что проверка рекомендации —
+несколько целочисленных операций.
+
+План превращается в плоский исходный текст Python и компилируется
+(compile): по временной переменной на группу в обратном порядке обхода
+(t5 = (m & 6) == 6 and t3 and t4), без вложенных скобок, так что глубина
+логики не упирается в парсер и стек. evaluate(m) -> маска выполненных
+рекомендаций (бит r — рекомендация r).
+
+Векторный режим (evaluate_many) — numpy, если установлен: маски профилей —
+массив (n, слов) uint64, результат — bool-матрица (n, рекомендаций) за один
+вызов; без numpy — ImportError, скалярный режим работает всегда.
+
+    cs = CriteriaSet(corpus)            # [(имя, Graph), ...]
+    cs.applicable({"стабильный ПН"})    # [(имя, метод), ...]
+"""
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from .inference import eval_expr, graph_criteria
+from .main import Expr, Graph, Leaf, Node, Op
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - зависит от окружения
+    np = None
+
+# группа плана: (вид, P, N, подгруппы)
+Plan = Tuple[str, int, int, list]
+
+TRUE: Plan = ("and", 0, 0, [])
+FALSE: Plan = ("or", 0, 0, [])
+WORD = 64
+
+
+def plan_expr(expr: Optional[Expr], nodes_by_id: Dict[str, Node], bit: Callable[[str], int]) -> Plan:
+    """
+    NNF-выражение -> план; bit(критерий) — номер бита. None — условий нет.
+    Обход без рекурсии; общие поддеревья планируются один раз.
+    """
+    if expr is None:
+        return TRUE
+
+    def leaf_bit(leaf: Leaf) -> int:
+        n = nodes_by_id[leaf.crit_node_id]
+        return 1 << bit(n.label or n.id)
+
+    if isinstance(expr, Leaf):
+        return ("and", leaf_bit(expr), 0, [])
+
+    done: Dict[int, Plan] = {}
+    stack: List[Op] = [expr]
+    while stack:
+        e = stack[-1]
+        pending = [a for a in e.args if isinstance(a, Op) and id(a) not in done]
+        if pending:
+            stack.extend(pending)
+            continue
+        stack.pop()
+        if e.op == "NOT":
+            # НЕТ(a, b, ...) = не все: ИЛИ отрицаний; в NNF — только над критериями
+            if any(not isinstance(a, Leaf) for a in e.args):
+                raise ValueError(f"NOT over a group in NNF at {e.logic_node_id}")
+            neg = 0
+            for a in e.args:
+                neg |= leaf_bit(a)
+            done[id(e)] = ("or", 0, neg, [])
+            continue
+        kind = "or" if e.op == "OR" else "and"
+        pos = neg = 0
+        subs: List[Plan] = []
+        for a in e.args:
+            if isinstance(a, Leaf):
+                pos |= leaf_bit(a)
+                continue
+            sub = done[id(a)]
+            if sub[0] == kind or (not sub[3] and _popcount(sub[1]) + _popcount(sub[2]) == 1):
+                # И в И / ИЛИ в ИЛИ, одиночный литерал — в ту же группу
+                # (ИЛИ(x, НЕ x) — два литерала, не сливается)
+                pos |= sub[1]
+                neg |= sub[2]
+                subs.extend(sub[3])
+            elif not sub[1] and not sub[2] and not sub[3]:
+                # пустая группа другого вида поглощает: ИСТИНА в ИЛИ, ЛОЖЬ в И
+                kind, pos, neg, subs = sub[0], 0, 0, []
+                break
+            else:
+                subs.append(sub)
+        done[id(e)] = (kind, pos, neg, subs)
+    return done[id(expr)]
+
+
+def _popcount(x: int) -> int:
+    return bin(x).count("1")
+
+
+def plan_order(plan: Plan) -> List[Plan]:
+    """Группы плана в обратном порядке обхода (подгруппы раньше), каждая один раз."""
+    order: List[Plan] = []
+    seen = set()
+    stack = [(plan, False)]
+    while stack:
+        g, expanded = stack.pop()
+        if expanded:
+            order.append(g)
+            continue
+        if id(g) in seen:
+            continue
+        seen.add(id(g))
+        stack.append((g, True))
+        stack.extend((s, False) for s in reversed(g[3]) if id(s) not in seen)
+    return order
+
+
+def plan_source(plan: Plan, var: str = "m", first: int = 0) -> Tuple[List[str], str]:
+    """
+    План -> (присваивания Python над маской var, имя результата).
+    Временные t<first>, t<first+1>, ... — по одной на группу.
+    """
+    lines: List[str] = []
+    names: Dict[int, str] = {}
+    for g in plan_order(plan):
+        kind, pos, neg, subs = g
+        parts = []
+        if kind == "and":
+            if pos:
+                parts.append(f"({var} & {pos}) == {pos}")
+            if neg:
+                parts.append(f"not ({var} & {neg})")
+        else:
+            if pos:
+                parts.append(f"({var} & {pos}) != 0")
+            if neg:
+                parts.append(f"({var} & {neg}) != {neg}")
+        parts.extend(names[id(s)] for s in subs)
+        name = names[id(g)] = f"t{first + len(names)}"
+        lines.append(f"{name} = " + (f" {kind} ".join(parts) or ("True" if kind == "and" else "False")))
+    return lines, names[id(plan)]
+
+
+class CriteriaSet:
+    """
+    Скомпилированные критерии набора рекомендаций (граф — рекомендация).
+    Биты критериев общие для всех рекомендаций набора.
+    """
+
+    def __init__(self, graphs: Iterable[Tuple[str, Graph]]):
+        self.bits: Dict[str, int] = {}
+        self.names: List[str] = []
+        self.methods: List[List[str]] = []
+        self.plans: List[Plan] = []
+        self._exprs: List[Tuple[Optional[Expr], Dict[str, Node]]] = []
+
+        def bit(label: str) -> int:
+            b = self.bits.get(label)
+            if b is None:
+                b = self.bits[label] = len(self.bits)
+            return b
+
+        for name, graph in graphs:
+            methods, expr, nodes_by_id = graph_criteria(graph)
+            self.names.append(name)
+            self.methods.append(list(dict.fromkeys(methods)))
+            self.plans.append(plan_expr(expr, nodes_by_id, bit))
+            self._exprs.append((expr, nodes_by_id))
+
+        lines = ["def evaluate(m):", "    r = 0"]
+        temps = 0
+        for i, plan in enumerate(self.plans):
+            body, res = plan_source(plan, first=temps)
+            temps += len(body)
+            lines.extend(f"    {ln}" for ln in body)
+            lines.append(f"    if {res}:")
+            lines.append(f"        r |= {1 << i}")
+        lines.append("    return r")
+        self.source = "\n".join(lines)
+        ns: Dict[str, Any] = {}
+        exec(compile(self.source, "<criteria>", "exec"), ns)
+        self.evaluate: Callable[[int], int] = ns["evaluate"]
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    @property
+    def words(self) -> int:
+        """Слов uint64 на маску профиля."""
+        return max(1, (len(self.bits) + WORD - 1) // WORD)
+
+    # --- скалярный режим ---
+
+    def mask(self, profile: Iterable[str]) -> int:
+        """Критерии профиля -> маска (критерии вне набора не влияют)."""
+        bits = self.bits
+        m = 0
+        for c in profile:
+            b = bits.get(c)
+            if b is not None:
+                m |= 1 << b
+        return m
+
+    def satisfied(self, profile: Iterable[str]) -> List[str]:
+        r = self.evaluate(self.mask(profile))
+        return [name for i, name in enumerate(self.names) if r >> i & 1]
+
+    def applicable(self, profile: Iterable[str]) -> List[Tuple[str, str]]:
+        """(рекомендация, метод), применимые при профиле."""
+        r = self.evaluate(self.mask(profile))
+        return [(name, m) for i, name in enumerate(self.names) if r >> i & 1 for m in self.methods[i]]
+
+    def evaluate_all(self, masks: Iterable[int]) -> List[int]:
+        ev = self.evaluate
+        return [ev(m) for m in masks]
+
+    def check(self, profile: Iterable[str]) -> bool:
+        """Сверка с прямым вычислением NNF (api.inference.eval_expr)."""
+        profile = set(profile)
+        r = self.evaluate(self.mask(profile))
+        return all(bool(r >> i & 1) == eval_expr(expr, profile, nodes) for i, (expr, nodes) in enumerate(self._exprs))
+
+    # --- векторный режим (numpy) ---
+
+    def pack(self, masks: Sequence[int]) -> "np.ndarray":
+        """Маски-целые -> массив (n, words) uint64."""
+        _require_numpy()
+        out = np.zeros((len(masks), self.words), dtype=np.uint64)
+        low = (1 << WORD) - 1
+        for w in range(self.words):
+            shift = w * WORD
+            out[:, w] = [(m >> shift) & low for m in masks]
+        return out
+
+    def evaluate_many(self, packed: "np.ndarray") -> "np.ndarray":
+        """
+        Массив масок (n, words) uint64 (или (n,) при одном слове) ->
+        bool-матрица (n, рекомендаций).
+        """
+        _require_numpy()
+        packed = np.asarray(packed, dtype=np.uint64)
+        if packed.ndim == 1:
+            packed = packed[:, None]
+        if packed.shape[1] < self.words:
+            raise ValueError(f"masks have {packed.shape[1]} words, criteria need {self.words}")
+        cols = [packed[:, w] for w in range(self.words)]
+        out = np.empty((packed.shape[0], len(self.plans)), dtype=bool)
+        for i, plan in enumerate(self.plans):
+            out[:, i] = _eval_plan_np(plan, cols, packed.shape[0])
+        return out
+
+
+def _require_numpy() -> None:
+    if np is None:
+        raise ImportError("vectorized criteria evaluation needs numpy")
+
+
+def _word_masks(mask: int) -> Iterable[Tuple[int, int]]:
+    """(слово, маска слова) для ненулевых слов маски."""
+    w = 0
+    while mask:
+        part = mask & ((1 << WORD) - 1)
+        if part:
+            yield w, part
+        mask >>= WORD
+        w += 1
+
+
+def _eval_plan_np(plan: Plan, cols: List["np.ndarray"], n: int) -> "np.ndarray":
+    """
+    Bool-столбец плана: группы в обратном порядке обхода, без рекурсии;
+    столбец подгруппы освобождается после последнего родителя.
+    """
+    order = plan_order(plan)
+    uses: Dict[int, int] = {}
+    for g in order:
+        for s in g[3]:
+            uses[id(s)] = uses.get(id(s), 0) + 1
+    done: Dict[int, "np.ndarray"] = {}
+
+    def take(s: Plan) -> "np.ndarray":
+        uses[id(s)] -= 1
+        return done[id(s)] if uses[id(s)] else done.pop(id(s))
+
+    for g in order:
+        kind, pos, neg, subs = g
+        if kind == "and":
+            res = np.ones(n, dtype=bool)
+            for w, p in _word_masks(pos):
+                p = np.uint64(p)
+                res &= (cols[w] & p) == p
+            for w, q in _word_masks(neg):
+                res &= (cols[w] & np.uint64(q)) == 0
+            for s in subs:
+                res &= take(s)
+        else:
+            res = np.zeros(n, dtype=bool)
+            for w, p in _word_masks(pos):
+                res |= (cols[w] & np.uint64(p)) != 0
+            # ИЛИ по отрицаниям: хотя бы одного из критериев N нет
+            for w, q in _word_masks(neg):
+                q = np.uint64(q)
+                res |= (cols[w] & q) != q
+            for s in subs:
+                res |= take(s)
+        done[id(g)] = res
+    return done[id(plan)]
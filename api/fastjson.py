@@ -0,0 +1,150 @@
+"""
+Быстрый разбор графа редактора: JSON -> лёгкие структуры со __slots__.
+
+Декодер — orjson или msgspec, если установлены, иначе stdlib json.
+Поля раскладки (x, y, w, h, collapsed) не читаются: конвертации они не нужны.
+Структуры повторяют атрибуты api.main.Node / Link / DocInfo / Graph,
+поэтому годятся для generate_structural_triples, iter_ttl и т.д.
+Проверки типов те же, что у pydantic-моделей (строки — только строки),
+ошибка — ValueError.
+"""
+import json
+from typing import Any, Dict, List, Optional, Union
+
+try:
+    import orjson
+    loads = orjson.loads
+    BACKEND = "orjson"
+except ImportError:  # pragma: no cover - зависит от окружения
+    try:
+        import msgspec
+        loads = msgspec.json.Decoder().decode
+        BACKEND = "msgspec"
+    except ImportError:
+        loads = json.loads
+        BACKEND = "json"
+
+
+class GraphDoc:
+    __slots__ = ("id", "page", "uur", "udd", "text")
+
+    def __init__(self, id: str = "", page: str = "", uur: str = "", udd: str = "", text: str = ""):
+        self.id = id
+        self.page = page
+        self.uur = uur
+        self.udd = udd
+        self.text = text
+
+
+class GraphNode:
+    __slots__ = ("id", "label", "value", "note", "type")
+
+    def __init__(self, id: str, label: str = "", value: Optional[str] = None, note: Optional[str] = None, type: str = "criteria"):
+        self.id = id
+        self.label = label
+        self.value = value
+        self.note = note
+        self.type = type
+
+
+class GraphLink:
+    __slots__ = ("source", "target", "predicate")
+
+    def __init__(self, source: str, target: str, predicate: str = ""):
+        self.source = source
+        self.target = target
+        self.predicate = predicate
+
+
+class FastGraph:
+    __slots__ = ("doc", "nodes", "links")
+
+    def __init__(self, doc: GraphDoc, nodes: List[GraphNode], links: List[GraphLink]):
+        self.doc = doc
+        self.nodes = nodes
+        self.links = links
+
+    def content_dict(self) -> Dict[str, Any]:
+        """То же, что Graph.model_dump() без полей раскладки (для graph_hash)."""
+        return {
+            "doc": {k: getattr(self.doc, k) for k in GraphDoc.__slots__},
+            "nodes": [{k: getattr(n, k) for k in GraphNode.__slots__} for n in self.nodes],
+            "links": [{k: getattr(l, k) for k in GraphLink.__slots__} for l in self.links],
+        }
+
+
+def _str(obj: Dict[str, Any], key: str, where: str, default: Any = None, optional: bool = False) -> Any:
+    v = obj.get(key, default)
+    if isinstance(v, str) or (optional and v is None):
+        return v
+    if v is None and key not in obj:
+        raise ValueError(f"{where}.{key}: field required")
+    raise ValueError(f"{where}.{key}: string expected")
+
+
+def _obj(v: Any, where: str) -> Dict[str, Any]:
+    if not isinstance(v, dict):
+        raise ValueError(f"{where}: object expected")
+    return v
+
+
+def _list(v: Any, where: str) -> List[Any]:
+    if not isinstance(v, list):
+        raise ValueError(f"{where}: array expected")
+    return v
+
+
+def graph_from_dict(raw: Any) -> FastGraph:
+    raw = _obj(raw, "body")
+    if "doc" not in raw:
+        raise ValueError("body.doc: field required")
+    d = _obj(raw["doc"], "doc")
+    doc = GraphDoc(*(_str(d, k, "doc", "") for k in GraphDoc.__slots__))
+
+    # быстрый путь — одна проверка типов на узел; при ошибке повторяем
+    # поле за полем ради понятного сообщения
+    nodes = []
+    for i, n in enumerate(_list(raw.get("nodes"), "nodes")):
+        get = n.get if type(n) is dict else None
+        if get is not None:
+            nid, label, value, note, typ = get("id"), get("label", ""), get("value"), get("note"), get("type", "criteria")
+            if (
+                type(nid) is str and type(label) is str and type(typ) is str
+                and (value is None or type(value) is str) and (note is None or type(note) is str)
+            ):
+                nodes.append(GraphNode(nid, label, value, note, typ))
+                continue
+        where = f"nodes[{i}]"
+        n = _obj(n, where)
+        nodes.append(GraphNode(
+            _str(n, "id", where),
+            _str(n, "label", where, ""),
+            _str(n, "value", where, optional=True),
+            _str(n, "note", where, optional=True),
+            _str(n, "type", where, "criteria"),
+        ))
+
+    links = []
+    for i, l in enumerate(_list(raw.get("links"), "links")):
+        get = l.get if type(l) is dict else None
+        if get is not None:
+            src, tgt, pred = get("source"), get("target"), get("predicate", "")
+            if type(src) is str and type(tgt) is str and type(pred) is str:
+                links.append(GraphLink(src, tgt, pred))
+                continue
+        where = f"links[{i}]"
+        l = _obj(l, where)
+        links.append(GraphLink(_str(l, "source", where), _str(l, "target", where), _str(l, "predicate", where, "")))
+
+    return FastGraph(doc, nodes, links)
+
+
+def decode_graph(data: Union[bytes, str]) -> FastGraph:
+    """JSON тела запроса / файла -> FastGraph. Некорректный ввод — ValueError."""
+    try:
+        raw = loads(data)
+    except ValueError:
+        raise
+    except Exception as ex:  # ошибки msgspec не наследуют ValueError
+        raise ValueError(str(ex)) from ex
+    return graph_from_dict(raw)
@@ -0,0 +1,388 @@
+"""
+Вывод по тройкам: полунаивная прямая цепочка (forward chaining).
+
+Факт — тройка (s, p, o); правило — голова и тело из шаблонов, переменные —
+строки с "?" ("?x"). Предикат шаблона всегда константа: FactIndex хэширует
+факты по предикату, по (p, s) и по (p, o), и соединение тела идёт через
+эти индексы.
+
+Полунаивная схема: на каждом шаге правило сопоставляется так, чтобы один из
+атомов тела попал в дельту (факты, выведенные на прошлом шаге), остальные —
+во все факты. Соединения, уже сделанные на старых фактах, не повторяются.
+
+Критерии графа: NNF-выражение (build_criteria_expr + nnf) опускается
+в ground-правила (criteria_rules):
+  Leaf c          -> атом (пациент, имеет, c)
+  НЕТ над Leaf c  -> атом (пациент, не имеет, c): замкнутый мир, выводится
+                     до цепочки для каждого критерия, которого нет в профиле
+  AND k(a1..an)   -> (группа, выполнена, k) :- a1, ..., an
+  OR k(a1..an)    -> (группа, выполнена, k) :- ai   (правило на операнд)
+  метод m         -> (<рекомендация>, применим, m) :- корень выражения
+Отрицание стоит только над фактами профиля (стратифицировано), поэтому
+вывод монотонен.
+
+Program — пакетный режим: ground-правила компилируются в счётчики
+(атом -> правила, где он в теле; правило срабатывает, когда счётчик
+обнулился). Это та же полунаивная цепочка, где каждый факт обрабатывается
+ровно один раз: время на профиль линейно по размеру программы.
+
+    program = Program(corpus_rules([("pn1", graph1), ("pn2", graph2)]))
+    program.applicable({"стабильный ПН", "консервативное лечение"})
+"""
+from collections import defaultdict
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Set, Tuple
+
+from .main import (
+    Expr, Graph, Leaf, Node, Op, build_criteria_expr, build_index, descendants_of,
+    find_criteria_anchor, find_methods_anchor, find_root, nnf, reach_flags,
+)
+
+Atom = Tuple[str, str, str]
+Binding = Dict[str, str]
+
+PATIENT = "пациент"
+P_HAS = "имеет"
+P_LACKS = "не имеет"
+GROUP = "группа"
+P_SATISFIED = "выполнена"
+P_APPLICABLE = "применим"
+
+
+def is_var(term: str) -> bool:
+    return term[:1] == "?"
+
+
+class Rule:
+    __slots__ = ("head", "body")
+
+    def __init__(self, head: Atom, body: Sequence[Atom] = ()):
+        self.head = head
+        self.body = tuple(body)
+
+    def __repr__(self) -> str:
+        return f"Rule({self.head!r} :- {list(self.body)!r})"
+
+
+# ---------------- индекс фактов ----------------
+
+class FactIndex:
+    """Множество фактов с хэш-индексами по p, (p, s) и (p, o)."""
+
+    __slots__ = ("facts", "by_p", "by_ps", "by_po")
+
+    def __init__(self, facts: Iterable[Atom] = ()):
+        self.facts: Set[Atom] = set()
+        self.by_p: Dict[str, List[Tuple[str, str]]] = defaultdict(list)
+        self.by_ps: Dict[Tuple[str, str], List[str]] = defaultdict(list)
+        self.by_po: Dict[Tuple[str, str], List[str]] = defaultdict(list)
+        for f in facts:
+            self.add(f)
+
+    def add(self, fact: Atom) -> bool:
+        if fact in self.facts:
+            return False
+        s, p, o = fact
+        self.facts.add(fact)
+        self.by_p[p].append((s, o))
+        self.by_ps[(p, s)].append(o)
+        self.by_po[(p, o)].append(s)
+        return True
+
+    def __contains__(self, fact: Atom) -> bool:
+        return fact in self.facts
+
+    def __len__(self) -> int:
+        return len(self.facts)
+
+    def __iter__(self) -> Iterator[Atom]:
+        return iter(self.facts)
+
+    def match(self, pattern: Atom, binding: Binding) -> Iterator[Binding]:
+        """Привязки, расширяющие binding, при которых pattern — факт."""
+        s, p, o = pattern
+        s = binding.get(s, s) if is_var(s) else s
+        o = binding.get(o, o) if is_var(o) else o
+        sv, ov = is_var(s), is_var(o)
+        if not sv and not ov:
+            if (s, p, o) in self.facts:
+                yield binding
+        elif not sv:
+            for x in self.by_ps.get((p, s), ()):
+                yield {**binding, o: x}
+        elif not ov:
+            for x in self.by_po.get((p, o), ()):
+                yield {**binding, s: x}
+        elif s == o:
+            for a, b in self.by_p.get(p, ()):
+                if a == b:
+                    yield {**binding, s: a}
+        else:
+            for a, b in self.by_p.get(p, ()):
+                yield {**binding, s: a, o: b}
+
+
+def substitute(atom: Atom, binding: Binding) -> Atom:
+    s, p, o = atom
+    return binding.get(s, s), p, binding.get(o, o)
+
+
+def join(body: Sequence[Atom], skip: int, binding: Binding, facts: FactIndex) -> Iterator[Binding]:
+    """Соединение атомов body (кроме skip) по индексу facts; обход с явным стеком."""
+    atoms = [a for i, a in enumerate(body) if i != skip]
+    stack: List[Tuple[int, Binding]] = [(0, binding)]
+    while stack:
+        i, b = stack.pop()
+        if i == len(atoms):
+            yield b
+            continue
+        for nb in facts.match(atoms[i], b):
+            stack.append((i + 1, nb))
+
+
+def forward_chain(facts: FactIndex, rules: Iterable[Rule], max_rounds: Optional[int] = None) -> List[Atom]:
+    """
+    Полунаивная цепочка до неподвижной точки (или max_rounds шагов).
+    facts дополняется выведенными фактами; возвращаются они же, в порядке вывода.
+    Переменные головы должны встречаться в теле.
+    """
+    rules = list(rules)
+    derived: List[Atom] = []
+    for r in rules:
+        if not r.body and facts.add(r.head):
+            derived.append(r.head)
+    # первая дельта — все факты
+    delta = FactIndex(facts)
+    rounds = 0
+    while len(delta) and (max_rounds is None or rounds < max_rounds):
+        rounds += 1
+        new = FactIndex()
+        for r in rules:
+            for i, atom in enumerate(r.body):
+                if atom[1] not in delta.by_p:
+                    continue
+                for b in delta.match(atom, {}):
+                    for full in join(r.body, i, b, facts):
+                        head = substitute(r.head, full)
+                        if head not in facts:
+                            new.add(head)
+        for f in new:
+            facts.add(f)
+            derived.append(f)
+        delta = new
+    return derived
+
+
+# ---------------- критерии графа -> правила ----------------
+
+def graph_criteria(graph: Graph) -> Tuple[List[str], Optional[Expr], Dict[str, Node]]:
+    """
+    Методы и NNF-выражение критериев графа — те же якоря, что у
+    generate_structural_triples. Выражения нет — методы без условий.
+    """
+    nodes_by_id, out_edges, _ = build_index(graph)
+    root = find_root(nodes_by_id)
+    if not root:
+        return [], None, nodes_by_id
+    flags = reach_flags(nodes_by_id, out_edges)
+    methods_anchor = find_methods_anchor(root, nodes_by_id, out_edges, flags)
+    criteria_anchor = find_criteria_anchor(methods_anchor, nodes_by_id, out_edges, flags)
+    desc = descendants_of(methods_anchor.id, out_edges) | {methods_anchor.id}
+    methods = [n for n in nodes_by_id.values() if n.id in desc and n.type == "method"]
+    if not methods:
+        methods = [n for n in nodes_by_id.values() if n.type == "method"]
+    expr = None
+    if criteria_anchor:
+        expr = build_criteria_expr(criteria_anchor, nodes_by_id, out_edges)
+        if expr:
+            expr = nnf(expr)
+    return [m.label or m.id for m in methods], expr, nodes_by_id
+
+
+def criteria_rules(name: str, graph: Graph) -> List[Rule]:
+    """
+    Ground-правила рекомендации name: (name, применим, метод) выводится,
+    когда выполнено выражение критериев графа. Атомы групп — name#k, поэтому
+    name должно быть уникально в программе (corpus_rules это проверяет).
+    """
+    methods, expr, nodes_by_id = graph_criteria(graph)
+    rules: List[Rule] = []
+    if expr is None:
+        return [Rule((name, P_APPLICABLE, m)) for m in dict.fromkeys(methods)]
+
+    def leaf_atom(leaf: Leaf, pred: str) -> Atom:
+        n = nodes_by_id[leaf.crit_node_id]
+        return PATIENT, pred, n.label or n.id
+
+    # атом каждого Op-объекта (общие поддеревья — один атом); обход с явным стеком
+    atoms: Dict[int, Atom] = {}
+
+    def atom_of(e: Expr) -> Optional[Atom]:
+        if isinstance(e, Leaf):
+            return leaf_atom(e, P_HAS)
+        if e.op == "NOT" and len(e.args) == 1 and isinstance(e.args[0], Leaf):
+            return leaf_atom(e.args[0], P_LACKS)
+        a = atoms.get(id(e))
+        if a is None:
+            a = atoms[id(e)] = (GROUP, P_SATISFIED, f"{name}#{len(atoms)}")
+            stack.append(e)
+        return a
+
+    stack: List[Op] = []
+    top = atom_of(expr)
+    while stack:
+        e = stack.pop()
+        head = atoms[id(e)]
+        if e.op == "NOT":
+            if e.args:
+                raise ValueError(f"NOT over a non-leaf in NNF at {e.logic_node_id}")
+            # НЕТ над пустой группой = НЕТ(истина): не выполняется никогда
+            continue
+        args = [atom_of(a) for a in e.args]
+        if e.op == "OR":
+            rules.extend(Rule(head, (a,)) for a in args)
+        else:
+            rules.append(Rule(head, tuple(dict.fromkeys(args))))
+    rules.extend(Rule((name, P_APPLICABLE, m), (top,)) for m in dict.fromkeys(methods))
+    return rules
+
+
+def corpus_rules(graphs: Iterable[Tuple[str, Graph]]) -> List[Rule]:
+    """
+    Правила корпуса. Имена рекомендаций должны быть разными: у одноимённых
+    совпали бы атомы групп и головы (name, применим, m) — ValueError.
+    """
+    out: List[Rule] = []
+    seen: Set[str] = set()
+    for name, g in graphs:
+        if name in seen:
+            raise ValueError(f"duplicate recommendation name {name!r} in corpus")
+        seen.add(name)
+        out.extend(criteria_rules(name, g))
+    return out
+
+
+def profile_facts(profile: Iterable[str], vocabulary: Iterable[str]) -> List[Atom]:
+    """Факты профиля: имеет — для его критериев, не имеет — для остальных критериев словаря."""
+    has = set(profile)
+    facts = [(PATIENT, P_HAS, c) for c in has]
+    facts.extend((PATIENT, P_LACKS, c) for c in vocabulary if c not in has)
+    return facts
+
+
+def rules_vocabulary(rules: Iterable[Rule]) -> List[str]:
+    """Критерии, которые упоминаются в телах правил."""
+    return list(dict.fromkeys(
+        o for r in rules for s, p, o in r.body if s == PATIENT and p in (P_HAS, P_LACKS)
+    ))
+
+
+def eval_expr(expr: Optional[Expr], profile: Set[str], nodes_by_id: Dict[str, Node]) -> bool:
+    """
+    Прямое вычисление выражения на профиле (эталон для правил; без рекурсии).
+    None — условий нет, выполнено.
+    """
+    if expr is None:
+        return True
+    done: Dict[int, bool] = {}
+    stack: List[Expr] = [expr]
+    while stack:
+        e = stack[-1]
+        if isinstance(e, Leaf):
+            n = nodes_by_id[e.crit_node_id]
+            done[id(e)] = (n.label or n.id) in profile
+            stack.pop()
+            continue
+        pending = [a for a in e.args if id(a) not in done]
+        if pending:
+            stack.extend(pending)
+            continue
+        stack.pop()
+        vals = [done[id(a)] for a in e.args]
+        if e.op == "OR":
+            done[id(e)] = any(vals)
+        elif e.op == "NOT":
+            done[id(e)] = not all(vals)
+        else:
+            done[id(e)] = all(vals)
+    return done[id(expr)]
+
+
+# ---------------- пакетный режим ----------------
+
+class Program:
+    """
+    Ground-правила, скомпилированные в счётчики для оценки множества профилей.
+    Атомы интернированы в int; на профиль копируется только массив счётчиков.
+    """
+
+    def __init__(self, rules: Iterable[Rule]):
+        rules = list(rules)
+        self.atoms: List[Atom] = []
+        self.atom_ids: Dict[Atom, int] = {}
+        heads: List[int] = []
+        need: List[int] = []
+        watch: Dict[int, List[int]] = defaultdict(list)
+        always: List[int] = []
+        for r in rules:
+            if any(is_var(t) for a in (r.head, *r.body) for t in (a[0], a[2])):
+                raise ValueError(f"Program accepts ground rules only: {r!r}")
+            h = self._intern(r.head)
+            body = list(dict.fromkeys(self._intern(a) for a in r.body))
+            if not body:
+                always.append(h)
+                continue
+            ri = len(heads)
+            heads.append(h)
+            need.append(len(body))
+            for a in body:
+                watch[a].append(ri)
+        self.heads = heads
+        self.need = need
+        self.watch = [watch.get(i, []) for i in range(len(self.atoms))]
+        self.always = always
+        # атомы профиля по критерию
+        self.has: Dict[str, int] = {}
+        self.lacks: Dict[str, int] = {}
+        for (s, p, o), i in self.atom_ids.items():
+            if s == PATIENT and p == P_HAS:
+                self.has[o] = i
+            elif s == PATIENT and p == P_LACKS:
+                self.lacks[o] = i
+        self.goals = [(i, a[0], a[2]) for i, a in enumerate(self.atoms) if a[1] == P_APPLICABLE]
+
+    def _intern(self, atom: Atom) -> int:
+        i = self.atom_ids.get(atom)
+        if i is None:
+            i = self.atom_ids[atom] = len(self.atoms)
+            self.atoms.append(atom)
+        return i
+
+    def run(self, profile: Iterable[str]) -> bytearray:
+        """Профиль (критерии пациента) -> флаги выведенных атомов (по id атома)."""
+        profile = profile if isinstance(profile, (set, frozenset)) else set(profile)
+        known = bytearray(len(self.atoms))
+        queue = list(self.always)
+        has = self.has
+        queue.extend(has[c] for c in profile if c in has)
+        queue.extend(i for c, i in self.lacks.items() if c not in profile)
+        need = self.need[:]
+        heads, watch = self.heads, self.watch
+        while queue:
+            a = queue.pop()
+            if known[a]:
+                continue
+            known[a] = 1
+            for ri in watch[a]:
+                need[ri] -= 1
+                if not need[ri]:
+                    queue.append(heads[ri])
+        return known
+
+    def applicable(self, profile: Iterable[str]) -> List[Tuple[str, str]]:
+        """(рекомендация, метод), применимые при профиле."""
+        known = self.run(profile)
+        return [(rec, m) for i, rec, m in self.goals if known[i]]
+
+    def score(self, profiles: Iterable[Iterable[str]]) -> List[List[Tuple[str, str]]]:
+        """Пакет профилей -> применимые (рекомендация, метод) на каждый."""
+        return [self.applicable(p) for p in profiles]
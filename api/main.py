@@ -1,14 +1,31 @@
-from fastapi import FastAPI, Body
+from fastapi import FastAPI, Body, Depends, HTTPException, Query, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import PlainTextResponse, FileResponse
+from fastapi.responses import FileResponse, PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
-from typing import List, Optional, Dict, Any, Tuple, Set
-from openpyxl import Workbook
+from typing import List, Optional, Dict, Any, Tuple, Set, Iterable, Iterator, Callable
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
 import tempfile
+import time
 import os
-import re
+import io
+import json
+import base64
+import threading
+import uuid
 import hashlib
-from collections import deque, defaultdict
+from urllib.parse import quote
+from collections import deque, defaultdict, OrderedDict
+
+from core.engine import Unit, emit_store, emit_ttl, emit_xlsx, xlsx_rows
+from core.iri import iri_cache_stats, stable_id
+from core.triple_store import QUERY_LIMIT, TripleStore
+from core.ttl_generator import TTL_CHUNK_SIZE, TTL_STYLES, Literal, LongLiteral, escape_turtle, gzip_chunks
+from .cache import TTLCache
+from . import metrics
+from .metrics import stage, timed_iter
+from .fastjson import FastGraph, decode_graph, graph_from_dict
+from core.xlsx_export import write_xlsx_rows
 
 # ---------------- Models ----------------
 
@@ -73,33 +90,6 @@ ROLE_PREDS = {
 
 # ---------------- Helpers: ID / IRI ----------------
 
-def _norm(s: Optional[str]) -> str:
-    if s is None:
-        return ""
-    s = str(s).strip().lower()
-    s = s.replace("ё", "е")
-    s = re.sub(r"\s+", " ", s)
-    return s
-
-def stable_id(doc_id: str, node_type: str, label: str, value: Optional[str], note: Optional[str]) -> str:
-    """
-    Детерминированный ID сущности (стабильный в рамках документа):
-    prefix_slug_hash8
-    """
-    prefix = {
-        "root": "diag",
-        "method": "method",
-        "criteria": "crit",
-        "logic": "grp"
-    }.get(node_type, "ent")
-
-    slug = re.sub(r"[^0-9a-zA-Zа-яА-Я_]+", "_", _norm(label))[:40].strip("_")
-    base = f"{doc_id}|{node_type}|{_norm(label)}|{_norm(value)}|{_norm(note)}"
-    h = hashlib.sha1(base.encode("utf-8")).hexdigest()[:8]
-    if not slug:
-        slug = "x"
-    return f"{prefix}_{slug}_{h}"
-
 def predicate_to_local_name(pred: str) -> str:
     return (
         pred.strip()
@@ -108,8 +98,7 @@ def predicate_to_local_name(pred: str) -> str:
         .replace("Ё", "Е")
     )
 
-def escape_literal(s: str) -> str:
-    return s.replace("\\", "\\\\").replace('"', '\\"')
+escape_literal = escape_turtle
 
 def node_class(node_type: str) -> str:
     if node_type == "root":
@@ -126,13 +115,17 @@ def node_class(node_type: str) -> str:
 # ---------------- AST ----------------
 
 class Expr:
-    pass
+    __slots__ = ()
 
 class Leaf(Expr):
+    __slots__ = ("crit_node_id",)
+
     def __init__(self, crit_node_id: str):
         self.crit_node_id = crit_node_id
 
 class Op(Expr):
+    __slots__ = ("op", "args", "logic_node_id")
+
     def __init__(self, op: str, args: List[Expr], logic_node_id: str):
         self.op = op          # AND/OR/NOT
         self.args = args
@@ -151,47 +144,98 @@ def normalize_op(label: str) -> str:
     return "AND"
 
 
+DUAL_OP = {"AND": "OR", "OR": "AND"}
+
 def nnf(expr: Expr) -> Expr:
     """
     Negation Normal Form:
     NOT остается только над Leaf.
     """
-    if isinstance(expr, Leaf):
-        return expr
-
-    if isinstance(expr, Op):
-        op = expr.op
-        args = [nnf(a) for a in expr.args]
-
-        if op != "NOT":
-            return Op(op, args, expr.logic_node_id)
+    return _nnf(expr, 0, None)
 
-        # NOT case
-        if len(args) == 0:
-            return Op("NOT", [], expr.logic_node_id)
 
-        if len(args) > 1:
-            # автопочинка: NOT(AND(args...))
-            return nnf(Op("NOT", [Op("AND", args, expr.logic_node_id)], expr.logic_node_id))
-
-        x = args[0]
-        if isinstance(x, Leaf):
-            return Op("NOT", [x], expr.logic_node_id)
-
-        if isinstance(x, Op):
-            if x.op == "NOT":
-                # NOT NOT X
-                return nnf(x.args[0])
-            if x.op == "AND":
-                # NOT(AND ...) => OR(NOT ..)
-                return Op("OR", [nnf(Op("NOT", [a], expr.logic_node_id)) for a in x.args], expr.logic_node_id)
-            if x.op == "OR":
-                # NOT(OR ...) => AND(NOT ..)
-                return Op("AND", [nnf(Op("NOT", [a], expr.logic_node_id)) for a in x.args], expr.logic_node_id)
+def nnf_combine(op: str, args: List[Expr], logic_node_id: str) -> Expr:
+    """
+    Один шаг NNF: операнды args уже в NNF, собираем узел op над ними.
+    NNF поддерева не зависит от контекста выше, поэтому результат
+    можно кэшировать по logic-узлу (см. GraphSession).
+    """
+    if op != "NOT":
+        return Op(op, args, logic_node_id)
+    return _nnf(Op(op, args, logic_node_id), 0, None)
 
-        return Op("NOT", [x], expr.logic_node_id)
 
-    return expr
+def _nnf(expr: Expr, parity: int, neg_id: Optional[str]) -> Expr:
+    """
+    NNF без рекурсии (явный стек), сверху вниз.
+
+    Состояние спуска — (parity, neg_id): чётность NOT, которые проталкиваются
+    в текущее поддерево, и id самого внешнего из них (None — отрицаний не было).
+    Как и в исходной рекурсивной версии, узлы, через которые прошло
+    отрицание, получают logic_node_id этого NOT:
+      NOT_g(AND_k(a, b)) -> OR_g(NOT_g a, NOT_g b)
+      NOT_g(a1..an)      -> NOT_g(AND_g(a1..an))
+    Поддеревья без отрицаний не копируются — возвращается исходный объект.
+    """
+    # кадр: [operands, parity, neg_id, out_op, out_id, results, src, wrap_id]
+    stack: List[list] = []
+    e, p, g = expr, parity, neg_id
+    while True:
+        # --- спуск до узла, результат которого не требует операндов
+        while True:
+            if isinstance(e, Op):
+                if e.op == "NOT":
+                    if len(e.args) == 1:
+                        e, p, g = e.args[0], 1 - p, (g if g is not None else e.logic_node_id)
+                        continue
+                    if not e.args:
+                        if g is not None:
+                            # NOT над пустым NOT — как и раньше, это ошибка графа
+                            # (в прежней рекурсивной версии — IndexError)
+                            raise ValueError(f"NOT over empty NOT group at {e.logic_node_id}")
+                        res = e
+                        break
+                    # автопочинка: NOT(args...) == NOT(AND(args...))
+                    p, g = 1 - p, (g if g is not None else e.logic_node_id)
+                    frame = [e.args, p, g, "OR" if p else "AND", g, [], None, None]
+                elif e.op in DUAL_OP:
+                    if g is None:
+                        frame = [e.args, 0, None, e.op, e.logic_node_id, [], e, None]
+                    else:
+                        frame = [e.args, p, g, DUAL_OP[e.op] if p else e.op, g, [], None, None]
+                else:
+                    # неизвестный оператор: внутрь отрицание не проталкиваем
+                    frame = [e.args, 0, None, e.op, e.logic_node_id, [], e, g if p else None]
+                stack.append(frame)
+                if frame[0]:
+                    e, p, g = frame[0][0], frame[1], frame[2]
+                    continue
+                res = None
+                break
+
+            # Leaf (или «голый» Expr)
+            res = Op("NOT", [e], g) if p else e
+            break
+
+        # --- подъём: отдаём результат родительским кадрам
+        while True:
+            if res is not None:
+                if not stack:
+                    return res
+                stack[-1][5].append(res)
+            frame = stack[-1]
+            operands, results = frame[0], frame[5]
+            if len(results) < len(operands):
+                e, p, g = operands[len(results)], frame[1], frame[2]
+                break
+            stack.pop()
+            src = frame[6]
+            if src is not None and all(r is a for r, a in zip(results, operands)):
+                res = src
+            else:
+                res = Op(frame[3], results, frame[4])
+            if frame[7] is not None:
+                res = Op("NOT", [res], frame[7])
 
 
 # ---------------- Graph analysis ----------------
@@ -231,87 +275,178 @@ def distance_bfs(start_id: str, out_edges: Dict[str, List[Link]]) -> Dict[str, i
                 q.append(e.target)
     return dist
 
-def find_methods_anchor(root: Node, nodes_by_id, out_edges) -> Optional[Node]:
+REACH_METHOD = 1
+REACH_CRITERIA = 2
+
+def reach_flags(nodes_by_id: Dict[str, Node], out_edges: Dict[str, List[Link]]) -> Dict[str, int]:
+    """
+    Для каждого узла за один проход считаем, есть ли под ним (строго ниже,
+    по пути длины >= 1) method и/или criteria: битовая маска REACH_*.
+
+    Итеративный Тарьян: компоненты сильной связности выходят в обратном
+    топологическом порядке, поэтому флаги потомков уже посчитаны, когда
+    доходим до компоненты. Циклы и общие поддеревья обрабатываются один раз.
+    """
+    def own_flag(nid: str) -> int:
+        n = nodes_by_id.get(nid)
+        if n is None:
+            return 0
+        if n.type == "method":
+            return REACH_METHOD
+        if n.type == "criteria":
+            return REACH_CRITERIA
+        return 0
+
+    index: Dict[str, int] = {}
+    low: Dict[str, int] = {}
+    on_stack: Set[str] = set()
+    comp_of: Dict[str, int] = {}
+    comp_flags: List[int] = []
+    stack: List[str] = []
+    counter = 0
+
+    starts = list(nodes_by_id.keys()) + [k for k in out_edges.keys() if k not in nodes_by_id]
+    for start in starts:
+        if start in index:
+            continue
+        # (узел, позиция в списке исходящих рёбер)
+        work: List[Tuple[str, int]] = [(start, 0)]
+        while work:
+            v, i = work[-1]
+            if i == 0 and v not in index:
+                index[v] = low[v] = counter
+                counter += 1
+                stack.append(v)
+                on_stack.add(v)
+            edges = out_edges.get(v, [])
+            if i < len(edges):
+                work[-1] = (v, i + 1)
+                w = edges[i].target
+                if w not in index:
+                    work.append((w, 0))
+                elif w in on_stack:
+                    low[v] = min(low[v], index[w])
+                continue
+
+            work.pop()
+            if work:
+                parent = work[-1][0]
+                low[parent] = min(low[parent], low[v])
+
+            if low[v] != index[v]:
+                continue
+
+            # v — корень компоненты: снимаем её со стека
+            cid = len(comp_flags)
+            members = []
+            while True:
+                w = stack.pop()
+                on_stack.discard(w)
+                comp_of[w] = cid
+                members.append(w)
+                if w == v:
+                    break
+            flags = 0
+            for m in members:
+                for e in out_edges.get(m, []):
+                    t = e.target
+                    flags |= own_flag(t)
+                    tc = comp_of[t]
+                    if tc != cid:
+                        flags |= comp_flags[tc]
+            comp_flags.append(flags)
+
+    return {nid: comp_flags[cid] for nid, cid in comp_of.items()}
+
+def find_methods_anchor(root: Node, nodes_by_id, out_edges, flags: Optional[Dict[str, int]] = None) -> Optional[Node]:
     """
     Ищем ближайший logic-узел под root, который ведёт к method.
     Если нет — вернем root (значит методы висят напрямую).
     """
-    dist = distance_bfs(root.id, out_edges)
-    methods = {n.id for n in nodes_by_id.values() if n.type == "method"}
-    candidates = []
-    for n in nodes_by_id.values():
-        if n.type != "logic":
-            continue
-        desc = descendants_of(n.id, out_edges)
-        if desc & methods:
-            candidates.append(n)
+    if flags is None:
+        flags = reach_flags(nodes_by_id, out_edges)
+    candidates = [
+        n for n in nodes_by_id.values()
+        if n.type == "logic" and flags.get(n.id, 0) & REACH_METHOD
+    ]
     if not candidates:
         return root
 
+    dist = distance_bfs(root.id, out_edges)
     candidates.sort(key=lambda n: dist.get(n.id, 10**9))
     return candidates[0]
 
-def find_criteria_anchor(methods_anchor: Node, nodes_by_id, out_edges) -> Optional[Node]:
+def find_criteria_anchor(methods_anchor: Node, nodes_by_id, out_edges, flags: Optional[Dict[str, int]] = None) -> Optional[Node]:
     """
     Ищем logic-узел (внутри поддерева methods_anchor), который содержит criteria-потомков.
     Если criteria висят прямо на methods_anchor — criteria_anchor = methods_anchor.
     """
-    dist = distance_bfs(methods_anchor.id, out_edges)
-    criteria = {n.id for n in nodes_by_id.values() if n.type == "criteria"}
+    if flags is None:
+        flags = reach_flags(nodes_by_id, out_edges)
 
     # если сам anchor уже ведет к criteria
-    if descendants_of(methods_anchor.id, out_edges) & criteria:
-        # попробуем найти более “нижний” logic, который уже про критерии
-        candidates = []
-        for n in nodes_by_id.values():
-            if n.type != "logic":
-                continue
-            if n.id not in dist:
-                continue
-            desc = descendants_of(n.id, out_edges)
-            if desc & criteria:
-                candidates.append(n)
-        if candidates:
-            candidates.sort(key=lambda n: dist.get(n.id, 10**9))
-            return candidates[0]
-        return methods_anchor
+    if not flags.get(methods_anchor.id, 0) & REACH_CRITERIA:
+        return None
 
-    return None
+    # попробуем найти более “нижний” logic, который уже про критерии
+    dist = distance_bfs(methods_anchor.id, out_edges)
+    candidates = [
+        n for n in nodes_by_id.values()
+        if n.type == "logic" and n.id in dist and flags.get(n.id, 0) & REACH_CRITERIA
+    ]
+    if candidates:
+        candidates.sort(key=lambda n: dist.get(n.id, 10**9))
+        return candidates[0]
+    return methods_anchor
 
 def build_criteria_expr(criteria_anchor: Node, nodes_by_id, out_edges) -> Optional[Expr]:
     """
     Строим AST только по ветке criteria: logic -> (logic|criteria).
+    Обход без рекурсии; узел, достижимый по нескольким путям, строится один раз.
     """
-    def build(node_id: str) -> Optional[Expr]:
-        node = nodes_by_id.get(node_id)
-        if not node:
-            return None
-        if node.type == "criteria":
-            return Leaf(node_id)
-        if node.type != "logic":
-            return None
-
-        op = normalize_op(node.label)
+    node = nodes_by_id.get(criteria_anchor.id)
+    if not node or node.type not in ("logic", "criteria"):
+        return None
 
+    def operands(node_id: str) -> List[str]:
         # operands: только logic/criteria по исходящим ребрам
-        children_ids = []
+        ids = []
         for e in out_edges.get(node_id, []):
             tnode = nodes_by_id.get(e.target)
-            if not tnode:
-                continue
-            if tnode.type in ("logic", "criteria"):
-                children_ids.append(e.target)
+            if tnode and tnode.type in ("logic", "criteria"):
+                ids.append(e.target)
+        return ids
 
-        args = []
-        for cid in children_ids:
-            ex = build(cid)
-            if ex:
-                args.append(ex)
+    built: Dict[str, Expr] = {}
+    in_progress: Set[str] = set()
+    stack: List[list] = []   # [node_id, operand ids, next operand index]
 
+    def enter(node_id: str) -> None:
+        if nodes_by_id[node_id].type == "criteria":
+            built[node_id] = Leaf(node_id)
+            return
+        if node_id in in_progress:
+            raise ValueError(f"cycle in logic groups at {node_id}")
+        in_progress.add(node_id)
+        stack.append([node_id, operands(node_id), 0])
+
+    enter(criteria_anchor.id)
+    while stack:
+        frame = stack[-1]
+        node_id, children, i = frame
+        while i < len(children) and children[i] in built:
+            i += 1
+        frame[2] = i
+        if i < len(children):
+            enter(children[i])
+            continue
+        stack.pop()
+        in_progress.discard(node_id)
         # если NOT и аргументов 0 — допустим
-        return Op(op, args, node_id)
+        op = normalize_op(nodes_by_id[node_id].label)
+        built[node_id] = Op(op, [built[c] for c in children], node_id)
 
-    return build(criteria_anchor.id)
+    return built[criteria_anchor.id]
 
 
 # ---------------- Triples generation (STRUCTURAL) ----------------
@@ -325,6 +460,43 @@ def op_pred(op: str) -> str:
         return P_NOT
     return P_AND
 
+def export_expr_rows(expr: Expr, nodes_by_id: Dict[str, Node]) -> List[Tuple[str, str, str]]:
+    """
+    Логическая структура NNF-выражения: group --связь OP--> operand
+    (operand — критерий или вложенная группа).
+
+    Обход в глубину с явным стеком; каждый Op-объект посещается один раз,
+    поэтому работа линейна по размеру выражения при любой вложенности.
+    Порядок строк — прямой обход: ребро к вложенной группе, затем
+    её содержимое, затем следующий операнд.
+    """
+    if not isinstance(expr, Op):
+        return []
+
+    def group_label(logic_id: str) -> str:
+        n = nodes_by_id.get(logic_id)
+        return (n.label or logic_id)
+
+    rows: List[Tuple[str, str, str]] = []
+    visited: Set[int] = {id(expr)}
+    stack: List[list] = [[expr, group_label(expr.logic_node_id), op_pred(expr.op), 0]]
+    while stack:
+        frame = stack[-1]
+        e, subj, pred, i = frame
+        if i == len(e.args):
+            stack.pop()
+            continue
+        frame[3] = i + 1
+        a = e.args[i]
+        if isinstance(a, Leaf):
+            rows.append((subj, pred, nodes_by_id[a.crit_node_id].label or a.crit_node_id))
+        elif isinstance(a, Op):
+            rows.append((subj, pred, group_label(a.logic_node_id)))
+            if id(a) not in visited:
+                visited.add(id(a))
+                stack.append([a, group_label(a.logic_node_id), op_pred(a.op), 0])
+    return rows
+
 def generate_structural_triples(graph: Graph) -> Tuple[List[Triple], Dict[str, str], Dict[str, Node]]:
     """
     Возвращает:
@@ -332,20 +504,33 @@ def generate_structural_triples(graph: Graph) -> Tuple[List[Triple], Dict[str, s
     - iri_map: node.id -> ex:<stableId>
     - nodes_by_id
     """
-    nodes_by_id, out_edges, in_edges = build_index(graph)
+    with stage("build_index"):
+        nodes_by_id, out_edges, in_edges = build_index(graph)
+    return structural_triples_from_index(graph.doc, nodes_by_id, out_edges, graph.links)
+
+def structural_triples_from_index(
+    doc: DocInfo,
+    nodes_by_id: Dict[str, Node],
+    out_edges: Dict[str, List[Link]],
+    links: Iterable[Link],
+) -> Tuple[List[Triple], Dict[str, str], Dict[str, Node]]:
+    """То же, что generate_structural_triples, но по готовому индексу графа."""
     root = find_root(nodes_by_id)
     if not root:
         return [], {}, nodes_by_id
 
     # IRI map for all nodes
     iri_map: Dict[str, str] = {}
-    for n in nodes_by_id.values():
-        sid = stable_id(graph.doc.id, n.type, n.label or n.id, n.value, n.note)
-        iri_map[n.id] = f"ex:{sid}"
+    with stage("iri_map"):
+        for n in nodes_by_id.values():
+            sid = stable_id(doc.id, n.type, n.label or n.id, n.value, n.note)
+            iri_map[n.id] = f"ex:{sid}"
 
     # determine anchors
-    methods_anchor = find_methods_anchor(root, nodes_by_id, out_edges)
-    criteria_anchor = find_criteria_anchor(methods_anchor, nodes_by_id, out_edges)
+    with stage("anchors"):
+        flags = reach_flags(nodes_by_id, out_edges)
+        methods_anchor = find_methods_anchor(root, nodes_by_id, out_edges, flags)
+        criteria_anchor = find_criteria_anchor(methods_anchor, nodes_by_id, out_edges, flags)
 
     # collect methods under methods_anchor
     methods = []
@@ -360,7 +545,7 @@ def generate_structural_triples(graph: Graph) -> Tuple[List[Triple], Dict[str, s
 
     # map role predicates for logic->criteria edges
     role_by_edge: Dict[Tuple[str, str], str] = {}
-    for e in graph.links:
+    for e in links:
         pred = (e.predicate or "").strip()
         if pred in ROLE_PREDS:
             role_by_edge[(e.source, e.target)] = pred
@@ -386,9 +571,11 @@ def generate_structural_triples(graph: Graph) -> Tuple[List[Triple], Dict[str, s
         return triples, iri_map, nodes_by_id
 
     # build expr & normalize NOT
-    expr = build_criteria_expr(criteria_anchor, nodes_by_id, out_edges)
+    with stage("criteria_expr"):
+        expr = build_criteria_expr(criteria_anchor, nodes_by_id, out_edges)
     if expr:
-        expr = nnf(expr)
+        with stage("nnf"):
+            expr = nnf(expr)
 
     # structural export:
     # - each logic node is a "group"
@@ -429,56 +616,85 @@ def generate_structural_triples(graph: Graph) -> Tuple[List[Triple], Dict[str, s
     # export logical structure from NNF expr:
     # Each Op corresponds to a group node. If NNF introduced NOT, it still refers to the same logic_node_id
     # (we reuse expr.logic_node_id, that's enough to name the group label).
-    def export_expr(e: Expr, parent_group_id: Optional[str], parent_op: Optional[str]):
-        if isinstance(e, Leaf):
-            # leaf is operand; if parent is NOT, we want a NOT link from parent-group to leaf criterion
-            if parent_group_id and parent_op:
-                pred = op_pred(parent_op)
-                triples.append(Triple(subject=group_label(parent_group_id), predicate=pred, object=(nodes_by_id[e.crit_node_id].label or e.crit_node_id)))
-            return
-
-        if isinstance(e, Op):
-            this_gid = e.logic_node_id
-            # link parent -> this group, if parent exists
-            if parent_group_id and parent_op:
-                pred = op_pred(parent_op)
-                triples.append(Triple(subject=group_label(parent_group_id), predicate=pred, object=group_label(this_gid)))
-
-            # if this op has args: emit this group -> operands
-            for a in e.args:
-                if isinstance(a, Leaf):
-                    triples.append(Triple(subject=group_label(this_gid), predicate=op_pred(e.op), object=(nodes_by_id[a.crit_node_id].label or a.crit_node_id)))
-                elif isinstance(a, Op):
-                    triples.append(Triple(subject=group_label(this_gid), predicate=op_pred(e.op), object=group_label(a.logic_node_id)))
-                    export_expr(a, None, None)  # its internal edges will be emitted in its own loop
-                else:
-                    pass
-
-            # recurse to emit deeper op->op structure (already emitted above, but we want inner expansions too)
-            for a in e.args:
-                if isinstance(a, Op):
-                    export_expr(a, None, None)
-            return
-
     if expr:
-        export_expr(expr, None, None)
+        with stage("export_expr"):
+            for subj, pred, obj in export_expr_rows(expr, nodes_by_id):
+                triples.append(Triple(subject=subj, predicate=pred, object=obj))
 
     # dedupe triples (preserve order)
-    seen = set()
-    out = []
-    for t in triples:
-        key = (t.subject, t.predicate, t.object)
-        if key not in seen:
-            seen.add(key)
-            out.append(t)
+    with stage("dedupe"):
+        seen = set()
+        out = []
+        for t in triples:
+            key = (t.subject, t.predicate, t.object)
+            if key not in seen:
+                seen.add(key)
+                out.append(t)
 
     return out, iri_map, nodes_by_id
 
 
 # ---------------- TTL generation from structural triples ----------------
 
-def generate_ttl(graph: Graph) -> str:
-    triples, iri_map, nodes_by_id = generate_structural_triples(graph)
+def generate_ttl(graph: Graph, structural: Optional[Tuple[List[Triple], Dict[str, str], Dict[str, Node]]] = None) -> str:
+    """
+    structural — уже посчитанный результат generate_structural_triples(graph),
+    чтобы не строить тройки второй раз, если они нужны и сами по себе.
+    """
+    return "".join(iter_ttl(graph, structural))
+
+def iter_ttl(
+    graph: Graph,
+    structural=None,
+    chunk_size: int = TTL_CHUNK_SIZE,
+    style: str = "turtle",
+) -> Iterator[str]:
+    """
+    TTL кусками (~chunk_size символов) — для потоковой отдачи и записи в файл.
+    style: "turtle" — утверждение на строку (по умолчанию),
+    "compact" — блок на субъект (`;` / `,`), "ntriples" — N-Triples.
+    """
+    chunks = emit_ttl(GraphFrontend(structural).statements(graph), TTL_PREFIXES, style, chunk_size)
+    # стадия "ttl" — только построение строк; тройки, если их считают здесь же,
+    # замеряются своими стадиями и в неё тоже входят
+    return timed_iter("ttl", chunks)
+
+TTL_PREFIXES = {
+    "ex": "http://example.org/ontology#",
+    "rdf": "http://www.w3.org/1999/02/22-rdf-syntax-ns#",
+    "rdfs": "http://www.w3.org/2000/01/rdf-schema#",
+}
+
+def ttl_statements(graph: Graph, structural=None) -> Iterator[Optional[Tuple[str, str, Any]]]:
+    """
+    Утверждения TTL (subject, predicate, object); None — граница блока.
+    Сущность рекомендации не зависит от троек и отдаётся до того,
+    как тройки посчитаны (если structural не передан).
+    """
+    # Document / recommendation entity (optional but useful)
+    rec = f'ex:{stable_id(graph.doc.id, "rec", graph.doc.id or "Recommendation", None, None)}'
+    yield rec, "rdf:type", "ex:Рекомендация"
+    if graph.doc.id:
+        yield rec, "rdfs:label", Literal(graph.doc.id)
+    if graph.doc.page:
+        yield rec, "ex:страница", Literal(graph.doc.page)
+    if graph.doc.uur:
+        yield rec, "ex:УУР", Literal(graph.doc.uur)
+    if graph.doc.udd:
+        yield rec, "ex:УДД", Literal(graph.doc.udd)
+    if graph.doc.text:
+        yield rec, "ex:текст", LongLiteral(graph.doc.text)
+    yield None
+
+    # Declarations
+    # patients
+    yield "ex:grp_pacients", "rdf:type", "ex:ГруппаПациентов"
+    yield "ex:grp_pacients", "rdfs:label", Literal("пациенты")
+    yield None
+
+    if structural is None:
+        structural = generate_structural_triples(graph)
+    triples, iri_map, nodes_by_id = structural
 
     # Build label->iri for entities we mention in triples (subjects/objects)
     # For node labels we use stable node IRIs; for "пациенты" make a fixed IRI.
@@ -487,7 +703,10 @@ def generate_ttl(graph: Graph) -> str:
     # map all node labels to IRIs
     for n in nodes_by_id.values():
         lbl = n.label or n.id
-        label_to_iri[lbl] = iri_map.get(n.id, f"ex:{stable_id(graph.doc.id, n.type, lbl, n.value, n.note)}")
+        iri = iri_map.get(n.id)
+        if iri is None:
+            iri = f"ex:{stable_id(graph.doc.id, n.type, lbl, n.value, n.note)}"
+        label_to_iri[lbl] = iri
 
     # groups appear by label too; ensure logic labels mapped
     for n in nodes_by_id.values():
@@ -495,90 +714,1007 @@ def generate_ttl(graph: Graph) -> str:
             lbl = n.label or n.id
             label_to_iri[lbl] = iri_map.get(n.id, label_to_iri.get(lbl))
 
-    lines: List[str] = [
-        "@prefix ex: <http://example.org/ontology#> .",
-        "@prefix rdf: <http://www.w3.org/1999/02/22-rdf-syntax-ns#> .",
-        "@prefix rdfs: <http://www.w3.org/2000/01/rdf-schema#> .",
-        "",
-    ]
-
-    # Document / recommendation entity (optional but useful)
-    rec_id = stable_id(graph.doc.id, "rec", graph.doc.id or "Recommendation", None, None)
-    lines.append(f"ex:{rec_id} rdf:type ex:Рекомендация .")
-    if graph.doc.id:
-        lines.append(f'ex:{rec_id} rdfs:label "{escape_literal(graph.doc.id)}" .')
-    if graph.doc.page:
-        lines.append(f'ex:{rec_id} ex:страница "{escape_literal(graph.doc.page)}" .')
-    if graph.doc.uur:
-        lines.append(f'ex:{rec_id} ex:УУР "{escape_literal(graph.doc.uur)}" .')
-    if graph.doc.udd:
-        lines.append(f'ex:{rec_id} ex:УДД "{escape_literal(graph.doc.udd)}" .')
-    if graph.doc.text:
-        lines.append(f'ex:{rec_id} ex:текст """{escape_literal(graph.doc.text)}""" .')
-    lines.append("")
-
-    # Declarations
-    # patients
-    lines.append('ex:grp_pacients rdf:type ex:ГруппаПациентов .')
-    lines.append('ex:grp_pacients rdfs:label "пациенты" .')
-    lines.append("")
-
+    value_pred = f"ex:{predicate_to_local_name(P_VALUE)}"
+    note_pred = f"ex:{predicate_to_local_name(P_NOTE)}"
     for n in nodes_by_id.values():
         iri = iri_map[n.id]
-        cls = node_class(n.type)
-        lbl = n.label or n.id
-        lines.append(f"{iri} rdf:type {cls} .")
-        lines.append(f'{iri} rdfs:label "{escape_literal(lbl)}" .')
+        yield iri, "rdf:type", node_class(n.type)
+        yield iri, "rdfs:label", Literal(n.label or n.id)
 
         if n.type == "criteria":
             if n.value not in (None, ""):
-                lines.append(f'{iri} ex:{predicate_to_local_name(P_VALUE)} "{escape_literal(str(n.value))}" .')
+                yield iri, value_pred, Literal(str(n.value))
             if n.note not in (None, ""):
-                lines.append(f'{iri} ex:{predicate_to_local_name(P_NOTE)} "{escape_literal(str(n.note))}" .')
+                yield iri, note_pred, Literal(str(n.note))
 
         if n.type == "logic":
             # store operator (AND/OR/NOT) as data property for recovery
-            op = normalize_op(n.label)
-            lines.append(f'{iri} ex:operator "{op}" .')
+            yield iri, "ex:operator", Literal(normalize_op(n.label))
 
         # attach node to recommendation (optional)
-        lines.append(f"ex:{rec_id} ex:имеетЭлемент {iri} .")
-
-        lines.append("")
+        yield rec, "ex:имеетЭлемент", iri
+        yield None
 
     # Triples
     for t in triples:
-        pred_local = predicate_to_local_name(t.predicate)
+        pred = f"ex:{predicate_to_local_name(t.predicate)}"
 
-        subj_iri = label_to_iri.get(t.subject, f'ex:ent_{stable_id(graph.doc.id, "ent", t.subject, None, None)}')
+        subj_iri = label_to_iri.get(t.subject)
+        if subj_iri is None:
+            subj_iri = f'ex:ent_{stable_id(graph.doc.id, "ent", t.subject, None, None)}'
         # literal predicates
         if t.predicate in (P_VALUE, P_NOTE):
-            lines.append(f'{subj_iri} ex:{pred_local} "{escape_literal(t.object)}" .')
-            continue
+            yield subj_iri, pred, Literal(t.object)
+        else:
+            obj_iri = label_to_iri.get(t.object)
+            if obj_iri is None:
+                obj_iri = f'ex:ent_{stable_id(graph.doc.id, "ent", t.object, None, None)}'
+            yield subj_iri, pred, obj_iri
+
+
+# ---------------- Engine front-end ----------------
+
+class GraphFrontend:
+    """
+    Граф редактора -> общее представление core.engine: одна единица троек
+    (структурные тройки графа) и поток утверждений ttl_statements.
+    structural — готовый результат generate_structural_triples.
+    """
+
+    prefixes = TTL_PREFIXES
+    ttl_style = "turtle"
+
+    def __init__(self, structural=None):
+        self.structural = structural
 
-        obj_iri = label_to_iri.get(t.object, f'ex:ent_{stable_id(graph.doc.id, "ent", t.object, None, None)}')
-        lines.append(f"{subj_iri} ex:{pred_local} {obj_iri} .")
+    def units(self, graph: Graph, triples: Optional[Iterable[Triple]] = None) -> Iterator[Unit]:
+        if triples is None:
+            triples = (self.structural or generate_structural_triples(graph))[0]
+        doc = graph.doc
+        yield ((t.subject, t.predicate, t.object) for t in triples), doc.id, doc.page, doc.text
 
-    return "\n".join(lines)
+    def statements(self, graph: Graph) -> Iterator[Optional[Tuple[str, str, Any]]]:
+        return ttl_statements(graph, self.structural)
 
 
 # ---------------- XLSX ----------------
 
-def triples_to_xlsx(triples: List[Triple], graph: Graph) -> str:
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "Triples"
-    ws.append(["объект", "субъект", "предикат", "документ", "текст рекомендации", "страница"])
+XLSX_HEADER = ["объект", "субъект", "предикат", "документ", "текст рекомендации", "страница"]
+# колонки строки движка (subject, predicate, object, doc, page, rec_text) в порядке XLSX_HEADER
+XLSX_COLUMNS = (2, 0, 1, 3, 5, 4)
 
-    doc = graph.doc
-    for t in triples:
-        ws.append([t.object, t.subject, t.predicate, doc.id, doc.text, doc.page])
+def triples_xlsx_rows(triples: Iterable[Triple], graph: Graph):
+    return xlsx_rows(GraphFrontend().units(graph, triples), XLSX_COLUMNS)
 
+def triples_to_xlsx(triples: Iterable[Triple], graph: Graph) -> str:
     fd, path = tempfile.mkstemp(suffix=".xlsx")
     os.close(fd)
-    wb.save(path)
+    with stage("xlsx"):
+        emit_xlsx(path, GraphFrontend().units(graph, triples), XLSX_HEADER, XLSX_COLUMNS)
     return path
 
+def triples_to_xlsx_bytes(triples: Iterable[Triple], graph: Graph) -> bytes:
+    buf = io.BytesIO()
+    with stage("xlsx"):
+        emit_xlsx(buf, GraphFrontend().units(graph, triples), XLSX_HEADER, XLSX_COLUMNS)
+    return buf.getvalue()
+
+
+# ---------------- Result cache ----------------
+
+# поля раскладки: на результат конвертации не влияют и в хэш не входят
+LAYOUT_FIELDS = {"x", "y", "w", "h", "collapsed"}
+
+def result_weight(value: Any) -> int:
+    """Вес записи кэша результатов: длина текста TTL / байтов XLSX, тройки не считаются."""
+    return len(value) if isinstance(value, (str, bytes)) else 0
+
+RESULT_CACHE = TTLCache(
+    maxsize=int(os.environ.get("CONVERTER_CACHE_SIZE", "512")),
+    ttl=float(os.environ.get("CONVERTER_CACHE_TTL", "600")),
+    maxweight=int(os.environ.get("CONVERTER_CACHE_MAX_BYTES", str(256 * 1024 * 1024))),
+    weigh=result_weight,
+)
+
+def graph_hash(graph: Graph) -> str:
+    """
+    Канонический хэш содержимого графа (без полей раскладки).
+    Порядок узлов и рёбер сохраняется — от него зависит порядок троек.
+    """
+    if isinstance(graph, FastGraph):
+        data = graph.content_dict()
+    else:
+        data = graph.model_dump(exclude={"nodes": {"__all__": LAYOUT_FIELDS}})
+    raw = json.dumps(data, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+def cached_structural(graph: Graph, key: str):
+    return RESULT_CACHE.get_or_compute((key, "structural"), lambda: generate_structural_triples(graph))
+
+def unprocessable(fn: Callable[[], Any]) -> Any:
+    """
+    fn() для эндпоинта: ValueError графа (цикл в logic-группах, НЕТ над
+    пустой НЕТ-группой) — 422.
+    """
+    try:
+        return fn()
+    except ValueError as ex:
+        raise HTTPException(status_code=422, detail=str(ex))
+
+# TTL длиннее этого (в символах) отдаётся потоком, но в кэш не кладётся
+TTL_CACHE_MAX_CHARS = 4 * 1024 * 1024
+
+def cached_ttl_chunks(graph: Graph, key: str, style: str = "turtle") -> Iterator[str]:
+    """
+    TTL из кэша одним куском либо потоком из iter_ttl; во втором случае
+    куски копятся по пути и попадают в кэш, если текст не слишком большой.
+    Тройки считаются здесь же, до первого куска: ошибка конвертации
+    поднимается из вызова, а не обрывает уже начатый ответ.
+    """
+    cache_key = (key, "ttl") if style == "turtle" else (key, "ttl", style)
+    text = RESULT_CACHE.get(cache_key)
+    if text is not None:
+        return iter((text,))
+    structural = cached_structural(graph, key)
+    return caching_chunks(iter_ttl(graph, structural, style=style), cache_key)
+
+def caching_chunks(chunks: Iterator[str], cache_key) -> Iterator[str]:
+    parts: Optional[List[str]] = []
+    size = 0
+    for chunk in chunks:
+        if parts is not None:
+            parts.append(chunk)
+            size += len(chunk)
+            if size > TTL_CACHE_MAX_CHARS:
+                parts = None
+        yield chunk
+    if parts is not None:
+        RESULT_CACHE.put(cache_key, "".join(parts))
+
+# XLSX больше этого (в байтах) отдаётся, но в кэш не кладётся
+XLSX_CACHE_MAX_BYTES = 8 * 1024 * 1024
+
+def cached_xlsx(graph: Graph, key: str) -> bytes:
+    data = RESULT_CACHE.get((key, "xlsx"))
+    if data is None:
+        data = triples_to_xlsx_bytes(cached_structural(graph, key)[0], graph)
+        if len(data) <= XLSX_CACHE_MAX_BYTES:
+            RESULT_CACHE.put((key, "xlsx"), data)
+    return data
+
+def etag_matches(request: Request, etag: str) -> bool:
+    inm = request.headers.get("if-none-match")
+    if not inm:
+        return False
+    tags = [t.strip() for t in inm.split(",")]
+    return "*" in tags or etag in tags or f"W/{etag}" in tags
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag})
+
+def attachment_headers(filename: str) -> Dict[str, str]:
+    quoted = quote(filename)
+    if quoted != filename:
+        return {"Content-Disposition": f"attachment; filename*=utf-8''{quoted}"}
+    return {"Content-Disposition": f'attachment; filename="{filename}"'}
+
+
+# ---------------- Batch ----------------
+
+BATCH_FORMATS = ("triples", "ttl", "xlsx")
+
+class BatchRequest(BaseModel):
+    # графы принимаем «сырыми» и валидируем в воркере:
+    # один битый граф не должен ронять весь батч
+    graphs: List[Dict[str, Any]]
+    formats: List[str] = ["triples"]
+
+
+_batch_pool: Optional[ProcessPoolExecutor] = None
+
+def batch_pool() -> ProcessPoolExecutor:
+    global _batch_pool
+    if _batch_pool is None:
+        _batch_pool = ProcessPoolExecutor(max_workers=os.cpu_count() or 1)
+    return _batch_pool
+
+def convert_one(index: int, raw: Dict[str, Any], formats: List[str]) -> Dict[str, Any]:
+    """
+    Конвертация одного графа в воркере процесс-пула.
+    Все ошибки (включая валидацию) возвращаются в результате, а не бросаются.
+    """
+    try:
+        graph = graph_from_dict(raw)
+        structural = generate_structural_triples(graph)
+        triples = structural[0]
+        result: Dict[str, Any] = {"index": index, "doc_id": graph.doc.id}
+        if "triples" in formats:
+            result["triples"] = [t.model_dump() for t in triples]
+        if "ttl" in formats:
+            result["ttl"] = generate_ttl(graph, structural)
+        if "xlsx" in formats:
+            result["xlsx"] = base64.b64encode(triples_to_xlsx_bytes(triples, graph)).decode("ascii")
+        return result
+    except Exception as ex:
+        return {"index": index, "error": f"{type(ex).__name__}: {ex}"}
+
+def iter_batch_ndjson(req: BatchRequest):
+    """
+    Раздаём графы по процессам и отдаём результаты по мере готовности,
+    по одной JSON-строке на граф (порядок — по завершению, см. поле index).
+    """
+    global _batch_pool
+    pool = batch_pool()
+    futures = {pool.submit(convert_one, i, raw, req.formats): i for i, raw in enumerate(req.graphs)}
+    for fut in as_completed(futures):
+        try:
+            result = fut.result()
+        except Exception as ex:
+            # воркер упал (BrokenProcessPool): строка с ошибкой вместо обрыва потока
+            if isinstance(ex, BrokenProcessPool) and _batch_pool is pool:
+                _batch_pool = None
+            result = {"index": futures[fut], "error": f"{type(ex).__name__}: {ex}"}
+        yield json.dumps(result, ensure_ascii=False) + "\n"
+
+
+# ---------------- XLSX jobs ----------------
+
+XLSX_MEDIA_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+XLSX_JOB_WORKERS = int(os.environ.get("XLSX_JOB_WORKERS", "2"))
+XLSX_JOB_QUEUE = int(os.environ.get("XLSX_JOB_QUEUE", "64"))        # незавершённых задач, не больше
+XLSX_JOB_TTL = float(os.environ.get("XLSX_JOB_TTL", "900"))          # секунд после завершения
+XLSX_JOB_DIR = os.environ.get("XLSX_JOB_DIR") or os.path.join(tempfile.gettempdir(), "converter-xlsx-jobs")
+
+# недопустимые в имени листа Excel символы; длина имени — до 31
+_SHEET_BAD = str.maketrans({c: "_" for c in "[]:*?/\\"})
+
+class XlsxJobRequest(BaseModel):
+    graphs: List[Dict[str, Any]]
+    # имена листов (по умолчанию — doc.id графа); несколько графов — несколько листов
+    sheet_names: Optional[List[str]] = None
+
+def sheet_titles(names: Iterable[str]) -> List[str]:
+    """Имена листов, допустимые для Excel и уникальные в книге."""
+    out: List[str] = []
+    used: Set[str] = set()
+    for i, name in enumerate(names):
+        base = (name or f"graph {i + 1}").translate(_SHEET_BAD).strip("' ")[:31] or f"graph {i + 1}"
+        title, k = base, 1
+        while title.lower() in used:
+            k += 1
+            suffix = f" ({k})"
+            title = base[:31 - len(suffix)] + suffix
+        used.add(title.lower())
+        out.append(title)
+    return out
+
+def graphs_to_xlsx(path: str, graphs: List[Any], titles: List[str]) -> int:
+    """
+    Несколько графов — книга с листом на граф (тройки листа считаются,
+    когда до него доходит запись). Возвращает общее число троек.
+    """
+    counts = [0] * len(graphs)
+
+    def rows(i: int, with_header: bool):
+        if with_header:
+            yield XLSX_HEADER
+        triples = generate_structural_triples(graphs[i])[0]
+        counts[i] = len(triples)
+        yield from triples_xlsx_rows(triples, graphs[i])
+
+    extra = {titles[i]: rows(i, True) for i in range(1, len(graphs))}
+    with stage("xlsx"):
+        write_xlsx_rows(path, XLSX_HEADER, rows(0, False), title=titles[0], extra_sheets=extra)
+    return sum(counts)
+
+def run_xlsx_job(raws: List[Dict[str, Any]], titles: List[str], path: str) -> Dict[str, Any]:
+    """Воркер процесс-пула: пишет во временный файл и атомарно переименовывает."""
+    part = path + ".part"
+    try:
+        triples = graphs_to_xlsx(part, [graph_from_dict(r) for r in raws], titles)
+        os.replace(part, path)
+    except BaseException:
+        if os.path.exists(part):
+            os.remove(part)
+        raise
+    return {"triples": triples, "size": os.path.getsize(path)}
+
+class XlsxJob:
+    __slots__ = ("id", "path", "filename", "sheets", "future", "created", "finished", "result", "error")
+
+    def __init__(self, job_id: str, path: str, filename: str, sheets: List[str]):
+        self.id = job_id
+        self.path = path
+        self.filename = filename
+        self.sheets = sheets
+        self.future = None
+        self.created = time.time()
+        self.finished: Optional[float] = None
+        self.result: Optional[Dict[str, Any]] = None
+        self.error: Optional[str] = None
+
+    @property
+    def status(self) -> str:
+        if self.finished is not None:
+            return "error" if self.error else "done"
+        return "running" if self.future is not None and self.future.running() else "queued"
+
+    def info(self) -> Dict[str, Any]:
+        out: Dict[str, Any] = {"job_id": self.id, "status": self.status, "sheets": self.sheets, "created": self.created}
+        if self.finished is not None:
+            out["finished"] = self.finished
+            out["expires"] = self.finished + XLSX_JOB_TTL
+        if self.result:
+            out.update(self.result)
+        if self.error:
+            out["error"] = self.error
+        return out
+
+_xlsx_jobs: Dict[str, XlsxJob] = {}
+_xlsx_jobs_lock = threading.Lock()
+_xlsx_pool: Optional[ProcessPoolExecutor] = None
+
+def xlsx_pool() -> ProcessPoolExecutor:
+    global _xlsx_pool
+    if _xlsx_pool is None:
+        os.makedirs(XLSX_JOB_DIR, exist_ok=True)
+        sweep_xlsx_dir()
+        _xlsx_pool = ProcessPoolExecutor(max_workers=XLSX_JOB_WORKERS)
+        threading.Thread(target=xlsx_janitor, name="xlsx-janitor", daemon=True).start()
+    return _xlsx_pool
+
+def xlsx_janitor() -> None:
+    """
+    Фоновая чистка по таймеру: без неё просроченные файлы лежали бы
+    до следующего запроса к задачам (на тихом сервере — вечно).
+    """
+    period = min(60.0, max(1.0, XLSX_JOB_TTL / 4))
+    while True:
+        time.sleep(period)
+        try:
+            cleanup_xlsx_jobs()
+            sweep_xlsx_dir()
+        except Exception:
+            pass
+
+def sweep_xlsx_dir() -> None:
+    """Файлы прошлых запусков старше TTL (задач для них в памяти уже нет)."""
+    cutoff = time.time() - XLSX_JOB_TTL
+    for name in os.listdir(XLSX_JOB_DIR):
+        p = os.path.join(XLSX_JOB_DIR, name)
+        try:
+            if os.path.getmtime(p) < cutoff:
+                os.remove(p)
+        except OSError:
+            pass
+
+def cleanup_xlsx_jobs(now: Optional[float] = None) -> None:
+    """Удаляет завершённые задачи старше XLSX_JOB_TTL вместе с файлами."""
+    now = time.time() if now is None else now
+    with _xlsx_jobs_lock:
+        expired = [j for j in _xlsx_jobs.values() if j.finished is not None and j.finished + XLSX_JOB_TTL < now]
+        for j in expired:
+            del _xlsx_jobs[j.id]
+    for j in expired:
+        remove_job_file(j)
+
+def remove_job_file(job: XlsxJob) -> None:
+    try:
+        os.remove(job.path)
+    except OSError:
+        pass
+
+def _job_done(job: XlsxJob, fut) -> None:
+    # отменённая задача (DELETE до старта): fut.result() бросил бы CancelledError
+    if fut.cancelled():
+        job.error = "cancelled"
+    else:
+        try:
+            job.result = fut.result()
+        except Exception as ex:
+            job.error = f"{type(ex).__name__}: {ex}"
+    job.finished = time.time()
+    cleanup_xlsx_jobs(job.finished)
+
+def submit_xlsx_job(req: XlsxJobRequest) -> XlsxJob:
+    if not req.graphs:
+        raise HTTPException(status_code=422, detail="graphs: at least one graph expected")
+    # валидируем сразу, чтобы битый запрос не занимал очередь
+    docs = []
+    for i, raw in enumerate(req.graphs):
+        try:
+            docs.append(graph_from_dict(raw).doc)
+        except ValueError as ex:
+            raise HTTPException(status_code=422, detail=f"graphs[{i}]: {ex}")
+    names = list(req.sheet_names or [])
+    names += [d.id for d in docs[len(names):]]
+    titles = sheet_titles(names[:len(docs)])
+
+    cleanup_xlsx_jobs()
+    pool = xlsx_pool()
+    job_id = uuid.uuid4().hex
+    base = (docs[0].id or "triples").replace(" ", "_") if len(docs) == 1 else "triples"
+    job = XlsxJob(job_id, os.path.join(XLSX_JOB_DIR, f"{job_id}.xlsx"), base + ".xlsx", titles)
+    with _xlsx_jobs_lock:
+        pending = sum(1 for j in _xlsx_jobs.values() if j.finished is None)
+        if pending >= XLSX_JOB_QUEUE:
+            raise HTTPException(status_code=429, detail="too many pending xlsx jobs")
+        _xlsx_jobs[job_id] = job
+    job.future = pool.submit(run_xlsx_job, req.graphs, titles, job.path)
+    job.future.add_done_callback(lambda fut: _job_done(job, fut))
+    return job
+
+def get_xlsx_job(job_id: str) -> XlsxJob:
+    cleanup_xlsx_jobs()
+    with _xlsx_jobs_lock:
+        job = _xlsx_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="job not found")
+    return job
+
+
+# ---------------- Triple store ----------------
+
+# файл SQLite с тройками (core.triple_store); открывается при первом обращении
+TRIPLE_STORE_PATH = os.environ.get("TRIPLE_STORE", "triples.sqlite")
+
+_triple_store: Optional[TripleStore] = None
+_triple_store_lock = threading.Lock()
+
+def triple_store() -> TripleStore:
+    global _triple_store
+    with _triple_store_lock:
+        if _triple_store is None:
+            _triple_store = TripleStore(TRIPLE_STORE_PATH)
+        return _triple_store
+
+
+# ---------------- Incremental sessions ----------------
+
+# сколько живых сессий редактора держим (самые старые вытесняются)
+SESSION_LIMIT = 256
+
+class GraphDelta(BaseModel):
+    add_nodes: List[Node] = []
+    update_nodes: List[Node] = []     # полная замена узла по id
+    remove_nodes: List[str] = []      # вместе с узлом удаляются его рёбра
+    add_links: List[Link] = []        # (source, target) уже есть — заменяется
+    remove_links: List[Link] = []     # по паре (source, target)
+
+
+class SessionTriples(BaseModel):
+    session_id: str
+    version: int
+    triples: List[Triple]
+
+
+class TriplesDelta(BaseModel):
+    session_id: str
+    version: int
+    added: List[Triple]
+    removed: List[Triple]
+
+
+TKey = Tuple[str, str, str]
+
+
+class GraphSession:
+    """
+    Живое состояние графа из редактора.
+
+    Тройки хранятся счётчиками по частям, из которых их собирает
+    structural_triples_from_index: шапка (диагноз, методы), роль на ребре,
+    литералы критерия и строки логической структуры logic-узла. Правка
+    пересчитывает только части изменённых узлов и рёбер; NNF-поддеревья
+    и их строки кэшируются по logic-узлам, сбрасываются изменённые узлы
+    и их предки. Строки узла учитываются, пока узел достижим из якоря
+    критериев (счётчик ссылок). Якоря (reach_flags, линейный проход)
+    ищутся заново только при правке структуры — удалении, новых рёбрах
+    между старыми узлами, смене типа; добавленные поддеревья из новых
+    узлов дополняют флаги на месте (_grow). Наружу отдаётся разница
+    троек с предыдущей версией.
+    """
+
+    def __init__(self, graph: Graph):
+        self.doc = graph.doc
+        self.nodes_by_id, self.out_edges, self.in_edges = build_index(graph)
+        self.links: Dict[Tuple[str, str], Link] = {}
+        for l in graph.links:
+            self.links[(l.source, l.target)] = l
+        self.version = 0
+        self.lock = threading.Lock()
+        self.stale = False
+        self._before: Optional[Dict[TKey, int]] = None
+        self.rebuild()
+
+    @property
+    def triples(self) -> List[Triple]:
+        return [Triple(subject=s, predicate=p, object=o) for s, p, o in self.counts]
+
+    # --- счётчики троек ---
+
+    def _add(self, keys: Iterable[TKey]) -> None:
+        counts, before = self.counts, self._before
+        for k in keys:
+            c = counts.get(k, 0)
+            if before is not None and k not in before:
+                before[k] = c
+            counts[k] = c + 1
+
+    def _sub(self, keys: Iterable[TKey]) -> None:
+        counts, before = self.counts, self._before
+        for k in keys:
+            c = counts[k]
+            if before is not None and k not in before:
+                before[k] = c
+            if c == 1:
+                del counts[k]
+            else:
+                counts[k] = c - 1
+
+    def _set_part(self, key: tuple, rows: List[TKey]) -> None:
+        old = self.parts.pop(key, None)
+        if old:
+            self._sub(old)
+        if rows:
+            self.parts[key] = rows
+            self._add(rows)
+
+    # --- части вне логической структуры ---
+
+    def _label(self, node_id: str) -> str:
+        n = self.nodes_by_id.get(node_id)
+        return (n.label if n else None) or node_id
+
+    def _find_anchors(self) -> None:
+        nodes, out = self.nodes_by_id, self.out_edges
+        root = find_root(nodes)
+        self.root_id: Optional[str] = root.id if root else None
+        self.anchor_id: Optional[str] = None
+        self.methods_anchor_id: Optional[str] = None
+        self.method_ids: List[str] = []
+        self.flags: Dict[str, int] = {}
+        self.dist: Optional[Dict[str, int]] = None   # от methods_anchor, считается по надобности
+        if not root:
+            return
+        self.flags = flags = reach_flags(nodes, out)
+        methods_anchor = find_methods_anchor(root, nodes, out, flags)
+        criteria_anchor = find_criteria_anchor(methods_anchor, nodes, out, flags)
+        desc = descendants_of(methods_anchor.id, out) | {methods_anchor.id}
+        self.method_ids = [nid for nid in desc if nid in nodes and nodes[nid].type == "method"]
+        if not self.method_ids:
+            self.method_ids = [n.id for n in nodes.values() if n.type == "method"]
+        self.methods_anchor_id = methods_anchor.id
+        self.anchor_id = criteria_anchor.id if criteria_anchor else None
+
+    def _grow(self, new: Set[str]) -> bool:
+        """
+        Правка только дорастила граф новыми узлами (не root и не method),
+        рёбра из которых ведут лишь в новые узлы. Тогда флаги reach_flags
+        дополняются на месте (новым узлам и предкам, получившим критерии),
+        расстояния старых узлов не меняются, и якоря остаются прежними, если
+        ни одна logic-группа с новым флагом критериев не ближе якоря критериев.
+        False — нужен полный поиск якорей.
+        """
+        if self.anchor_id is None:
+            return False
+        nodes, out, flags = self.nodes_by_id, self.out_edges, self.flags
+        # новые узлы в обратном топологическом порядке (потомки раньше)
+        order: List[str] = []
+        state: Dict[str, int] = {}
+        for start in new:
+            if start in state:
+                continue
+            state[start] = 1
+            work: List[Tuple[str, int]] = [(start, 0)]
+            while work:
+                v, i = work[-1]
+                edges = out.get(v, [])
+                if i < len(edges):
+                    work[-1] = (v, i + 1)
+                    w = edges[i].target
+                    if state.get(w) == 1:
+                        return False   # цикл среди новых узлов
+                    if w not in state:
+                        state[w] = 1
+                        work.append((w, 0))
+                    continue
+                work.pop()
+                state[v] = 2
+                order.append(v)
+
+        flagged: List[str] = []
+        for v in order:
+            f = 0
+            for e in out.get(v, []):
+                f |= flags[e.target] | (REACH_CRITERIA if nodes[e.target].type == "criteria" else 0)
+            flags[v] = f
+            if f & REACH_CRITERIA and nodes[v].type == "logic":
+                flagged.append(v)
+        # критерии под старыми узлами: флаг поднимается к предкам, у которых его не было
+        up = [
+            e.source for v in new for e in self.in_edges.get(v, [])
+            if e.source not in new and (flags[v] & REACH_CRITERIA or nodes[v].type == "criteria")
+        ]
+        while up:
+            x = up.pop()
+            if flags.get(x, 0) & REACH_CRITERIA:
+                continue
+            flags[x] = flags.get(x, 0) | REACH_CRITERIA
+            n = nodes.get(x)
+            if n is not None and n.type == "logic":
+                flagged.append(x)
+            up.extend(e.source for e in self.in_edges.get(x, []))
+        dist = self.dist
+        if dist is not None:
+            for v in reversed(order):
+                ds = [dist[e.source] for e in self.in_edges.get(v, []) if e.source in dist]
+                if ds:
+                    dist[v] = min(ds) + 1
+        if not flagged:
+            return True
+        if dist is None:
+            dist = self.dist = distance_bfs(self.methods_anchor_id, out)
+        anchor = self.anchor_id
+        if nodes[anchor].type != "logic":
+            # якорь — сам methods_anchor: logic-кандидатов не было
+            return not any(n in dist for n in flagged)
+        return not any(n in dist and dist[n] <= dist[anchor] for n in flagged)
+
+    @property
+    def mode(self) -> Tuple[bool, bool]:
+        return (self.root_id is not None, self.anchor_id is not None)
+
+    def _head(self) -> None:
+        rows: List[TKey] = []
+        if self.root_id is not None:
+            root_label = self.nodes_by_id[self.root_id].label or "Диагноз"
+            methods = [self._label(m) for m in self.method_ids]
+            rows.append(("пациенты", P_DIAGNOSIS, root_label))
+            rows.extend((root_label, P_RECOMMENDED, m) for m in methods)
+            if self.anchor_id is not None:
+                group = self.nodes_by_id[self.anchor_id].label or "Условия"
+                rows.extend((m, P_USED, group) for m in methods)
+        self._set_part(("head",), list(dict.fromkeys(rows)))
+
+    def _role(self, pair: Tuple[str, str]) -> None:
+        rows: List[TKey] = []
+        link = self.links.get(pair)
+        if link is not None and self.anchor_id is not None:
+            role = (link.predicate or "").strip()
+            g = self.nodes_by_id.get(pair[0])
+            c = self.nodes_by_id.get(pair[1])
+            if role in ROLE_PREDS and g and c and g.type == "logic" and c.type == "criteria":
+                rows.append((g.label or g.id, role, c.label or c.id))
+        self._set_part(("role",) + pair, rows)
+
+    def _lit(self, node_id: str) -> None:
+        rows: List[TKey] = []
+        n = self.nodes_by_id.get(node_id)
+        if n is not None and n.type == "criteria" and self.root_id is not None:
+            label = n.label or n.id
+            if self.anchor_id is None:
+                # как в structural_triples_from_index без якоря критериев
+                if n.value:
+                    rows.append((label, P_VALUE, str(n.value)))
+                if n.note:
+                    rows.append((label, P_NOTE, str(n.note)))
+            else:
+                if n.value not in (None, ""):
+                    rows.append((label, P_VALUE, str(n.value)))
+                if n.note not in (None, ""):
+                    rows.append((label, P_NOTE, str(n.note)))
+        self._set_part(("lit", node_id), rows)
+
+    # --- логическая структура ---
+
+    def operands(self, node_id: str) -> List[str]:
+        ids = []
+        for e in self.out_edges.get(node_id, []):
+            tnode = self.nodes_by_id.get(e.target)
+            if tnode and tnode.type in ("logic", "criteria"):
+                ids.append(e.target)
+        return ids
+
+    def _put(self, node_id: str, ex: Expr) -> None:
+        """
+        Запись кэша узла: выражение, строки export_expr_rows по собственным
+        Op-узлам выражения и узлы, чьи выражения в него входят готовыми.
+        """
+        rows: List[TKey] = []
+        uses: List[str] = []
+        if isinstance(ex, Op):
+            label = self._label
+            seen = {id(ex)}
+            stack = [ex]
+            while stack:
+                e = stack.pop()
+                subj, pred = label(e.logic_node_id), op_pred(e.op)
+                for a in e.args:
+                    if isinstance(a, Leaf):
+                        rows.append((subj, pred, label(a.crit_node_id)))
+                    elif isinstance(a, Op):
+                        rows.append((subj, pred, label(a.logic_node_id)))
+                        owner = self.owner.get(id(a))
+                        if owner is not None:
+                            uses.append(owner)
+                        elif id(a) not in seen:
+                            seen.add(id(a))
+                            stack.append(a)
+        self.entries[node_id] = (ex, list(dict.fromkeys(rows)), uses)
+        self.owner[id(ex)] = node_id
+
+    def expr(self, node_id: str) -> Optional[Expr]:
+        """
+        Как build_criteria_expr + nnf, но с кэшем по узлу: недостающие записи
+        строятся снизу вверх явным стеком; цикл в logic-группах — ValueError.
+        """
+        node = self.nodes_by_id.get(node_id)
+        if not node or node.type not in ("logic", "criteria"):
+            return None
+        entries = self.entries
+        in_progress: Set[str] = set()
+        stack: List[list] = []   # [node_id, operand ids, next operand index]
+
+        def enter(nid: str) -> None:
+            if nid in entries:
+                return
+            if self.nodes_by_id[nid].type == "criteria":
+                self._put(nid, Leaf(nid))
+                return
+            if nid in in_progress:
+                raise ValueError(f"cycle in logic groups at {nid}")
+            in_progress.add(nid)
+            stack.append([nid, self.operands(nid), 0])
+
+        enter(node_id)
+        while stack:
+            frame = stack[-1]
+            nid, children, i = frame
+            while i < len(children) and children[i] in entries:
+                i += 1
+            frame[2] = i
+            if i < len(children):
+                enter(children[i])
+                continue
+            stack.pop()
+            in_progress.discard(nid)
+            op = normalize_op(self.nodes_by_id[nid].label)
+            self._put(nid, nnf_combine(op, [entries[c][0] for c in children], nid))
+        return entries[node_id][0]
+
+    def _activate(self, node_id: str) -> None:
+        stack = [node_id]
+        while stack:
+            x = stack.pop()
+            r = self.refs.get(x, 0) + 1
+            self.refs[x] = r
+            if r == 1:
+                _, rows, uses = self.entries[x]
+                self._add(rows)
+                stack.extend(uses)
+
+    def _deactivate(self, node_id: str) -> None:
+        stack = [node_id]
+        while stack:
+            x = stack.pop()
+            r = self.refs[x] - 1
+            if r:
+                self.refs[x] = r
+                continue
+            del self.refs[x]
+            _, rows, uses = self.entries[x]
+            self._sub(rows)
+            stack.extend(uses)
+
+    def _drop(self, nodes: Set[str]) -> List[str]:
+        """
+        Сбрасывает записи nodes (изменённые узлы и их предки). Все, кто
+        ссылается на запись, — тоже предки, поэтому счётчики ссылок на nodes
+        обнуляются целиком; ссылки на узлы вне nodes возвращаются списком —
+        их снимают после пересборки, чтобы живые поддеревья не пересчитывались.
+        """
+        pending: List[str] = []
+        for x in nodes:
+            entry = self.entries.pop(x, None)
+            if entry is None:
+                continue
+            ex, rows, uses = entry
+            self.owner.pop(id(ex), None)
+            if self.refs.pop(x, 0):
+                self._sub(rows)
+                pending.extend(u for u in uses if u not in nodes)
+        if self.active_root in nodes:
+            self.active_root = None
+        return pending
+
+    def _expr_root(self, pending: List[str]) -> None:
+        anchor = None
+        if self.anchor_id is not None and self.nodes_by_id[self.anchor_id].type in ("logic", "criteria"):
+            anchor = self.anchor_id
+        if self.active_root is not None and self.active_root != anchor:
+            pending.append(self.active_root)
+            self.active_root = None
+        if anchor is not None and self.active_root is None:
+            self.expr(anchor)
+            self._activate(anchor)
+            self.active_root = anchor
+        for u in pending:
+            self._deactivate(u)
+
+    # --- пересчёт ---
+
+    def rebuild(self) -> None:
+        """Все части с нуля (открытие сессии, восстановление после ошибки)."""
+        self.counts: Dict[TKey, int] = {}
+        self.parts: Dict[tuple, List[TKey]] = {}
+        self.entries: Dict[str, Tuple[Expr, List[TKey], List[str]]] = {}
+        self.owner: Dict[int, str] = {}
+        self.refs: Dict[str, int] = {}
+        self.active_root: Optional[str] = None
+        self._find_anchors()
+        self._head()
+        for pair in self.links:
+            self._role(pair)
+        for nid in self.nodes_by_id:
+            self._lit(nid)
+        self._expr_root([])
+
+    def refresh(
+        self, dirty: Set[str], changed: Set[str], pairs: Set[Tuple[str, str]],
+        structural: bool, grown: Optional[Set[str]] = None,
+    ) -> None:
+        pending = self._drop(self.invalidate(dirty))
+        old_mode = self.mode
+        if structural and not (grown is not None and self._grow(grown)):
+            self._find_anchors()
+        self._head()
+        if self.mode != old_mode:
+            pairs = set(self.links) | {k[1:] for k in self.parts if k[0] == "role"}
+            dirty = set(self.nodes_by_id) | dirty
+        else:
+            pairs = set(pairs)
+            for nid in changed:
+                pairs.update((e.source, nid) for e in self.in_edges.get(nid, []))
+                pairs.update((nid, e.target) for e in self.out_edges.get(nid, []))
+        for pair in pairs:
+            self._role(pair)
+        for nid in dirty:
+            self._lit(nid)
+        self._expr_root(pending)
+
+    def invalidate(self, dirty: Set[str]) -> Set[str]:
+        q = deque(dirty)
+        seen = set(dirty)
+        while q:
+            x = q.popleft()
+            for e in self.in_edges.get(x, []):
+                if e.source not in seen:
+                    seen.add(e.source)
+                    q.append(e.source)
+        return seen
+
+    # --- правки ---
+
+    def remove_link(self, source: str, target: str, dirty: Set[str], pairs: Set[Tuple[str, str]]) -> None:
+        if self.links.pop((source, target), None) is None:
+            return
+        self.out_edges[source] = [e for e in self.out_edges.get(source, []) if e.target != target]
+        self.in_edges[target] = [e for e in self.in_edges.get(target, []) if e.source != source]
+        dirty.add(source)
+        pairs.add((source, target))
+
+    def add_link(self, link: Link, dirty: Set[str], pairs: Set[Tuple[str, str]]) -> None:
+        self.remove_link(link.source, link.target, dirty, pairs)
+        self.links[(link.source, link.target)] = link
+        self.out_edges[link.source].append(link)
+        self.in_edges[link.target].append(link)
+        dirty.add(link.source)
+        pairs.add((link.source, link.target))
+
+    def remove_node(self, node_id: str, dirty: Set[str], pairs: Set[Tuple[str, str]]) -> None:
+        for e in list(self.in_edges.get(node_id, [])):
+            self.remove_link(e.source, node_id, dirty, pairs)
+        for e in list(self.out_edges.get(node_id, [])):
+            self.remove_link(node_id, e.target, dirty, pairs)
+        self.nodes_by_id.pop(node_id, None)
+        self.out_edges.pop(node_id, None)
+        self.in_edges.pop(node_id, None)
+        dirty.add(node_id)
+
+    def grown(self, delta: GraphDelta) -> Optional[Set[str]]:
+        """Новые узлы, если правка только доращивает граф (см. _grow), иначе None."""
+        if delta.remove_nodes or delta.remove_links:
+            return None
+        new = {n.id for n in delta.add_nodes}
+        if len(new) != len(delta.add_nodes):
+            return None
+        if any(n.id in self.nodes_by_id or n.type in ("root", "method") for n in delta.add_nodes):
+            return None
+        for n in delta.update_nodes:
+            old = self.nodes_by_id.get(n.id)
+            if old is None or old.type != n.type or n.id in new:
+                return None
+        for l in delta.add_links:
+            if l.target not in new or (l.source not in new and l.source not in self.nodes_by_id):
+                return None
+        return new
+
+    def apply(self, delta: GraphDelta) -> Tuple[List[Triple], List[Triple]]:
+        with self.lock:
+            dirty: Set[str] = set()
+            pairs: Set[Tuple[str, str]] = set()
+            structural = bool(delta.remove_nodes or delta.add_nodes or delta.remove_links or delta.add_links)
+            grown = self.grown(delta) if structural else None
+            for nid in delta.remove_nodes:
+                self.remove_node(nid, dirty, pairs)
+            for l in delta.remove_links:
+                self.remove_link(l.source, l.target, dirty, pairs)
+            for n in delta.add_nodes + delta.update_nodes:
+                old = self.nodes_by_id.get(n.id)
+                if old is None or old.type != n.type:
+                    structural = True
+                self.nodes_by_id[n.id] = n
+                dirty.add(n.id)
+            for l in delta.add_links:
+                self.add_link(l, dirty, pairs)
+            changed = {n.id for n in delta.add_nodes + delta.update_nodes}
+
+            if self.stale:
+                # прошлая правка упала посередине: части собираем заново
+                old = self.counts
+                try:
+                    self.rebuild()
+                except BaseException:
+                    self.counts = old
+                    raise
+                before = dict(old)
+                for k in self.counts:
+                    before.setdefault(k, 0)
+                self.stale = False
+            else:
+                self._before = before = {}
+                try:
+                    self.refresh(dirty, changed, pairs, structural, grown)
+                except BaseException:
+                    # счётчики — к прошлой версии, части пересоберёт следующая правка
+                    for k, c in before.items():
+                        if c:
+                            self.counts[k] = c
+                        else:
+                            self.counts.pop(k, None)
+                    self.stale = True
+                    raise
+                finally:
+                    self._before = None
+
+            self.version += 1
+            counts = self.counts
+            added = [Triple(subject=s, predicate=p, object=o) for (s, p, o), c in before.items() if not c and (s, p, o) in counts]
+            removed = [Triple(subject=s, predicate=p, object=o) for (s, p, o), c in before.items() if c and (s, p, o) not in counts]
+            return added, removed
+
+
+_sessions: "OrderedDict[str, GraphSession]" = OrderedDict()
+_sessions_lock = threading.Lock()
+
+def open_session(graph: Graph) -> Tuple[str, GraphSession]:
+    sess = GraphSession(graph)
+    sid = uuid.uuid4().hex
+    with _sessions_lock:
+        _sessions[sid] = sess
+        while len(_sessions) > SESSION_LIMIT:
+            _sessions.popitem(last=False)
+    return sid, sess
+
+def get_session(sid: str) -> GraphSession:
+    with _sessions_lock:
+        sess = _sessions.get(sid)
+        if sess is None:
+            raise HTTPException(status_code=404, detail="session not found")
+        _sessions.move_to_end(sid)
+        return sess
+
 
 # ---------------- FastAPI ----------------
 
@@ -592,26 +1728,226 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.middleware("http")
+async def metrics_middleware(request: Request, call_next):
+    """Время запроса до начала ответа по шаблону маршрута; Server-Timing по желанию."""
+    if not metrics.ENABLED:
+        return await call_next(request)
+    timings: Optional[Dict[str, float]] = {} if metrics.SERVER_TIMING else None
+    token = metrics.request_timings.set(timings)
+    t0 = time.perf_counter()
+    try:
+        response = await call_next(request)
+    finally:
+        metrics.request_timings.reset(token)
+    total = time.perf_counter() - t0
+    route = request.scope.get("route")
+    metrics.observe_request(request.method, getattr(route, "path", "unmatched"), total)
+    if timings is not None:
+        response.headers["Server-Timing"] = metrics.server_timing(timings, total)
+    return response
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def api_metrics():
+    text = metrics.render({"converter_result_cache": RESULT_CACHE.stats(), "converter_iri_cache": iri_cache_stats()})
+    return PlainTextResponse(text, media_type="text/plain; version=0.0.4; charset=utf-8")
+
 @app.get("/")
 def root():
     return {"status": "ok", "message": "unified converter API is running"}
 
-@app.post("/api/graph/to-triples", response_model=List[Triple])
-def api_graph_to_triples(graph: Graph = Body(...)) -> List[Triple]:
-    triples, _, _ = generate_structural_triples(graph)
+# Результаты кэшируются по хэшу содержимого графа; тот же хэш отдаётся
+# как ETag, и If-None-Match с ним даёт 304 без пересчёта.
+
+async def read_graph(request: Request) -> FastGraph:
+    """
+    Тело запроса -> FastGraph (api.fastjson) в обход pydantic:
+    поля раскладки не разбираются. Ошибка разбора — 422.
+    """
+    try:
+        body = await request.body()
+        with stage("decode"):
+            return decode_graph(body)
+    except ValueError as ex:
+        raise HTTPException(status_code=422, detail=str(ex))
+
+# тело read_graph-эндпоинтов в OpenAPI описываем схемой Graph
+GRAPH_BODY_DOC = {
+    "requestBody": {
+        "required": True,
+        "content": {"application/json": {"schema": {"$ref": "#/components/schemas/Graph"}}},
+    }
+}
+
+@app.post("/api/graph/to-triples", response_model=List[Triple], openapi_extra=GRAPH_BODY_DOC)
+def api_graph_to_triples(request: Request, response: Response, graph: FastGraph = Depends(read_graph)):
+    key = graph_hash(graph)
+    etag = f'"{key}"'
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    triples, _, _ = unprocessable(lambda: cached_structural(graph, key))
+    response.headers["ETag"] = etag
     return triples
 
-@app.post("/api/graph/to-ttl", response_class=PlainTextResponse)
-def api_graph_to_ttl(graph: Graph = Body(...)) -> str:
-    return generate_ttl(graph)
+@app.post("/api/graph/to-ttl", response_class=PlainTextResponse, openapi_extra=GRAPH_BODY_DOC)
+def api_graph_to_ttl(
+    request: Request,
+    graph: FastGraph = Depends(read_graph),
+    style: str = Query("turtle"),
+    gzip: bool = Query(False),
+):
+    """
+    style: turtle | compact | ntriples; gzip=true — файл .ttl.gz / .nt.gz
+    (сжатие потоковое, поверх тех же кусков текста).
+    """
+    if style not in TTL_STYLES:
+        raise HTTPException(status_code=422, detail=f"unknown style: {style}")
+    key = graph_hash(graph)
+    etag = f'"{key}"' if style == "turtle" else f'"{key}-{style}"'
+    if gzip:
+        etag = etag[:-1] + '-gz"'
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    # тройки — до статуса 200: ошибка графа приходит кодом ответа, а не обрывом потока
+    chunks = unprocessable(lambda: cached_ttl_chunks(graph, key, style))
+    if not gzip:
+        return StreamingResponse(chunks, media_type="text/plain; charset=utf-8", headers={"ETag": etag})
+    ext = "nt" if style == "ntriples" else "ttl"
+    filename = (graph.doc.id or "graph").replace(" ", "_") + f".{ext}.gz"
+    return StreamingResponse(
+        gzip_chunks(chunks),
+        media_type="application/gzip",
+        headers={"ETag": etag, **attachment_headers(filename)},
+    )
 
-@app.post("/api/graph/to-triples-xlsx")
-def api_graph_to_triples_xlsx(graph: Graph = Body(...)):
-    triples, _, _ = generate_structural_triples(graph)
-    path = triples_to_xlsx(triples, graph)
+@app.post("/api/graph/to-triples-xlsx", openapi_extra=GRAPH_BODY_DOC)
+def api_graph_to_triples_xlsx(request: Request, graph: FastGraph = Depends(read_graph)):
+    key = graph_hash(graph)
+    etag = f'"{key}"'
+    if etag_matches(request, etag):
+        return not_modified(etag)
     filename = (graph.doc.id or "triples").replace(" ", "_") + ".xlsx"
-    return FileResponse(
-        path,
-        media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-        filename=filename,
+    return Response(
+        unprocessable(lambda: cached_xlsx(graph, key)),
+        media_type=XLSX_MEDIA_TYPE,
+        headers={"ETag": etag, **attachment_headers(filename)},
     )
+
+@app.post("/api/xlsx/jobs", status_code=202)
+def api_xlsx_job_submit(req: XlsxJobRequest = Body(...)):
+    """
+    Экспорт в XLSX в фоне: ответ сразу, {"job_id", "status", ...}.
+    Несколько графов — одна книга, лист на граф.
+    Готовый файл — GET /api/xlsx/jobs/{id}/download, хранится XLSX_JOB_TTL секунд.
+    """
+    return submit_xlsx_job(req).info()
+
+@app.get("/api/xlsx/jobs/{job_id}")
+def api_xlsx_job_status(job_id: str):
+    return get_xlsx_job(job_id).info()
+
+@app.get("/api/xlsx/jobs/{job_id}/download")
+def api_xlsx_job_download(job_id: str):
+    job = get_xlsx_job(job_id)
+    if job.status == "error":
+        raise HTTPException(status_code=500, detail=job.error)
+    if job.status != "done":
+        raise HTTPException(status_code=409, detail=f"job is {job.status}")
+    return FileResponse(job.path, media_type=XLSX_MEDIA_TYPE, headers=attachment_headers(job.filename))
+
+@app.delete("/api/xlsx/jobs/{job_id}")
+def api_xlsx_job_delete(job_id: str):
+    job = get_xlsx_job(job_id)
+    if job.finished is None and not job.future.cancel():
+        raise HTTPException(status_code=409, detail="job is running")
+    with _xlsx_jobs_lock:
+        _xlsx_jobs.pop(job_id, None)
+    remove_job_file(job)
+    return {"status": "ok"}
+
+async def read_body(request: Request) -> bytes:
+    return await request.body()
+
+@app.post("/api/xlsx/import")
+def api_xlsx_import(doc_id: str = Query(""), body: bytes = Depends(read_body)):
+    """
+    Обратный импорт: тело — XLSX-книга троек (попарная таблица, как triplets/*.xlsx),
+    ответ — {"graphs": [{"sheet", "graph"}]} (лист — граф, с раскладкой для редактора).
+    """
+    from .xlsx_import import xlsx_bytes_to_graphs
+
+    try:
+        graphs = xlsx_bytes_to_graphs(body, doc_id)
+    except Exception as ex:
+        raise HTTPException(status_code=422, detail=f"{type(ex).__name__}: {ex}")
+    return {"graphs": [{"sheet": title, "graph": g.model_dump()} for title, g in graphs]}
+
+@app.get("/api/triples/query")
+def api_triples_query(
+    s: Optional[str] = Query(None, description="субъект"),
+    p: Optional[str] = Query(None, description="предикат"),
+    o: Optional[str] = Query(None, description="объект"),
+    doc: Optional[str] = Query(None),
+    source: Optional[str] = Query(None, description="источник загрузки"),
+    limit: int = Query(100, ge=1, le=QUERY_LIMIT),
+    cursor: int = Query(0, ge=0, description="next из предыдущей страницы"),
+):
+    """
+    Тройки хранилища по шаблону (пустой параметр — любое значение):
+    {"items": [...], "next": курсор следующей страницы или null}.
+    """
+    with stage("store_query"):
+        rows, nxt = triple_store().query(s, p, o, doc, source, limit, cursor)
+    return {
+        "items": [
+            {"subject": r.subject, "predicate": r.predicate, "object": r.object,
+             "doc": r.doc, "page": r.page, "rec_text": r.rec_text}
+            for r in rows
+        ],
+        "next": nxt,
+    }
+
+@app.post("/api/triples/load", openapi_extra=GRAPH_BODY_DOC)
+def api_triples_load(source: Optional[str] = Query(None), graph: FastGraph = Depends(read_graph)):
+    """
+    Структурные тройки графа -> хранилище под источником source
+    (по умолчанию — хэш графа); прежние строки источника заменяются.
+    """
+    key = graph_hash(graph)
+    triples, _, _ = unprocessable(lambda: cached_structural(graph, key))
+    source = source or key
+    with stage("store_load"):
+        n = emit_store(triple_store(), GraphFrontend().units(graph, triples), source)
+    return {"source": source, "triples": n}
+
+@app.post("/api/graphs/batch")
+def api_graphs_batch(req: BatchRequest = Body(...)):
+    """
+    Пакетная конвертация: NDJSON-поток, по строке на граф:
+    {"index", "doc_id", "triples"?, "ttl"?, "xlsx"? (base64)} или {"index", "error"}.
+    Неизвестный формат в formats — 422.
+    """
+    unknown = [f for f in req.formats if f not in BATCH_FORMATS]
+    if unknown:
+        raise HTTPException(status_code=422, detail=f"unknown formats {unknown}, expected {list(BATCH_FORMATS)}")
+    return StreamingResponse(iter_batch_ndjson(req), media_type="application/x-ndjson")
+
+
+@app.post("/api/graph/session", response_model=SessionTriples)
+def api_graph_session_open(graph: Graph = Body(...)) -> SessionTriples:
+    """Открыть инкрементальную сессию: полный граф -> все тройки + session_id."""
+    sid, sess = unprocessable(lambda: open_session(graph))
+    return SessionTriples(session_id=sid, version=sess.version, triples=sess.triples)
+
+@app.post("/api/graph/session/{session_id}/delta", response_model=TriplesDelta)
+def api_graph_session_delta(session_id: str, delta: GraphDelta = Body(...)) -> TriplesDelta:
+    """Применить правки узлов/рёбер, вернуть только добавленные и удалённые тройки."""
+    sess = get_session(session_id)
+    added, removed = unprocessable(lambda: sess.apply(delta))
+    return TriplesDelta(session_id=session_id, version=sess.version, added=added, removed=removed)
+
+@app.delete("/api/graph/session/{session_id}")
+def api_graph_session_close(session_id: str):
+    with _sessions_lock:
+        _sessions.pop(session_id, None)
+    return {"status": "ok"}
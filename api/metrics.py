@@ -0,0 +1,200 @@
+"""
+Метрики конвертера: таймеры стадий -> гистограммы, вывод в формате Prometheus.
+
+    with stage("nnf"):
+        expr = nnf(expr)
+
+CONVERTER_METRICS=0 — таймеры выключены: stage() отдаёт общий пустой
+контекстный менеджер, timed_iter() — сам итератор.
+CONVERTER_SERVER_TIMING=1 — стадии, пройденные до отправки заголовков
+ответа, дописываются в заголовок Server-Timing.
+
+Счётчики живут в процессе: стадии воркеров /api/graphs/batch сюда не попадают.
+"""
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, TypeVar
+
+ENABLED = os.environ.get("CONVERTER_METRICS", "1") != "0"
+SERVER_TIMING = ENABLED and os.environ.get("CONVERTER_SERVER_TIMING", "0") == "1"
+
+# границы корзин, секунды
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+T = TypeVar("T")
+
+
+class Histogram:
+    __slots__ = ("counts", "sum", "count")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)   # последняя — +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(BUCKETS, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+_lock = threading.Lock()
+_stages: Dict[str, Histogram] = {}
+_requests: Dict[Tuple[str, str], Histogram] = {}
+
+# длительности стадий текущего запроса (для Server-Timing); None — не собираем
+request_timings: ContextVar[Optional[Dict[str, float]]] = ContextVar("request_timings", default=None)
+
+
+def observe_stage(name: str, seconds: float) -> None:
+    with _lock:
+        h = _stages.get(name)
+        if h is None:
+            h = _stages[name] = Histogram()
+        h.observe(seconds)
+    timings = request_timings.get()
+    if timings is not None:
+        timings[name] = timings.get(name, 0.0) + seconds
+
+
+def observe_request(method: str, path: str, seconds: float) -> None:
+    with _lock:
+        h = _requests.get((method, path))
+        if h is None:
+            h = _requests[(method, path)] = Histogram()
+        h.observe(seconds)
+
+
+class _Timer:
+    __slots__ = ("name", "t0")
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        observe_stage(self.name, time.perf_counter() - self.t0)
+        return False
+
+
+class _NoTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NO_TIMER = _NoTimer()
+
+
+def stage(name: str):
+    """Контекстный менеджер, замеряющий стадию name."""
+    return _Timer(name) if ENABLED else _NO_TIMER
+
+
+def timed_iter(name: str, it: Iterable[T]) -> Iterable[T]:
+    """
+    Для ленивых стадий (генераторы TTL): суммирует время внутри next(),
+    без времени потребителя. Замер уходит в гистограмму по окончании обхода.
+    """
+    if not ENABLED:
+        return it
+    return _timed_iter(name, iter(it))
+
+
+def _timed_iter(name: str, it: Iterator[T]) -> Iterator[T]:
+    total = 0.0
+    perf = time.perf_counter
+    try:
+        while True:
+            t0 = perf()
+            try:
+                item = next(it)
+            except StopIteration:
+                total += perf() - t0
+                return
+            total += perf() - t0
+            yield item
+    finally:
+        observe_stage(name, total)
+
+
+def server_timing(timings: Dict[str, float], total: float) -> str:
+    parts = [f"{name};dur={sec * 1000:.3f}" for name, sec in timings.items()]
+    parts.append(f"total;dur={total * 1000:.3f}")
+    return ", ".join(parts)
+
+
+def _label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _snapshot(hists: Dict) -> List[Tuple]:
+    return [(k, list(h.counts), h.sum, h.count) for k, h in sorted(hists.items())]
+
+
+def _histogram_lines(name: str, labels: str, counts: List[int], total: float, count: int) -> List[str]:
+    lines = []
+    acc = 0
+    for le, c in zip(BUCKETS + (float("inf"),), counts):
+        acc += c
+        le_s = "+Inf" if le == float("inf") else repr(le)
+        lines.append(f'{name}_bucket{{{labels},le="{le_s}"}} {acc}')
+    lines.append(f"{name}_sum{{{labels}}} {total!r}")
+    lines.append(f"{name}_count{{{labels}}} {count}")
+    return lines
+
+
+COUNTER_KEYS = {"hits", "misses"}
+
+
+def render(gauges: Optional[Dict[str, Dict[str, int]]] = None) -> str:
+    """
+    Текст для /metrics (Prometheus text format 0.0.4).
+    gauges — {префикс: {имя: значение}}, например статистика кэшей.
+    """
+    with _lock:
+        stages = _snapshot(_stages)
+        requests = _snapshot(_requests)
+
+    lines = [
+        "# HELP converter_stage_seconds Time spent in conversion stages.",
+        "# TYPE converter_stage_seconds histogram",
+    ]
+    for name, *h in stages:
+        lines.extend(_histogram_lines("converter_stage_seconds", f'stage="{_label(name)}"', *h))
+
+    lines += [
+        "# HELP converter_request_seconds Request handling time until the response starts.",
+        "# TYPE converter_request_seconds histogram",
+    ]
+    for (method, path), *h in requests:
+        lines.extend(_histogram_lines("converter_request_seconds", f'method="{method}",path="{_label(path)}"', *h))
+
+    for prefix, values in (gauges or {}).items():
+        for key, value in values.items():
+            # hits / misses только растут — это счётчики, остальное — gauge
+            if key in COUNTER_KEYS:
+                metric = f"{prefix}_{key}_total"
+                lines.append(f"# TYPE {metric} counter")
+            else:
+                metric = f"{prefix}_{key}"
+                lines.append(f"# TYPE {metric} gauge")
+            lines.append(f"{metric} {value}")
+
+    return "\n".join(lines) + "\n"
+
+
+def reset() -> None:
+    with _lock:
+        _stages.clear()
+        _requests.clear()
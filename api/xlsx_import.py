@@ -0,0 +1,497 @@
+"""
+Обратный импорт: XLSX-таблицы троек (triplets/*.xlsx) -> графы редактора.
+
+    python -m api.xlsx_import triplets imported --workers 8
+
+Книга читается потоково (openpyxl read_only, values_only): в памяти только
+различные тройки листа (строки интернируются), а не вся книга. Колонки
+ищутся по заголовку: объект / субъект / предикат (+ документ, страница,
+текст рекомендации — как в XLSX из api) или subject / predicate / object
+(core.xlsx_export). Лист — один граф.
+
+Восстановление попарной таблицы (формат triplets/*.xlsx):
+- пациенты --диагноз--> X — root X;
+- root --рекомендуется--> M — методы под logic-узлом; ИЛИ, если методы
+  связаны "связь ИЛИ" (или не связаны вовсе), И — если только "связь И";
+- M --критерий ... / для / при [, NOT]--> C — критерий в группе критериев
+  (logic под узлом методов, ребро с предикатом роли); ", NOT" — обёртка НЕТ;
+- C1 --связь ИЛИ--> C2 — компоненты связности по ИЛИ становятся
+  подгруппами ИЛИ, остальные критерии — операнды группы И;
+- C --значение / уточнение--> V — value / note критерия;
+- всё остальное (используется, применяется, тоже самое, ...) — узел-уточнение
+  (criteria) под субъектом, ребро с исходным предикатом.
+
+Группа критериев в графе редактора одна на подгруппу методов, поэтому
+критерии, заданные только части методов, относятся ко всем.
+Структурный XLSX из api (группы по меткам И / ИЛИ) обратно не собирается:
+метки групп в нём не уникальны; такие строки импортируются как уточнения.
+
+После сборки — авторазмещение как в редакторе (autoLayoutKonverter
+из ui/editor_pn.js).
+"""
+import argparse
+import io
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import IO, Any, Dict, Iterator, List, Optional, Tuple, Union
+
+from openpyxl import load_workbook
+
+from .corpus import file_hash, load_manifest, save_manifest
+from .main import (
+    P_AND, P_DIAGNOSIS, P_NOTE, P_OR, P_RECOMMENDED, P_VALUE,
+    DocInfo, Graph, Link, Node,
+)
+
+NOT_SUFFIX = ", NOT"
+# предикаты метод -> критерий, кроме "критерий ..."
+CRITERION_ROLES = {"для", "при"}
+
+# заголовок -> поле строки
+HEADER_FIELDS = {
+    "субъект": "s", "subject": "s",
+    "предикат": "p", "predicate": "p",
+    "объект": "o", "object": "o",
+    "документ": "doc", "doc": "doc",
+    "страница": "page", "page": "page",
+    "текст рекомендации": "text", "rec_text": "text",
+}
+
+Source = Union[str, Path, IO[bytes]]
+
+
+# ---------------- чтение ----------------
+
+def _cell(v: Any) -> str:
+    return "" if v is None else str(v).strip()
+
+
+def header_columns(header: Tuple[Any, ...]) -> Dict[str, int]:
+    """Строка заголовка -> {поле: индекс колонки}. Без субъекта/предиката/объекта — ValueError."""
+    cols: Dict[str, int] = {}
+    for i, name in enumerate(header):
+        field = HEADER_FIELDS.get(_cell(name).lower())
+        if field and field not in cols:
+            cols[field] = i
+    missing = [f for f in ("s", "p", "o") if f not in cols]
+    if missing:
+        raise ValueError(f"no triple columns in header {list(header)!r}")
+    return cols
+
+
+def iter_sheets(src: Source) -> Iterator[Tuple[str, Iterator[Tuple[Any, ...]]]]:
+    """(название листа, итератор строк) — книга открыта только на чтение."""
+    wb = load_workbook(src, read_only=True, data_only=True)
+    try:
+        for ws in wb.worksheets:
+            yield ws.title, ws.iter_rows(values_only=True)
+    finally:
+        wb.close()
+
+
+# ---------------- сборка графа ----------------
+
+class GraphBuilder:
+    """
+    Строки листа (s, p, o) -> Graph. add() копит различные тройки,
+    graph() классифицирует их, когда известны все методы и критерии.
+    """
+
+    def __init__(self, doc_id: str = ""):
+        self.doc = DocInfo(id=doc_id)
+        self.rows: Dict[Tuple[str, str, str], None] = {}
+        self._doc_seen = False
+
+    def add(self, s: str, p: str, o: str) -> None:
+        if s and p and o:
+            self.rows[(sys.intern(s), sys.intern(p), sys.intern(o))] = None
+
+    def add_doc(self, doc: str, page: str, text: str) -> None:
+        """Поля рекомендации — из первой строки, где они есть."""
+        if self._doc_seen or not (doc or page or text):
+            return
+        self._doc_seen = True
+        self.doc = DocInfo(id=doc or self.doc.id, page=page, text=text)
+
+    def graph(self) -> Graph:
+        nodes: List[Node] = []
+        links: List[Link] = []
+        by_label: Dict[Tuple[str, str], Node] = {}
+
+        def node(kind: str, key: str, type_: str, label: Optional[str] = None) -> Node:
+            n = by_label.get((kind, key))
+            if n is None:
+                n = by_label[(kind, key)] = Node(id=f"{kind}{len(nodes)}", label=key if label is None else label, type=type_)
+                nodes.append(n)
+            return n
+
+        def link(src: Node, tgt: Node, pred: str) -> None:
+            links.append(Link(source=src.id, target=tgt.id, predicate=pred))
+
+        # --- root и методы
+        root_label = next((o for s, p, o in self.rows if p == P_DIAGNOSIS), "")
+        methods: Dict[str, None] = {}
+        for s, p, o in self.rows:
+            if p == P_RECOMMENDED:
+                methods[o] = None
+                root_label = root_label or s
+        root = node("r", root_label or "Диагноз", "root")
+
+        # --- критерии: роль и отрицание по первой строке метод -> критерий
+        roles: Dict[str, str] = {}
+        negated: Dict[str, None] = {}
+        rest: List[Tuple[str, str, str]] = []
+        for s, p, o in self.rows:
+            if p in (P_DIAGNOSIS, P_RECOMMENDED):
+                continue
+            base = p[:-len(NOT_SUFFIX)] if p.endswith(NOT_SUFFIX) else p
+            if s in methods and (base.startswith("критерий") or base in CRITERION_ROLES):
+                roles.setdefault(o, base)
+                if base != p:
+                    negated[o] = None
+            else:
+                rest.append((s, p, o))
+
+        # --- попарные связи: между методами, между критериями, прочие
+        method_ops = set()
+        parent: Dict[str, str] = {c: c for c in roles}
+
+        def find(c: str) -> str:
+            while parent[c] != c:
+                parent[c] = parent[parent[c]]
+                c = parent[c]
+            return c
+
+        other: List[Tuple[str, str, str]] = []
+        for s, p, o in rest:
+            if p in (P_AND, P_OR) and s in methods and o in methods:
+                method_ops.add(p)
+            elif p in (P_AND, P_OR) and s in roles and o in roles:
+                if p == P_OR:
+                    parent[find(s)] = find(o)
+            else:
+                other.append((s, p, o))
+
+        mlogic = node("g", "методы", "logic", "И" if method_ops == {P_AND} else "ИЛИ")
+        link(root, mlogic, P_RECOMMENDED)
+        for m in methods:
+            link(mlogic, node("m", m, "method"), P_RECOMMENDED)
+
+        # --- группа критериев: И над критериями и подгруппами ИЛИ
+        if roles:
+            comps: Dict[str, List[str]] = {}
+            for c in roles:
+                comps.setdefault(find(c), []).append(c)
+            operands = list(comps.values())
+
+            def attach(group: Node, c: str) -> None:
+                role = roles[c]
+                target = node("c", c, "criteria")
+                if c in negated:
+                    wrap = node("g", f"НЕТ {c}", "logic", "НЕТ")
+                    link(group, wrap, role)
+                    group = wrap
+                link(group, target, role)
+
+            single_or = len(operands) == 1 and len(operands[0]) > 1
+            top = node("g", "критерии", "logic", "ИЛИ" if single_or else "И")
+            link(mlogic, top, "")
+            for i, members in enumerate(operands):
+                group = top
+                if len(members) > 1 and not single_or:
+                    group = node("g", f"ИЛИ {i}", "logic", "ИЛИ")
+                    link(top, group, roles[members[0]])
+                for c in members:
+                    attach(group, c)
+
+        # --- значения, уточнения и прочие рёбра
+        def labelled(label: str) -> Node:
+            for key in (("m", label), ("c", label), ("d", label)):
+                if key in by_label:
+                    return by_label[key]
+            if label == root.label:
+                return root
+            return node("d", label, "criteria")
+
+        for s, p, o in other:
+            subj = labelled(s)
+            if p in (P_VALUE, P_NOTE) and subj.type == "criteria":
+                field = "value" if p == P_VALUE else "note"
+                old = getattr(subj, field)
+                setattr(subj, field, f"{old}; {o}" if old else o)
+                continue
+            link(subj, labelled(o), p)
+
+        graph = Graph(doc=self.doc, nodes=nodes, links=links)
+        auto_layout(graph, root.id)
+        return graph
+
+
+def sheet_to_graph(rows: Iterator[Tuple[Any, ...]], doc_id: str = "") -> Optional[Graph]:
+    """Строки листа (первая — заголовок) -> Graph; пустой лист — None."""
+    header = next(rows, None)
+    if header is None:
+        return None
+    cols = header_columns(header)
+    s_i, p_i, o_i = cols["s"], cols["p"], cols["o"]
+    extra = [cols.get(f) for f in ("doc", "page", "text")]
+    width = max(cols.values()) + 1
+    b = GraphBuilder(doc_id)
+    for row in rows:
+        if len(row) < width:
+            row = tuple(row) + (None,) * (width - len(row))
+        b.add(_cell(row[s_i]), _cell(row[p_i]), _cell(row[o_i]))
+        if extra[0] is not None or extra[1] is not None or extra[2] is not None:
+            b.add_doc(*(_cell(row[i]) if i is not None else "" for i in extra))
+    if not b.rows:
+        return None
+    return b.graph()
+
+
+def xlsx_to_graphs(src: Source, doc_id: str = "") -> List[Tuple[str, Graph]]:
+    """Книга -> [(название листа, Graph)]; листы без троек пропускаются."""
+    out = []
+    for title, rows in iter_sheets(src):
+        g = sheet_to_graph(rows, doc_id)
+        if g is not None:
+            out.append((title, g))
+    return out
+
+
+def xlsx_bytes_to_graphs(data: bytes, doc_id: str = "") -> List[Tuple[str, Graph]]:
+    return xlsx_to_graphs(io.BytesIO(data), doc_id)
+
+
+# ---------------- авторазмещение ----------------
+
+MARGIN_X = 140
+MARGIN_Y = 90
+LEVEL_HEIGHT = 170
+GAP_X = 80
+LEAF_PAD = 40
+TYPE_RANK = {"root": -1, "method": 0, "logic": 1, "criteria": 2}
+
+
+def node_size(n: Node) -> Tuple[float, float]:
+    """Размер узла по умолчанию (defaultNodeSize в редакторе)."""
+    if n.type == "logic":
+        return 42, 42
+    if n.type == "root":
+        return 120, 40
+    if n.type == "method":
+        return 360, 42
+    if n.type == "criteria" and (n.value or n.note):
+        return 280, 56
+    return 220, 42
+
+
+def auto_layout(graph: Graph, root_id: Optional[str] = None) -> None:
+    """
+    Раскладка дерева по направлению рёбер, как autoLayoutKonverter в редакторе:
+    ширины поддеревьев, дети по полосам, уровни через LEVEL_HEIGHT,
+    затем проходы «коллизии -> веер вокруг родителя -> коллизии».
+    Недостижимые из корня узлы — рядом внизу. Обходы без рекурсии.
+    """
+    nodes = graph.nodes
+    if not nodes:
+        return
+    by_id = {n.id: n for n in nodes}
+    for n in nodes:
+        if not n.w or not n.h:
+            n.w, n.h = node_size(n)
+    if root_id not in by_id:
+        root_id = nodes[0].id
+
+    children: Dict[str, List[str]] = {n.id: [] for n in nodes}
+    for l in graph.links:
+        kids = children.get(l.source)
+        if kids is not None and l.target in by_id and l.target not in kids:
+            kids.append(l.target)
+    for kids in children.values():
+        kids.sort(key=lambda c: TYPE_RANK.get(by_id[c].type, 10))
+
+    # остовное дерево обхода в глубину: ребёнок — у родителя, из которого дошли первым
+    depth: Dict[str, int] = {}
+    tree: Dict[str, List[str]] = {}
+    order: List[str] = []
+    stack: List[Tuple[str, Optional[str]]] = [(root_id, None)]
+    while stack:
+        nid, par = stack.pop()
+        if nid in depth:
+            continue
+        depth[nid] = 0 if par is None else depth[par] + 1
+        tree[nid] = []
+        if par is not None:
+            tree[par].append(nid)
+        order.append(nid)
+        stack.extend((c, nid) for c in reversed(children[nid]) if c not in depth)
+
+    # ширины поддеревьев (снизу вверх)
+    width: Dict[str, float] = {}
+    for nid in reversed(order):
+        n = by_id[nid]
+        kids = tree[nid]
+        if not kids:
+            width[nid] = n.w + LEAF_PAD
+        else:
+            width[nid] = max(n.w, sum(width[c] for c in kids) + GAP_X * (len(kids) - 1))
+
+    # x по полосам: лист — по центру полосы, родитель — между крайними детьми
+    left: Dict[str, float] = {root_id: 0.0}
+    for nid in order:
+        cursor = left[nid]
+        by_id[nid].y = MARGIN_Y + depth[nid] * LEVEL_HEIGHT
+        for c in tree[nid]:
+            left[c] = cursor
+            cursor += width[c] + GAP_X
+    for nid in reversed(order):
+        n, kids = by_id[nid], tree[nid]
+        if kids:
+            n.x = (by_id[kids[0]].x + by_id[kids[-1]].x) / 2
+        else:
+            n.x = MARGIN_X + left[nid] + width[nid] / 2
+
+    def shift(nid: str, dx: float) -> None:
+        st = [nid]
+        while st:
+            cur = st.pop()
+            by_id[cur].x += dx
+            st.extend(tree[cur])
+
+    levels: Dict[int, List[Node]] = {}
+    for nid in order:
+        levels.setdefault(depth[nid], []).append(by_id[nid])
+
+    def resolve_collisions() -> None:
+        for d in sorted(levels):
+            row = sorted(levels[d], key=lambda n: n.x)
+            for prev, cur in zip(row, row[1:]):
+                need = (prev.x + prev.w / 2 + GAP_X) - (cur.x - cur.w / 2)
+                if need > 0:
+                    shift(cur.id, need)
+
+    def fan_out(nid: str) -> None:
+        kids = [by_id[c] for c in tree[nid]]
+        if len(kids) <= 1:
+            return
+        step = max(k.w for k in kids) + GAP_X
+        center = (len(kids) - 1) / 2
+        px = by_id[nid].x
+        for i, k in enumerate(sorted(kids, key=lambda k: k.x)):
+            dx = px + (i - center) * step - k.x
+            if abs(dx) > 1:
+                shift(k.id, dx)
+
+    for _ in range(4):
+        resolve_collisions()
+        for n in sorted((by_id[i] for i in order), key=lambda n: (depth[n.id], n.x)):
+            fan_out(n.id)
+        resolve_collisions()
+
+    # недостижимые узлы — в ряд ниже дерева
+    free = [n for n in nodes if n.id not in depth]
+    if free:
+        y = MARGIN_Y + (max(depth.values()) + 2) * LEVEL_HEIGHT
+        x = MARGIN_X
+        for n in free:
+            n.y = y
+            n.x = x + n.w / 2
+            x += n.w + GAP_X
+
+
+# ---------------- каталог ----------------
+
+def output_name(stem: str, title: str, sheets: int) -> str:
+    if sheets == 1:
+        return f"{stem}.json"
+    safe = "".join(ch if ch.isalnum() or ch in "-_." else "_" for ch in title)
+    return f"{stem}.{safe}.json"
+
+
+def import_file(src: str, out_dir: str) -> Dict[str, Any]:
+    """Одна книга -> <stem>.json (или <stem>.<лист>.json на каждый лист). Ошибка не роняет прогон."""
+    t0 = time.perf_counter()
+    src_path = Path(src)
+    try:
+        graphs = xlsx_to_graphs(src_path, src_path.stem)
+        out = Path(out_dir)
+        names = []
+        for title, g in graphs:
+            name = output_name(src_path.stem, title, len(graphs))
+            data = json.dumps(g.model_dump(), ensure_ascii=False, indent=2)
+            (out / name).write_text(data, encoding="utf-8")
+            names.append(name)
+        nodes = sum(len(g.nodes) for _, g in graphs)
+        return {"src": src, "graphs": names, "nodes": nodes, "seconds": time.perf_counter() - t0}
+    except Exception as ex:
+        return {"src": src, "error": f"{type(ex).__name__}: {ex}", "seconds": time.perf_counter() - t0}
+
+
+def run(
+    src_dir: str,
+    out_dir: str,
+    pattern: str = "*.xlsx",
+    workers: Optional[int] = None,
+    force: bool = False,
+) -> int:
+    src = Path(src_dir)
+    out = Path(out_dir)
+    out.mkdir(parents=True, exist_ok=True)
+
+    manifest = load_manifest(out)
+    inputs = sorted(p for p in src.rglob(pattern) if not p.name.startswith("~$"))
+    todo: List[Path] = []
+    hashes: Dict[str, str] = {}
+    for p in inputs:
+        key = str(p.relative_to(src))
+        h = hashes[key] = file_hash(p)
+        prev = manifest.get(key)
+        if not force and prev and prev.get("sha256") == h and prev.get("formats") == ["graph"]:
+            continue
+        todo.append(p)
+
+    skipped = len(inputs) - len(todo)
+    print(f"{len(inputs)} files, {len(todo)} to import, {skipped} unchanged", flush=True)
+
+    t0 = time.perf_counter()
+    done = failed = 0
+    workers = workers or os.cpu_count() or 1
+    chunksize = max(1, len(todo) // (workers * 8))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        results = pool.map(import_file, [str(p) for p in todo], [str(out)] * len(todo), chunksize=chunksize)
+        for p, res in zip(todo, results):
+            key = str(p.relative_to(src))
+            if "error" in res:
+                failed += 1
+                print(f"  FAIL {key}  {res['seconds'] * 1000:8.1f} ms  {res['error']}", flush=True)
+                manifest.pop(key, None)
+                continue
+            done += 1
+            manifest[key] = {"sha256": hashes[key], "formats": ["graph"]}
+            print(f"  ok   {key}  {res['seconds'] * 1000:8.1f} ms  {', '.join(res['graphs']) or '-'}  "
+                  f"{res['nodes']} nodes", flush=True)
+
+    save_manifest(out, manifest)
+    wall = time.perf_counter() - t0
+    rate = done / wall if wall > 0 else 0.0
+    print(f"imported {done}, failed {failed}, skipped {skipped} in {wall:.2f}s ({rate:.1f} files/s, {workers} workers)")
+    return 1 if failed else 0
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description="Импорт XLSX-таблиц троек в графы редактора (JSON).")
+    ap.add_argument("src", nargs="?", default="triplets", help="каталог с XLSX (по умолчанию triplets)")
+    ap.add_argument("out", nargs="?", default="imported", help="куда писать графы (по умолчанию imported)")
+    ap.add_argument("--pattern", default="*.xlsx", help="маска входных файлов (рекурсивно)")
+    ap.add_argument("--workers", type=int, default=None, help="число процессов (по умолчанию — все ядра)")
+    ap.add_argument("--force", action="store_true", help="игнорировать манифест и импортировать всё")
+    args = ap.parse_args(argv)
+    return run(args.src, args.out, args.pattern, args.workers, args.force)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
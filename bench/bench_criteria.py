@@ -0,0 +1,166 @@
+"""
+Бенчмарк компилятора критериев (api.criteria_compiler) на корпусе jsons/*.json.
+
+0. Случайные графы редактора (общие критерии и подгруппы, НЕТ-группы,
+   ИЛИ(x, НЕТ x) и подобные тавтологии, чередующиеся цепочки И/ИЛИ
+   глубины 300 и 1000) сверяются с eval_expr на всех профилях словаря;
+   при numpy — и векторный режим со скалярным.
+1. Случайные профили (подмножества критериев корпуса) сверяются с прямым
+   вычислением NNF-выражений (eval_expr); скалярный режим (сгенерированный
+   код над int-масками) — против eval_expr по всем рекомендациям.
+2. Векторный режим (numpy): --masks случайных масок за один вызов
+   evaluate_many, сверка с скалярным режимом на части масок.
+   Без numpy пункт пропускается.
+
+    python -m bench.bench_criteria --profiles 20000 --masks 1000000 --graphs 2000
+"""
+import argparse
+import itertools
+import random
+import time
+from typing import List, Tuple
+
+from api.criteria_compiler import CriteriaSet, np
+from api.inference import eval_expr
+from api.main import DocInfo, Graph, Link, Node
+from bench.suite import load_corpus
+
+VOCAB = [f"к{i}" for i in range(6)]
+ROLE = "критерий пациент"
+
+
+def editor_graph(groups: List[Tuple[str, str]], links: List[Tuple[str, str]], crits: List[Tuple[str, str]]) -> Graph:
+    """root -> g0 (И) -> метод; groups — (id, метка), crits — (id, метка), links — (источник, цель)."""
+    ns = [Node(id="root", type="root", label="ПН"), Node(id="g0", type="logic", label="И"),
+          Node(id="m0", type="method", label="метод")]
+    ns += [Node(id=i, type="logic", label=label) for i, label in groups]
+    ns += [Node(id=i, type="criteria", label=label) for i, label in crits]
+    crit_ids = {i for i, _ in crits}
+    ls = [Link(source="root", target="g0"), Link(source="g0", target="m0")]
+    ls += [Link(source=s, target=t, predicate=ROLE) if t in crit_ids else Link(source=s, target=t) for s, t in links]
+    return Graph(doc=DocInfo(id="bench"), nodes=ns, links=ls)
+
+
+def random_graph(rnd: random.Random, size: int) -> Graph:
+    """Логика под g0: группы И/ИЛИ/НЕТ, подгруппы и критерии иногда общие (DAG)."""
+    groups, links, crits = [], [], []
+    gids = ["g0"]
+    for k in range(1, size + 1):
+        gid = f"g{k}"
+        groups.append((gid, rnd.choice(("И", "ИЛИ", "НЕТ"))))
+        links.append((rnd.choice(gids), gid))
+        if rnd.random() < 0.2:
+            links.append((rnd.choice(gids), gid))
+        gids.append(gid)
+    for gid in gids:
+        for _ in range(rnd.randint(1, 3)):
+            if crits and rnd.random() < 0.3:
+                cid = rnd.choice(crits)[0]
+            else:
+                cid = f"c{len(crits)}"
+                crits.append((cid, rnd.choice(VOCAB)))
+            links.append((gid, cid))
+    return editor_graph(groups, list(dict.fromkeys(links)), crits)
+
+
+def chain_graph(depth: int) -> Graph:
+    """g0 -> g1 (И) -> g2 (ИЛИ) -> ...; у каждой группы свой критерий."""
+    groups = [(f"g{k}", "И" if k % 2 else "ИЛИ") for k in range(1, depth + 1)]
+    links = [(f"g{k - 1}", f"g{k}") for k in range(1, depth + 1)] + [(f"g{k}", f"c{k}") for k in range(depth + 1)]
+    crits = [(f"c{k}", VOCAB[k % len(VOCAB)]) for k in range(depth + 1)]
+    return editor_graph(groups, links, crits)
+
+
+def check_graphs(count: int, seed: int) -> None:
+    rnd = random.Random(seed)
+    graphs = [
+        # И(ИЛИ(к0, ИЛИ(НЕТ к0), НЕТ к0), к0): ИЛИ(x, НЕТ x) не сливается с И как литерал
+        ("tautology", editor_graph(
+            [("g1", "ИЛИ"), ("g2", "ИЛИ"), ("g3", "НЕТ"), ("g4", "НЕТ")],
+            [("g0", "g1"), ("g0", "c0"), ("g1", "c1"), ("g1", "g2"), ("g2", "g3"), ("g3", "c2"), ("g1", "g4"), ("g4", "c3")],
+            [("c0", "к0"), ("c1", "к0"), ("c2", "к0"), ("c3", "к0")],
+        )),
+        ("chain_300", chain_graph(300)),
+        ("chain_1000", chain_graph(1000)),
+    ]
+    graphs += [(f"random_{k}", random_graph(rnd, rnd.randint(1, 12))) for k in range(count)]
+    cs = CriteriaSet(graphs)
+    profiles = [{c for c, on in zip(VOCAB, bits) if on} for bits in itertools.product((0, 1), repeat=len(VOCAB))]
+    for p in profiles:
+        assert cs.check(p), p
+    if np is not None:
+        masks = [cs.mask(p) for p in profiles]
+        out = cs.evaluate_many(cs.pack(masks))
+        for m, got in zip(masks, out):
+            r = cs.evaluate(m)
+            assert [bool(r >> i & 1) for i in range(len(cs))] == got.tolist(), m
+    print(f"checked {len(graphs)} random/edge graphs x {len(profiles)} profiles against eval_expr: ok")
+    if np is None:
+        print("numpy not installed: SKIPPED numpy vs scalar check on random/edge graphs")
+    else:
+        print(f"checked {len(graphs)} random/edge graphs x {len(profiles)} masks, numpy vs scalar: ok")
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--src", default="jsons")
+    ap.add_argument("--profiles", type=int, default=20000)
+    ap.add_argument("--check", type=int, default=2000, help="профилей/масок для сверки")
+    ap.add_argument("--masks", type=int, default=1000000, help="масок для векторного режима")
+    ap.add_argument("--graphs", type=int, default=2000, help="случайных графов для сверки")
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args()
+
+    check_graphs(args.graphs, args.seed)
+
+    corpus = load_corpus(args.src)
+    t0 = time.perf_counter()
+    cs = CriteriaSet((f"g{i}", g) for i, g in enumerate(corpus))
+    print(f"compile:         {(time.perf_counter() - t0) * 1000:8.2f} ms  "
+          f"{len(cs)} recommendations, {len(cs.bits)} criteria, {cs.words} word(s)")
+
+    vocab = list(cs.bits)
+    rnd = random.Random(args.seed)
+    profiles = [{c for c in vocab if rnd.random() < 0.4} for _ in range(args.profiles)]
+    for p in profiles[:args.check]:
+        assert cs.check(p), p
+    print(f"checked {min(args.check, len(profiles))} profiles against eval_expr: ok")
+
+    t0 = time.perf_counter()
+    for p in profiles:
+        r = 0
+        for i, (expr, nodes) in enumerate(cs._exprs):
+            if eval_expr(expr, p, nodes):
+                r |= 1 << i
+    t_ref = time.perf_counter() - t0
+    masks = [cs.mask(p) for p in profiles]
+    t0 = time.perf_counter()
+    cs.evaluate_all(masks)
+    t_py = time.perf_counter() - t0
+    print(f"eval_expr:       {t_ref * 1000:8.2f} ms  {len(profiles) / t_ref:12.0f} profiles/s")
+    print(f"compiled python: {t_py * 1000:8.2f} ms  {len(profiles) / t_py:12.0f} profiles/s  "
+          f"{t_ref / t_py:.1f}x")
+
+    if np is None:
+        print("numpy not installed: SKIPPED vectorized mode and its check against scalar mode")
+        return
+    gen = np.random.default_rng(args.seed)
+    packed = gen.integers(0, 2 ** 63, size=(args.masks, cs.words), dtype=np.uint64)
+    packed |= gen.integers(0, 2, size=(args.masks, cs.words), dtype=np.uint64) << np.uint64(63)
+    if len(cs.bits) % 64:
+        packed[:, -1] &= np.uint64((1 << (len(cs.bits) % 64)) - 1)
+    t0 = time.perf_counter()
+    out = cs.evaluate_many(packed)
+    t_np = time.perf_counter() - t0
+    print(f"numpy:           {t_np * 1000:8.2f} ms  {args.masks / t_np:12.0f} masks/s  "
+          f"({args.masks} x {len(cs)})")
+    for row, got in zip(packed[:args.check], out[:args.check]):
+        m = sum(int(w) << (64 * k) for k, w in enumerate(row))
+        r = cs.evaluate(m)
+        assert [bool(r >> i & 1) for i in range(len(cs))] == got.tolist(), m
+    assert (cs.pack([cs.mask(p) for p in profiles[:10]]) == cs.pack(masks[:10])).all()
+    print(f"checked {min(args.check, args.masks)} masks against scalar mode: ok")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Бенчмарк разбора тела запроса: графы из jsons/, склеенные (с переименованием
+id) до заданного числа узлов, по умолчанию 10k.
+
+- pydantic:      Graph(**json.loads(body)) — как раньше в эндпоинтах
+- pydantic-json: Graph.model_validate_json(body)
+- fast/json:     api.fastjson на stdlib json
+- fast/<backend>: api.fastjson на orjson / msgspec, если установлены
+
+    python -m bench.bench_decode --nodes 10000
+"""
+import argparse
+import glob
+import json
+import time
+from typing import Any, Dict, List
+
+from api import fastjson
+from api.fastjson import graph_from_dict
+from api.main import Graph, graph_hash
+
+
+def scaled_graph(samples: List[Dict[str, Any]], nodes: int) -> Dict[str, Any]:
+    """Копии образцов с префиксом id, пока узлов не станет >= nodes."""
+    out: Dict[str, Any] = {"doc": samples[0]["doc"], "nodes": [], "links": []}
+    k = 0
+    while len(out["nodes"]) < nodes:
+        g = samples[k % len(samples)]
+        pfx = f"{k}:"
+        out["nodes"].extend({**n, "id": pfx + n["id"]} for n in g["nodes"])
+        out["links"].extend({**l, "source": pfx + l["source"], "target": pfx + l["target"]} for l in g["links"])
+        k += 1
+    return out
+
+
+def best_of(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--src", default="jsons")
+    ap.add_argument("--nodes", type=int, default=10000)
+    ap.add_argument("--repeat", type=int, default=5)
+    args = ap.parse_args()
+
+    samples = [json.load(open(f, encoding="utf-8")) for f in sorted(glob.glob(f"{args.src}/*.json"))]
+    body = json.dumps(scaled_graph(samples, args.nodes), ensure_ascii=False).encode("utf-8")
+    n_nodes = len(json.loads(body)["nodes"])
+
+    cases = {
+        "pydantic": lambda: Graph(**json.loads(body)),
+        "pydantic-json": lambda: Graph.model_validate_json(body),
+        "fast/json": lambda: graph_from_dict(json.loads(body)),
+    }
+    if fastjson.BACKEND != "json":
+        cases[f"fast/{fastjson.BACKEND}"] = lambda: fastjson.decode_graph(body)
+
+    # один и тот же граф по содержимому
+    ref = graph_hash(Graph(**json.loads(body)))
+    assert graph_hash(fastjson.decode_graph(body)) == ref
+
+    print(f"{n_nodes} nodes, {len(body) / 1e6:.2f} MB body, best of {args.repeat}")
+    base = None
+    for name, fn in cases.items():
+        t = best_of(fn, args.repeat)
+        base = base or t
+        print(f"  {name:<15} {t * 1000:9.2f} ms  {base / t:6.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Бенчмарк экспорта логической структуры (связь И / ИЛИ / НЕТ) на синтетических
+графах глубины 5..20: прежний рекурсивный export_expr, который обходил каждое
+вложенное поддерево дважды на каждом уровне (2^depth), против однопроходного
+api.main.export_expr_rows. Результат обеих версий после дедупликации одинаков.
+
+    python -m bench.bench_export_expr --min-depth 5 --max-depth 20
+"""
+import argparse
+import time
+from typing import Dict, List, Tuple
+
+from api.main import (
+    DocInfo, Graph, Leaf, Link, Node, Op, build_criteria_expr, build_index,
+    export_expr_rows, nnf, op_pred,
+)
+
+
+def synthetic_graph(depth: int, fanout: int = 2) -> Graph:
+    """root -> И -> метод; дальше цепочка logic-групп глубины depth, в каждой fanout критериев."""
+    labels = ["И", "ИЛИ", "НЕТ"]
+    nodes = [
+        Node(id="root", type="root", label="ПН"),
+        Node(id="m", type="method", label="метод"),
+        Node(id="g0", type="logic", label="И"),
+    ]
+    links = [Link(source="root", target="g0"), Link(source="g0", target="m")]
+    for d in range(1, depth + 1):
+        gid = f"g{d}"
+        nodes.append(Node(id=gid, type="logic", label=labels[d % 3]))
+        links.append(Link(source=f"g{d - 1}", target=gid))
+        for k in range(fanout):
+            cid = f"c{d}_{k}"
+            nodes.append(Node(id=cid, type="criteria", label=f"критерий {d}.{k}"))
+            links.append(Link(source=gid, target=cid, predicate="критерий пациент"))
+    return Graph(doc=DocInfo(id="bench"), nodes=nodes, links=links)
+
+
+def old_export_expr(expr, nodes_by_id: Dict[str, Node]) -> List[Tuple[str, str, str]]:
+    # прежняя реализация (до дедупликации)
+    rows: List[Tuple[str, str, str]] = []
+
+    def group_label(logic_id: str) -> str:
+        return nodes_by_id[logic_id].label or logic_id
+
+    def export_expr(e):
+        if isinstance(e, Op):
+            for a in e.args:
+                if isinstance(a, Leaf):
+                    rows.append((group_label(e.logic_node_id), op_pred(e.op), nodes_by_id[a.crit_node_id].label or a.crit_node_id))
+                elif isinstance(a, Op):
+                    rows.append((group_label(e.logic_node_id), op_pred(e.op), group_label(a.logic_node_id)))
+                    export_expr(a)
+            for a in e.args:
+                if isinstance(a, Op):
+                    export_expr(a)
+
+    export_expr(expr)
+    return rows
+
+
+def dedupe(rows):
+    return list(dict.fromkeys(rows))
+
+
+def best_of(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--min-depth", type=int, default=5)
+    ap.add_argument("--max-depth", type=int, default=20)
+    ap.add_argument("--fanout", type=int, default=2)
+    ap.add_argument("--repeat", type=int, default=3)
+    args = ap.parse_args()
+
+    print(f"{'depth':>5} {'old rows':>10} {'old ms':>10} {'new rows':>9} {'new ms':>9} {'speedup':>9}")
+    for depth in range(args.min_depth, args.max_depth + 1):
+        graph = synthetic_graph(depth, args.fanout)
+        nodes_by_id, out_edges, _ = build_index(graph)
+        expr = nnf(build_criteria_expr(nodes_by_id["g0"], nodes_by_id, out_edges))
+
+        old_rows = old_export_expr(expr, nodes_by_id)
+        new_rows = export_expr_rows(expr, nodes_by_id)
+        assert dedupe(old_rows) == dedupe(new_rows)
+
+        t_old = best_of(lambda: dedupe(old_export_expr(expr, nodes_by_id)), args.repeat)
+        t_new = best_of(lambda: dedupe(export_expr_rows(expr, nodes_by_id)), args.repeat)
+        print(
+            f"{depth:>5} {len(old_rows):>10} {t_old * 1000:>10.2f} {len(new_rows):>9} "
+            f"{t_new * 1000:>9.3f} {t_old / t_new:>8.0f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
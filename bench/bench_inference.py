@@ -0,0 +1,103 @@
+"""
+Бенчмарк вывода (api.inference) на корпусе jsons/*.json.
+
+1. Применимость методов: случайные профили пациентов (подмножества
+   критериев корпуса) оцениваются пакетно (Program) и полунаивной цепочкой
+   по тройкам (forward_chain); на части профилей оба сверяются с прямым
+   вычислением NNF-выражений (eval_expr).
+2. Полунаивная цепочка против наивной на транзитивном замыкании цепи
+   "тоже самое" длины --chain.
+
+    python -m bench.bench_inference --profiles 5000 --chain 300
+"""
+import argparse
+import random
+import time
+from typing import List
+
+from api.inference import (
+    FactIndex, Program, Rule, corpus_rules, eval_expr, forward_chain, graph_criteria,
+    join, profile_facts, rules_vocabulary, substitute,
+)
+from bench.suite import load_corpus
+
+
+def naive_chain(facts: FactIndex, rules: List[Rule]) -> int:
+    """Наивная схема: каждый шаг соединяет тело правила со всеми фактами заново."""
+    rounds = 0
+    while True:
+        rounds += 1
+        new = [
+            substitute(r.head, b)
+            for r in rules
+            for b0 in facts.match(r.body[0], {})
+            for b in join(r.body, 0, b0, facts)
+        ]
+        if not [f for f in new if facts.add(f)]:
+            return rounds
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--src", default="jsons")
+    ap.add_argument("--profiles", type=int, default=5000)
+    ap.add_argument("--check", type=int, default=200, help="профилей для сверки с eval_expr")
+    ap.add_argument("--chain", type=int, default=300)
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args()
+
+    corpus = load_corpus(args.src)
+    named = [(f"g{i}", g) for i, g in enumerate(corpus)]
+    rules = corpus_rules(named)
+    vocab = rules_vocabulary(rules)
+    rnd = random.Random(args.seed)
+    profiles = [{c for c in vocab if rnd.random() < 0.4} for _ in range(args.profiles)]
+    print(f"corpus: {len(corpus)} graphs, {len(rules)} rules, {len(vocab)} criteria")
+
+    t0 = time.perf_counter()
+    program = Program(rules)
+    print(f"compile:        {(time.perf_counter() - t0) * 1000:8.2f} ms")
+
+    t0 = time.perf_counter()
+    batch = program.score(profiles)
+    dt = time.perf_counter() - t0
+    print(f"Program.score:  {dt * 1000:8.2f} ms  {len(profiles) / dt:10.0f} profiles/s")
+
+    n_chain = min(len(profiles), max(args.check, 1))
+    t0 = time.perf_counter()
+    chained = []
+    for p in profiles[:n_chain]:
+        facts = FactIndex(profile_facts(p, vocab))
+        derived = forward_chain(facts, rules)
+        chained.append(sorted((s, o) for s, pr, o in derived if pr == "применим"))
+    dt = time.perf_counter() - t0
+    print(f"forward_chain:  {dt * 1000:8.2f} ms  {n_chain / dt:10.0f} profiles/s")
+
+    exprs = [(name,) + graph_criteria(g) for name, g in named]
+    for p, got, via_chain in zip(profiles[:args.check], batch, chained):
+        expected = sorted(
+            (name, m) for name, methods, expr, nodes in exprs
+            if eval_expr(expr, p, nodes) for m in dict.fromkeys(methods)
+        )
+        assert sorted(got) == expected == via_chain, (p, got, expected, via_chain)
+    print(f"checked {min(args.check, len(profiles))} profiles against eval_expr: ok")
+
+    same = [Rule(("?a", "тоже самое", "?c"), [("?a", "тоже самое", "?b"), ("?b", "тоже самое", "?c")])]
+    base = [(f"x{i}", "тоже самое", f"x{i + 1}") for i in range(args.chain)]
+    t0 = time.perf_counter()
+    facts = FactIndex(base)
+    forward_chain(facts, same)
+    t_semi = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    facts_naive = FactIndex(base)
+    rounds = naive_chain(facts_naive, same)
+    t_naive = time.perf_counter() - t0
+    assert facts.facts == facts_naive.facts
+    print(
+        f"closure chain {args.chain}: {len(facts)} facts, semi-naive {t_semi * 1000:.1f} ms, "
+        f"naive {t_naive * 1000:.1f} ms ({rounds} rounds), {t_naive / t_semi:.1f}x"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+"""
+Сверка итеративной NNF (api.main.nnf, nnf_combine) с прежней рекурсивной
+реализацией на случайных деревьях И / ИЛИ / НЕТ / неизвестных операторов
+глубины до --max-depth (пустые группы, НЕТ над несколькими операндами,
+НЕТ над пустой НЕТ-группой). Сравнивается форма результата целиком,
+включая logic_node_id; ошибка прежней версии (IndexError) должна быть
+ValueError в новой. Затем — время обеих версий и цепочка НЕТ глубины
+--chain, на которой рекурсивная версия упирается в стек.
+
+    python -m bench.bench_nnf --trees 200 --max-depth 1000 --chain 100000
+"""
+import argparse
+import random
+import sys
+import time
+from typing import List, Optional, Tuple
+
+from api.main import Expr, Leaf, Op, nnf, nnf_combine
+
+OPS = ["AND", "OR", "NOT", "NOT", "XOR"]
+
+
+def reference_nnf(expr: Expr) -> Expr:
+    # прежняя рекурсивная реализация (до перевода на явный стек)
+    if isinstance(expr, Leaf):
+        return expr
+
+    if isinstance(expr, Op):
+        op = expr.op
+        args = [reference_nnf(a) for a in expr.args]
+
+        if op != "NOT":
+            return Op(op, args, expr.logic_node_id)
+
+        if len(args) == 0:
+            return Op("NOT", [], expr.logic_node_id)
+
+        if len(args) > 1:
+            return reference_nnf(Op("NOT", [Op("AND", args, expr.logic_node_id)], expr.logic_node_id))
+
+        x = args[0]
+        if isinstance(x, Leaf):
+            return Op("NOT", [x], expr.logic_node_id)
+
+        if isinstance(x, Op):
+            if x.op == "NOT":
+                return reference_nnf(x.args[0])
+            if x.op == "AND":
+                return Op("OR", [reference_nnf(Op("NOT", [a], expr.logic_node_id)) for a in x.args], expr.logic_node_id)
+            if x.op == "OR":
+                return Op("AND", [reference_nnf(Op("NOT", [a], expr.logic_node_id)) for a in x.args], expr.logic_node_id)
+
+        return Op("NOT", [x], expr.logic_node_id)
+
+    return expr
+
+
+def shape(expr: Expr) -> List[Tuple]:
+    """Дерево -> список токенов в прямом порядке (без рекурсии)."""
+    out: List[Tuple] = []
+    stack = [expr]
+    while stack:
+        e = stack.pop()
+        if isinstance(e, Op):
+            out.append((e.op, e.logic_node_id, len(e.args)))
+            stack.extend(reversed(e.args))
+        else:
+            out.append(("leaf", e.crit_node_id))
+    return out
+
+
+def random_tree(rnd: random.Random, depth: int, empty: bool = False) -> Expr:
+    """
+    Хребет глубины depth с короткими боковыми ветками; id групп уникальны.
+    empty — в ветках бывают пустые группы.
+    """
+    counter = [0]
+    sizes = (1 if empty else 0, 12, 8, 4)
+
+    def group(op: str, args: List[Expr]) -> Op:
+        counter[0] += 1
+        return Op(op, args, f"g{counter[0]}")
+
+    def small(level: int) -> Expr:
+        if level == 0 or rnd.random() < 0.3:
+            return Leaf(f"c{rnd.randint(0, 9)}")
+        return group(rnd.choice(OPS), [small(level - 1) for _ in range(rnd.choices((0, 1, 2, 3), sizes)[0])])
+
+    e = small(2)
+    for _ in range(depth):
+        args = [e] + [small(2) for _ in range(rnd.choices((0, 1, 2), (5, 3, 1))[0])]
+        rnd.shuffle(args)
+        e = group(rnd.choice(OPS), args)
+    return e
+
+
+def outcome(fn, expr: Expr) -> Tuple[str, Optional[List[Tuple]]]:
+    try:
+        return "ok", shape(fn(expr))
+    except (IndexError, ValueError):
+        return "error", None
+
+
+def combined(expr: Expr) -> Expr:
+    """NNF снизу вверх через nnf_combine (как в инкрементальной сессии)."""
+    done = {}
+    stack = [expr]
+    while stack:
+        e = stack[-1]
+        if not isinstance(e, Op):
+            done[id(e)] = e
+            stack.pop()
+            continue
+        pending = [a for a in e.args if id(a) not in done]
+        if pending:
+            stack.extend(pending)
+            continue
+        stack.pop()
+        done[id(e)] = nnf_combine(e.op, [done[id(a)] for a in e.args], e.logic_node_id)
+    return done[id(expr)]
+
+
+def check(trees: int, max_depth: int, seed: int) -> None:
+    rnd = random.Random(seed)
+    errors = 0
+    for k in range(trees):
+        # несколько деревьев полной глубины, остальные — лог-равномерно
+        # (прежняя версия на каждом НЕТ над группой заново обходит поддерево)
+        depth = max_depth if k < 3 else int(max_depth ** rnd.random())
+        expr = random_tree(rnd, depth, empty=rnd.random() < 0.2)
+        ref = outcome(reference_nnf, expr)
+        for name, fn in (("nnf", nnf), ("nnf_combine", combined)):
+            got = outcome(fn, expr)
+            assert got == ref, f"{name} differs from the recursive nnf on tree {k} (depth {depth})"
+        try:
+            nnf(expr)
+        except ValueError:
+            errors += 1
+    print(f"checked {trees} random trees up to depth {max_depth} against the recursive nnf: ok "
+          f"({errors} with NOT over an empty NOT group -> ValueError)")
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--trees", type=int, default=200)
+    ap.add_argument("--max-depth", type=int, default=1000)
+    ap.add_argument("--time-depth", type=int, default=200, help="глубина деревьев для замера времени")
+    ap.add_argument("--chain", type=int, default=100000, help="глубина цепочки НЕТ для итеративной версии")
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args()
+    # прежней версии нужно по несколько кадров на уровень дерева
+    sys.setrecursionlimit(max(sys.getrecursionlimit(), 20 * args.max_depth + 1000))
+
+    check(args.trees, args.max_depth, args.seed)
+
+    rnd = random.Random(args.seed + 1)
+    exprs = [random_tree(rnd, args.time_depth) for _ in range(20)]
+    for name, fn in (("recursive", reference_nnf), ("iterative", nnf)):
+        t0 = time.perf_counter()
+        for e in exprs:
+            outcome(fn, e)
+        print(f"{name:<10} {(time.perf_counter() - t0) * 1000:8.2f} ms  ({len(exprs)} trees of depth {args.time_depth})")
+
+    e: Expr = Leaf("c0")
+    for k in range(args.chain):
+        e = Op("NOT", [e], f"g{k}")
+    t0 = time.perf_counter()
+    res = nnf(e)
+    print(f"NOT chain {args.chain}: {(time.perf_counter() - t0) * 1000:8.2f} ms -> {shape(res)[0]}")
+
+
+if __name__ == "__main__":
+    main()
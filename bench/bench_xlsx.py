@@ -0,0 +1,90 @@
+"""
+Бенчмарк экспорта троек в XLSX: старый путь (полный Workbook в памяти)
+против потокового write-only экспорта из core.xlsx_export.
+
+Каждый вариант запускается в отдельном процессе, чтобы пиковый RSS
+не смешивался между прогонами.
+
+    python -m bench.bench_xlsx --rows 1000000
+"""
+import argparse
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+from openpyxl import Workbook
+
+from core.triples_types import TripleRow
+from core.xlsx_export import export_triples_to_xlsx
+
+REC_TEXT = "Рекомендовано консервативное лечение с наложением гипсовой или иммобилизационной повязки " * 3
+
+
+def synthetic_rows(n: int):
+    # ~100 строк на одну рекомендацию — как у CriteriaRule на больших группах
+    for i in range(n):
+        rec = i // 100
+        yield TripleRow(
+            subject=f"метод {i % 37}",
+            predicate="критерий пациент",
+            object=f"критерий {i % 1013}",
+            doc="doc.docx",
+            page=rec % 300,
+            rec_text=f"{rec}: {REC_TEXT}",
+        )
+
+
+def inmemory_export(triples, path: str) -> None:
+    # прежняя реализация export_triples_to_xlsx
+    wb = Workbook()
+    ws = wb.active
+    ws.title = "Triples"
+    ws.append(["subject", "predicate", "object", "doc", "page", "rec_text"])
+    for t in triples:
+        ws.append([t.subject, t.predicate, t.object, t.doc, t.page, t.rec_text])
+    wb.save(path)
+
+
+VARIANTS = {
+    "inmemory": lambda rows, path: inmemory_export(rows, path),
+    "stream": lambda rows, path: export_triples_to_xlsx(rows, path),
+    "stream+texts": lambda rows, path: export_triples_to_xlsx(rows, path, texts_sheet=True),
+}
+
+
+def run_variant(name: str, n: int) -> None:
+    fd, path = tempfile.mkstemp(suffix=".xlsx")
+    os.close(fd)
+    try:
+        t0 = time.perf_counter()
+        VARIANTS[name](synthetic_rows(n), path)
+        wall = time.perf_counter() - t0
+        size = os.path.getsize(path)
+    finally:
+        os.remove(path)
+    rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f"{name:<14} rows={n:<9} wall={wall:8.2f}s  peak_rss={rss_mb:8.1f}MB  size={size / 2**20:7.1f}MB")
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rows", type=int, default=1_000_000)
+    ap.add_argument("--variant", choices=sorted(VARIANTS))
+    args = ap.parse_args()
+
+    if args.variant:
+        run_variant(args.variant, args.rows)
+        return
+
+    for name in VARIANTS:
+        subprocess.run(
+            [sys.executable, "-m", "bench.bench_xlsx", "--rows", str(args.rows), "--variant", name],
+            check=True,
+        )
+
+
+if __name__ == "__main__":
+    main()
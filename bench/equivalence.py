@@ -0,0 +1,132 @@
+"""
+Проверка эквивалентности: выходы всех точек входа (converter.py на сыром
+JSON, конвейер core на модели, api.main на графах редактора) сверяются
+с дайджестами, сохранёнными в bench/equivalence.json.
+
+    python -m bench.equivalence                              # сверить, код возврата 1 при расхождении
+    python -m bench.equivalence --baseline 6f05a76           # сверить с выходами ревизии
+    python -m bench.equivalence --update --baseline 6f05a76  # перезаписать дайджесты
+
+Входы: jsons/*.json, синтетические документы bench.suite и синтетический
+сырой JSON рекомендаций (с пропущенными полями, пустыми значениями и
+неизвестными типами критериев). XLSX сверяется по строкам листа,
+а не по байтам файла (в файле есть время создания).
+
+С --baseline REV случаи, выразимые через API ревизии REV
+(bench.equivalence_base), считаются на её дереве (git archive во временный
+каталог, отдельный процесс), остальные — на текущем коде. С --update
+дайджесты базы пишутся в файл, только если текущий код с ними совпал;
+случаи без аналога в базе (стили TTL кроме turtle, CRITERIA_COMPACT,
+table_to_ttl, iter_documents) закрепляются по текущему коду.
+
+Порядок методов графа зависит от порядка обхода множеств, поэтому
+скрипт перезапускает себя с PYTHONHASHSEED=0.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from api.main import Graph, iter_ttl
+from core.model_loader import iter_documents
+from core.rules import CRITERIA_COMPACT, CRITERIA_PAIRWISE
+from core.triples_generator import generate_triples
+from core.ttl_generator import TTL_STYLES, document_to_ttl, table_to_ttl
+from bench.equivalence_base import (
+    Cases, base_graph_cases, graph_each, raw_cases, raw_model, run, synthetic_raw,
+)
+from bench.suite import DOC_PRESETS, load_corpus, synthetic_document
+
+BENCH_DIR = Path(__file__).resolve().parent
+ROOT = BENCH_DIR.parent
+PINS = BENCH_DIR / "equivalence.json"
+# дерево, нужное bench.equivalence_base на ревизии
+BASE_PATHS = ["api", "config", "converter.py", "core"]
+
+
+def doc_cases(doc) -> Cases:
+    return {
+        "triples_pairwise": lambda: generate_triples(doc).iter_tuples(),
+        "triples_compact": lambda: generate_triples(doc, CRITERIA_COMPACT).iter_tuples(),
+        "document_ttl": lambda: [document_to_ttl(doc)],
+        "table_ttl": lambda: [table_to_ttl(generate_triples(doc, CRITERIA_PAIRWISE))],
+    }
+
+
+def graph_cases(graphs: List[Graph]) -> Cases:
+    cases = base_graph_cases(graphs)
+    for style in TTL_STYLES:
+        cases[f"ttl_{style}"] = graph_each(graphs, lambda g, st, style=style: ["".join(iter_ttl(g, st, style=style))])
+    return cases
+
+
+def compute(src: str) -> Dict[str, Dict[str, str]]:
+    groups: Dict[str, Cases] = {}
+    corpus = load_corpus(src)
+    if corpus:
+        groups["corpus"] = graph_cases(corpus)
+    groups["raw_200"] = raw_cases(synthetic_raw(200))
+    groups["raw_200_model"] = doc_cases(raw_model(synthetic_raw(200)))
+    raw_doc, = iter_documents(synthetic_raw(200))
+    groups["raw_200_documents"] = doc_cases(raw_doc)
+    groups["doc_100"] = doc_cases(synthetic_document(*DOC_PRESETS["doc_100"]))
+    return run(groups)
+
+
+def compute_at(rev: str, src: str) -> Dict[str, Dict[str, str]]:
+    """Дайджесты bench.equivalence_base на дереве ревизии rev."""
+    with tempfile.TemporaryDirectory() as tmp:
+        archive = subprocess.run(["git", "archive", rev, *BASE_PATHS], cwd=ROOT, check=True, capture_output=True).stdout
+        subprocess.run(["tar", "-x", "-C", tmp], input=archive, check=True)
+        # -m кладёт cwd (дерево ревизии) первым в sys.path; пакет bench — из PYTHONPATH
+        out = subprocess.run(
+            [sys.executable, "-m", "bench.equivalence_base", os.path.abspath(src)],
+            cwd=tmp, check=True, capture_output=True,
+            env={**os.environ, "PYTHONPATH": str(ROOT)},
+        ).stdout
+    return json.loads(out)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description="Сверка выходов конвертеров с сохранёнными дайджестами.")
+    ap.add_argument("--src", default="jsons", help="каталог с реальными графами")
+    ap.add_argument("--update", action="store_true", help=f"перезаписать {PINS.name}")
+    ap.add_argument("--baseline", metavar="REV", help="ревизия-эталон для случаев, выразимых через её API")
+    args = ap.parse_args(argv)
+
+    if os.environ.get("PYTHONHASHSEED") != "0":
+        os.execve(sys.executable, [sys.executable, "-m", "bench.equivalence", *(sys.argv[1:] if argv is None else argv)],
+                  {**os.environ, "PYTHONHASHSEED": "0"})
+
+    result = compute(args.src)
+    if args.baseline:
+        base = compute_at(args.baseline, args.src)
+        pinned = {g: {**cases, **base.get(g, {})} for g, cases in result.items()}
+        source = {(g, name): args.baseline for g, cases in base.items() for name in cases}
+    elif args.update:
+        pinned, source = result, {}
+    else:
+        pinned, source = json.loads(PINS.read_text(encoding="utf-8")), {}
+
+    bad = 0
+    for group, cases in result.items():
+        for name, h in cases.items():
+            expected = pinned.get(group, {}).get(name)
+            status = "ok" if h == expected else ("new" if expected is None else "MISMATCH")
+            bad += status == "MISMATCH"
+            print(f"{group:<18} {name:<20} {status:<8} {source.get((group, name), 'HEAD' if args.baseline else '')}")
+    print(f"{bad} mismatch(es)")
+    if bad:
+        return 1
+    if args.update:
+        PINS.write_text(json.dumps(pinned, ensure_ascii=False, indent=1) + "\n", encoding="utf-8")
+        print(f"written {PINS}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,188 @@
+"""
+Общая часть bench.equivalence, совместимая с базовым коммитом (6f05a76):
+дайджест, синтетический сырой JSON, чтение листа XLSX и случаи, которые
+выражаются через API, уже существовавший в базе.
+
+Модуль импортирует только такой API, поэтому его же запускают на дереве
+базовой ревизии (bench.equivalence --baseline): оно первым в sys.path,
+на stdout — JSON {группа: {случай: дайджест}}.
+
+    python -m bench.equivalence_base jsons    # из каталога с деревом ревизии
+"""
+import hashlib
+import json
+import os
+import random
+import sys
+from typing import Any, Callable, Dict, Iterable, List
+
+import converter
+from api.main import Graph, generate_structural_triples, generate_ttl, triples_to_xlsx
+from core.model_loader import load_from_raw
+from core.triples_generator import generate_triples
+from core.ttl_generator import document_to_ttl
+from bench.suite import DOC_PRESETS, load_corpus, synthetic_document
+
+Cases = Dict[str, Callable[[], Iterable[Any]]]
+
+RAW_DISEASE = "Перелом надколенника (ПН)"
+
+
+def digest(parts: Iterable[Any]) -> str:
+    h = hashlib.sha256()
+    for p in parts:
+        h.update(p if isinstance(p, bytes) else repr(p).encode("utf-8"))
+        h.update(b"\x00")
+    return h.hexdigest()
+
+
+def synthetic_raw(recs: int, seed: int = 0) -> Dict[str, Any]:
+    """Сырой JSON рекомендаций в формате pn1_v1.json, с разными «неудобными» полями."""
+    rnd = random.Random(seed)
+    types = [
+        "КритерийПациент", "КритерийСимптом", "КритерийВремя", "КритерийВозможность", "для", "КритерийОсобый", "", None,
+        " КритерийПациент ",
+    ]
+    values = [None, None, "3", "", 0, 12, "да"]
+    counter = [0]
+
+    def nid(prefix: str) -> str:
+        counter[0] += 1
+        return f"{prefix}{counter[0]}"
+
+    def group(level: int) -> Dict[str, Any]:
+        g: Dict[str, Any] = {"id": nid("G")}
+        rule = rnd.choice(["ALL", "ANY", "NOT", "any", "", "missing"])
+        if rule != "missing":
+            g["правилоВыбора"] = rule
+        crits = []
+        for _ in range(rnd.randint(0, 4)):
+            c: Dict[str, Any] = {"id": nid("C")}
+            t = rnd.choice(types)
+            if t is not None:
+                c["тип"] = t
+            if rnd.random() < 0.8:
+                c["имя"] = f"критерий \"{rnd.randint(1, 40)}\""
+            v = rnd.choice(values)
+            if v is not None or rnd.random() < 0.5:
+                c["значение"] = v
+            crits.append(c)
+        if crits or rnd.random() < 0.5:
+            g["критерии"] = crits
+        if level < 3 and rnd.random() < 0.6:
+            g["подгруппыКритериев"] = [group(level + 1) for _ in range(rnd.randint(1, 2))]
+        return g
+
+    recommendations = []
+    for i in range(recs):
+        subs = []
+        for _ in range(rnd.randint(0, 2)):
+            sub: Dict[str, Any] = {"id": nid("S"), "методыЛечения": []}
+            if rnd.random() < 0.7:
+                sub["правилоВыбора"] = rnd.choice(["ANY", "ALL"])
+            for _ in range(rnd.randint(1, 3)):
+                m = {"id": nid("M")}
+                if rnd.random() < 0.7:
+                    m["label"] = f"метод \\ {rnd.randint(1, 20)}"
+                sub["методыЛечения"].append(m)
+            subs.append(sub)
+        gm: Dict[str, Any] = {"id": nid("MG"), "подгруппыМетодов": subs}
+        if rnd.random() < 0.85:
+            gm["группаКритериев"] = group(0)
+        rec: Dict[str, Any] = {"id": nid("R"), "группаМетодовЛечения": gm}
+        if rnd.random() < 0.9:
+            rec["тип"] = "лечение"
+        if rnd.random() < 0.8:
+            rec["УДД"] = rnd.randint(1, 5)
+        if rnd.random() < 0.8:
+            rec["УУР"] = rnd.choice(["A", "B ", "C"])
+        if rnd.random() < 0.9:
+            rec["номерСтраницы"] = rnd.choice([i % 50, "7", None])
+        if rnd.random() < 0.9:
+            rec["оригинальныйТекст"] = f"Рекомендация {i}: \"текст\"\n" + "слово " * rnd.randint(1, 10)
+        recommendations.append(rec)
+
+    return {
+        "Клинические рекомендации": {
+            RAW_DISEASE: {"кодМКБ": "S82.0", "рекомендации": recommendations},
+            "Без рекомендаций": {"рекомендации": []},
+        },
+    }
+
+
+def raw_model(raw: Dict[str, Any]):
+    """Документ заболевания RAW_DISEASE (load_from_raw есть и в базе)."""
+    doc_key, = raw
+    return load_from_raw(doc_key, RAW_DISEASE, raw)
+
+
+def xlsx_sheet_rows(graph: Graph, triples) -> List[tuple]:
+    """Строки листа файла triples_to_xlsx (без заголовка); файл удаляется."""
+    from openpyxl import load_workbook
+
+    path = triples_to_xlsx(triples, graph)
+    try:
+        wb = load_workbook(path, read_only=True)
+        rows = list(wb.active.iter_rows(min_row=2, values_only=True))
+        wb.close()
+    finally:
+        os.remove(path)
+    return rows
+
+
+def raw_cases(raw: Dict[str, Any]) -> Cases:
+    items = [
+        (doc_key, d_name, d_obj, rec)
+        for doc_key, doc_obj in raw.items()
+        for d_name, d_obj in doc_obj.items()
+        for rec in d_obj["рекомендации"]
+    ]
+    return {
+        "converter_ttl": lambda: (converter.recommendation_to_ttl(*it) for it in items),
+        "converter_triples": lambda: (
+            (t.subject, t.predicate, t.object, t.doc, t.page, t.rec_text)
+            for it in items for t in converter.recommendation_to_triples(*it)
+        ),
+    }
+
+
+def base_doc_cases(doc) -> Cases:
+    return {
+        "triples_pairwise": lambda: (
+            (t.subject, t.predicate, t.object, t.doc, t.page, t.rec_text) for t in generate_triples(doc)
+        ),
+        "document_ttl": lambda: [document_to_ttl(doc)],
+    }
+
+
+def graph_each(graphs: List[Graph], fn) -> Callable[[], Iterable[Any]]:
+    return lambda: (x for g in graphs for x in fn(g, generate_structural_triples(g)))
+
+
+def base_graph_cases(graphs: List[Graph]) -> Cases:
+    return {
+        "structural_triples": graph_each(
+            graphs, lambda g, st: [(t.subject, t.predicate, t.object) for t in st[0]] + [sorted(st[1].items())]
+        ),
+        "xlsx_rows": graph_each(graphs, lambda g, st: xlsx_sheet_rows(g, st[0])),
+        "ttl_turtle": graph_each(graphs, lambda g, st: [generate_ttl(g)]),
+    }
+
+
+def base_groups(src: str) -> Dict[str, Cases]:
+    groups: Dict[str, Cases] = {}
+    corpus = load_corpus(src)
+    if corpus:
+        groups["corpus"] = base_graph_cases(corpus)
+    groups["raw_200"] = raw_cases(synthetic_raw(200))
+    groups["raw_200_model"] = base_doc_cases(raw_model(synthetic_raw(200)))
+    groups["doc_100"] = base_doc_cases(synthetic_document(*DOC_PRESETS["doc_100"]))
+    return groups
+
+
+def run(groups: Dict[str, Cases]) -> Dict[str, Dict[str, str]]:
+    return {g: {name: digest(fn()) for name, fn in cases.items()} for g, cases in groups.items()}
+
+
+if __name__ == "__main__":
+    json.dump(run(base_groups(sys.argv[1] if len(sys.argv) > 1 else "jsons")), sys.stdout)
@@ -0,0 +1,273 @@
+"""
+Набор бенчмарков конвертера: реальные графы jsons/*.json и синтетические
+(число узлов, глубина логики, ветвление, доля НЕТ-групп), плюс синтетические
+документы для конвейера core.
+
+Для каждой пары (случай, функция) пишется:
+- wall_ms   — медиана времени по --repeat прогонам;
+- peak_kb   — пик памяти Python-аллокаций за вызов (tracemalloc);
+- blocks    — число выделенных и ещё живых к концу вызова блоков (tracemalloc).
+
+    python -m bench.suite --out bench/last.json
+    python -m bench.suite --baseline bench/baseline.json --fail-on-regression
+    python -m bench.suite --save-baseline            # перезаписать bench/baseline.json
+    python -m bench.suite --nodes 50000 --depth 20 --fanout 3 --not-density 0.3
+
+Случаи из пресетов и --nodes (custom) независимы; сравнение с базой идёт
+только по совпавшим ключам.
+"""
+import argparse
+import gc
+import glob
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from collections import deque
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from api.main import DocInfo, Graph, Link, Node, generate_structural_triples, generate_ttl, triples_to_xlsx
+from core.model import (
+    CriteriaGroup, Criterion, Disease, GuidelineDocument, MethodSubgroup, MethodsGroup,
+    Recommendation, TreatmentMethod,
+)
+from core.triples_generator import generate_triples
+from core.ttl_generator import document_to_ttl
+
+BENCH_DIR = Path(__file__).resolve().parent
+BASELINE = BENCH_DIR / "baseline.json"
+
+# (узлов, глубина, ветвление, доля НЕТ)
+GRAPH_PRESETS = {
+    "graph_1k": (1000, 6, 4, 0.1),
+    "graph_10k": (10000, 12, 6, 0.2),
+    "graph_deep": (2000, 200, 2, 0.3),
+}
+# (рекомендаций, глубина групп, ветвление, методов на рекомендацию)
+DOC_PRESETS = {
+    "doc_100": (100, 3, 4, 3),
+    "doc_1k": (1000, 3, 4, 3),
+}
+
+
+# ---------------- генераторы ----------------
+
+def synthetic_graph(nodes: int, depth: int, fanout: int, not_density: float, seed: int = 0) -> Graph:
+    """
+    root -> И -> 2 метода + дерево logic-групп (обход в ширину). У каждой
+    группы fanout детей: первый — подгруппа, пока не достигнута глубина,
+    остальные — подгруппы с вероятностью 0.3, иначе критерии. Если дерево
+    упёрлось в глубину раньше, под корнем растёт следующее. Когда узлов
+    набралось nodes, новые группы получают по одному критерию.
+    """
+    rnd = random.Random(seed)
+    ns = [
+        Node(id="root", type="root", label="ПН"),
+        Node(id="g0", type="logic", label="И"),
+        Node(id="m0", type="method", label="метод 0"),
+        Node(id="m1", type="method", label="метод 1"),
+    ]
+    ls = [Link(source="root", target="g0"), Link(source="g0", target="m0"), Link(source="g0", target="m1")]
+    roles = ["критерий пациент", "критерий симптом", "критерий время", "для"]
+    queue = deque([("g0", 0)])
+    while queue or len(ns) < nodes:
+        if not queue:
+            # дерево упёрлось в глубину — растим следующее под g0
+            gid = f"g{len(ns)}"
+            ns.append(Node(id=gid, type="logic", label=rnd.choice(("И", "ИЛИ"))))
+            ls.append(Link(source="g0", target=gid))
+            queue.append((gid, 1))
+        gid, level = queue.popleft()
+        full = len(ns) >= nodes
+        for k in range(1 if full else fanout):
+            nested = not full and level < depth and (k == 0 or rnd.random() < 0.3)
+            if nested:
+                cid = f"g{len(ns)}"
+                label = "НЕТ" if rnd.random() < not_density else rnd.choice(("И", "ИЛИ"))
+                ns.append(Node(id=cid, type="logic", label=label))
+                ls.append(Link(source=gid, target=cid))
+                queue.append((cid, level + 1))
+            else:
+                cid = f"c{len(ns)}"
+                ns.append(Node(id=cid, type="criteria", label=f"критерий {len(ns)}",
+                               value=str(rnd.randint(1, 9)) if rnd.random() < 0.2 else None))
+                ls.append(Link(source=gid, target=cid, predicate=rnd.choice(roles)))
+    return Graph(doc=DocInfo(id="bench", page="1", text="синтетический граф"), nodes=ns, links=ls)
+
+
+def synthetic_document(recs: int, depth: int, fanout: int, methods: int, seed: int = 0) -> GuidelineDocument:
+    rnd = random.Random(seed)
+    types = ["КритерийПациент", "КритерийСимптом", "КритерийВремя", "для"]
+    counter = [0]
+
+    def nid(prefix: str) -> str:
+        counter[0] += 1
+        return f"{prefix}{counter[0]}"
+
+    def group(level: int) -> CriteriaGroup:
+        g = CriteriaGroup(id=nid("G"), rule=rnd.choice(("ALL", "ALL", "ANY", "NOT")))
+        for _ in range(fanout):
+            g.criteria.append(Criterion(id=nid("C"), type=rnd.choice(types), name=f"критерий {rnd.randint(1, 500)}",
+                                        value=str(rnd.randint(1, 9)) if rnd.random() < 0.2 else None))
+        if level < depth:
+            g.subgroups = [group(level + 1) for _ in range(rnd.randint(1, 2))]
+        return g
+
+    recommendations = []
+    for i in range(recs):
+        ms = [TreatmentMethod(id=nid("M"), label=f"метод {rnd.randint(1, 50)}") for _ in range(methods)]
+        recommendations.append(Recommendation(
+            id=nid("R"), type="лечение", udd=rnd.randint(1, 5), uur="C", page=i % 300,
+            text=f"Рекомендация {i}: " + "текст " * 20,
+            methods_group=MethodsGroup(id=nid("MG"), criteria_group=group(0), subgroups=[MethodSubgroup(id=nid("S"), rule="ANY", methods=ms)]),
+        ))
+    disease = Disease(id="ПереломНадколенника", label="ПН", mkb_code="S82.0", recommendations=recommendations)
+    return GuidelineDocument(id="bench", title="bench", diseases=[disease], raw={})
+
+
+def load_corpus(src: str) -> List[Graph]:
+    return [Graph(**json.load(open(f, encoding="utf-8"))) for f in sorted(glob.glob(os.path.join(src, "*.json")))]
+
+
+# ---------------- замеры ----------------
+
+def xlsx_tmp(graph: Graph, structural) -> None:
+    os.remove(triples_to_xlsx(structural[0], graph))
+
+
+# graph-функции получают (граф, готовые структурные тройки); тройки
+# считаются до замера, чтобы triples_to_xlsx мерил только запись
+GRAPH_FUNCS: Dict[str, Callable[[Graph, Any], Any]] = {
+    "generate_structural_triples": lambda g, st: generate_structural_triples(g),
+    "generate_ttl": lambda g, st: generate_ttl(g),
+    "triples_to_xlsx": xlsx_tmp,
+}
+DOC_FUNCS: Dict[str, Callable[[GuidelineDocument], Any]] = {
+    "generate_triples": generate_triples,
+    "document_to_ttl": document_to_ttl,
+}
+
+
+def measure(fn: Callable[[], Any], repeat: int) -> Dict[str, float]:
+    times = []
+    for _ in range(repeat):
+        gc.collect()
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+
+    # память — отдельным прогоном: tracemalloc сильно замедляет код
+    gc.collect()
+    tracemalloc.start()
+    result = fn()
+    blocks = sum(s.count for s in tracemalloc.take_snapshot().statistics("filename"))
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return {"wall_ms": statistics.median(times) * 1000, "peak_kb": peak / 1024, "blocks": blocks}
+
+
+def run_cases(args) -> Dict[str, Dict[str, Dict[str, float]]]:
+    cases: List[Tuple[str, str, Any]] = []
+    corpus = load_corpus(args.src)
+    if corpus:
+        cases.append(("corpus", "graphs", corpus))
+    graph_presets = dict(GRAPH_PRESETS)
+    doc_presets = dict(DOC_PRESETS)
+    if args.quick:
+        graph_presets = {k: v for k, v in graph_presets.items() if k != "graph_10k"}
+        doc_presets = {k: v for k, v in doc_presets.items() if k != "doc_1k"}
+    if args.nodes:
+        graph_presets = {"custom": (args.nodes, args.depth, args.fanout, args.not_density)}
+        doc_presets = {}
+    for name, params in graph_presets.items():
+        cases.append((name, "graph", synthetic_graph(*params)))
+    for name, params in doc_presets.items():
+        cases.append((name, "doc", synthetic_document(*params)))
+
+    results: Dict[str, Dict[str, Dict[str, float]]] = {}
+    for name, kind, data in cases:
+        results[name] = {}
+        if kind == "doc":
+            calls = {fname: (lambda fn=fn: fn(data)) for fname, fn in DOC_FUNCS.items()}
+        else:
+            graphs = data if kind == "graphs" else [data]
+            pairs = [(g, generate_structural_triples(g)) for g in graphs]
+            calls = {fname: (lambda fn=fn: [fn(g, st) for g, st in pairs]) for fname, fn in GRAPH_FUNCS.items()}
+        for fname, call in calls.items():
+            r = results[name][fname] = measure(call, args.repeat)
+            print(f"  {name:<12} {fname:<28} {r['wall_ms']:10.2f} ms {r['peak_kb']:10.0f} KB {r['blocks']:9d} blocks", flush=True)
+    return results
+
+
+def git_rev() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, cwd=BENCH_DIR).stdout.strip()
+    except OSError:
+        return ""
+
+
+def compare(results: Dict, baseline: Dict, threshold: float) -> int:
+    """Печатает отношения к базе; возвращает число регрессий по wall_ms / peak_kb."""
+    regressions = 0
+    print(f"\n{'case':<12} {'function':<28} {'wall':>8} {'peak':>8}")
+    for case, funcs in results.items():
+        for fname, r in funcs.items():
+            b = baseline.get(case, {}).get(fname)
+            if not b:
+                continue
+            ratios = [r[k] / b[k] if b[k] else 1.0 for k in ("wall_ms", "peak_kb")]
+            bad = [k for k, x in zip(("wall", "peak"), ratios) if x > threshold]
+            regressions += bool(bad)
+            mark = "  REGRESSION: " + ", ".join(bad) if bad else ""
+            print(f"{case:<12} {fname:<28} {ratios[0]:7.2f}x {ratios[1]:7.2f}x{mark}")
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description="Бенчмарки конвертера.")
+    ap.add_argument("--src", default="jsons", help="каталог с реальными графами")
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--quick", action="store_true", help="без самых больших пресетов")
+    ap.add_argument("--nodes", type=int, default=0, help="один синтетический граф вместо пресетов")
+    ap.add_argument("--depth", type=int, default=10)
+    ap.add_argument("--fanout", type=int, default=4)
+    ap.add_argument("--not-density", type=float, default=0.1)
+    ap.add_argument("--out", help="куда записать результаты (JSON)")
+    ap.add_argument("--baseline", help="сравнить с сохранёнными результатами")
+    ap.add_argument("--save-baseline", action="store_true", help=f"записать результаты в {BASELINE.name}")
+    ap.add_argument("--threshold", type=float, default=1.5, help="отношение к базе, считающееся регрессией")
+    ap.add_argument("--fail-on-regression", action="store_true")
+    args = ap.parse_args(argv)
+
+    results = run_cases(args)
+    report = {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "git": git_rev(),
+            "repeat": args.repeat,
+        },
+        "results": results,
+    }
+    for path in filter(None, (args.out, BASELINE if args.save_baseline else None)):
+        Path(path).write_text(json.dumps(report, ensure_ascii=False, indent=1), encoding="utf-8")
+        print(f"written {path}")
+
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text(encoding="utf-8"))["results"]
+        regressions = compare(results, baseline, args.threshold)
+        print(f"{regressions} regression(s) over {args.threshold:.2f}x")
+        if regressions and args.fail_on_regression:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
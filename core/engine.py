@@ -0,0 +1,146 @@
+# core/engine.py
+"""
+Общий движок конвертации.
+
+Каждый вход опускается фронтендом в одно промежуточное представление,
+а выход строят общие эмиттеры. Так оптимизация эмиттера (интернирование
+таблицы, потоковый TTL, write-only XLSX) достаётся всем точкам входа сразу.
+
+Промежуточное представление:
+- единица троек (Unit) — строки (subject, predicate, object) одной
+  рекомендации плюс её doc / page / rec_text;
+- поток утверждений TTL — (subject, predicate, object) либо None
+  (граница блока), термы — префиксные имена / лексемы и Literal
+  (см. ttl_generator).
+
+Фронтенды (Frontend):
+- ModelFrontend — модель core.model (конвейер core);
+- converter.RawFrontend — сырой JSON рекомендаций;
+- api.main.GraphFrontend — граф редактора.
+
+Эмиттеры: emit_table / emit_rows (тройки), emit_ttl (все стили TTL),
+emit_xlsx, emit_store (SQLite, core.triple_store). Сквозные функции:
+to_table, to_ttl, to_xlsx, to_store.
+"""
+from operator import itemgetter
+from typing import IO, Any, Dict, Iterable, Iterator, List, Optional, Protocol, Sequence, Tuple, Union
+
+from .model import GuidelineDocument
+from .rules import CRITERIA_PAIRWISE, RULES, SPO, Context, Rule, compile_rules
+from .triple_store import TripleStore
+from .triples_table import TripleTable
+from .triples_types import TripleRow
+from .ttl_generator import ONTOLOGY_PREFIXES, TTL_CHUNK_SIZE, document_statements, iter_statements_text
+from .xlsx_export import TRIPLES_HEADER, write_xlsx_rows
+
+# строки одной рекомендации, doc, page, rec_text
+Unit = Tuple[Iterable[SPO], str, Any, str]
+
+# колонки полной строки: subject, predicate, object, doc, page, rec_text
+ROW_COLUMNS = (0, 1, 2, 3, 4, 5)
+
+
+class Frontend(Protocol):
+    prefixes: Dict[str, str]   # префиксы TTL
+    ttl_style: str             # стиль TTL по умолчанию
+
+    def units(self, src: Any) -> Iterator[Unit]:
+        ...
+
+    def statements(self, src: Any) -> Iterator[Optional[tuple]]:
+        ...
+
+
+# ---------------- эмиттеры ----------------
+
+def emit_table(units: Iterable[Unit]) -> TripleTable:
+    """Единицы -> TripleTable (строки интернируются, текст рекомендации — один раз)."""
+    table = TripleTable()
+    for rows, doc, page, text in units:
+        table.extend_spo(rows, doc, page, table.add_rec(text))
+    return table
+
+
+def emit_rows(units: Iterable[Unit]) -> Iterator[TripleRow]:
+    for rows, doc, page, text in units:
+        for s, p, o in rows:
+            yield TripleRow(s, p, o, doc, page, text)
+
+
+def emit_ttl(
+    statements: Iterable,
+    prefixes: Dict[str, str],
+    style: str = "turtle",
+    chunk_size: int = TTL_CHUNK_SIZE,
+) -> Iterator[str]:
+    """Поток утверждений -> куски TTL (стили ttl_generator.TTL_STYLES)."""
+    return iter_statements_text(statements, prefixes, style, chunk_size)
+
+
+def xlsx_rows(units: Iterable[Unit], columns: Sequence[int] = ROW_COLUMNS) -> Iterator[tuple]:
+    """Строки листа: колонки полной строки в порядке columns."""
+    pick = itemgetter(*columns)
+    for rows, doc, page, text in units:
+        for s, p, o in rows:
+            yield pick((s, p, o, doc, page, text))
+
+
+def emit_xlsx(
+    target: Union[str, IO[bytes]],
+    units: Iterable[Unit],
+    header: Sequence[str] = TRIPLES_HEADER,
+    columns: Sequence[int] = ROW_COLUMNS,
+) -> None:
+    write_xlsx_rows(target, header, xlsx_rows(units, columns))
+
+
+def emit_store(store: TripleStore, units: Iterable[Unit], source: str = "", replace: bool = True) -> int:
+    """Единицы -> строки хранилища под источником source (пачками, см. TripleStore.load_rows)."""
+    return store.load_rows(
+        ((s, p, o, doc, page, text) for rows, doc, page, text in units for s, p, o in rows),
+        source, replace,
+    )
+
+
+# ---------------- сквозные функции ----------------
+
+def to_table(frontend: Frontend, src: Any) -> TripleTable:
+    return emit_table(frontend.units(src))
+
+
+def to_ttl(frontend: Frontend, src: Any, style: Optional[str] = None, chunk_size: int = TTL_CHUNK_SIZE) -> Iterator[str]:
+    return emit_ttl(frontend.statements(src), frontend.prefixes, style or frontend.ttl_style, chunk_size)
+
+
+def to_xlsx(frontend: Frontend, src: Any, target: Union[str, IO[bytes]]) -> None:
+    emit_xlsx(target, frontend.units(src))
+
+
+def to_store(frontend: Frontend, src: Any, store: TripleStore, source: str = "", replace: bool = True) -> int:
+    return emit_store(store, frontend.units(src), source, replace)
+
+
+# ---------------- фронтенд модели ----------------
+
+class ModelFrontend:
+    """
+    GuidelineDocument -> единицы по правилам реестра (слитым compile_rules)
+    и онтологический TTL (ttl_generator.document_statements).
+    """
+
+    prefixes = ONTOLOGY_PREFIXES
+    ttl_style = "grouped"
+
+    def __init__(self, criteria_mode: str = CRITERIA_PAIRWISE, rules: Optional[List[Rule]] = None):
+        self.criteria_mode = criteria_mode
+        self.rules = RULES if rules is None else rules
+
+    def units(self, doc: GuidelineDocument) -> Iterator[Unit]:
+        run = compile_rules(self.rules)
+        for disease in doc.diseases:
+            for rec in disease.recommendations:
+                ctx = Context(doc=doc, disease=disease, rec=rec, criteria_mode=self.criteria_mode)
+                yield run(ctx), doc.id, rec.page, rec.text
+
+    def statements(self, doc: GuidelineDocument) -> Iterator[Optional[tuple]]:
+        return document_statements(doc)
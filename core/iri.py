@@ -0,0 +1,53 @@
+# core/iri.py
+import hashlib
+import re
+from functools import lru_cache
+from typing import Any, Dict, Optional
+
+# размер LRU-кэша выданных ID (на процесс)
+IRI_CACHE_SIZE = 65536
+
+_WS_RE = re.compile(r"\s+")
+_SLUG_RE = re.compile(r"[^0-9a-zA-Zа-яА-Я_]+")
+
+PREFIXES = {
+    "root": "diag",
+    "method": "method",
+    "criteria": "crit",
+    "logic": "grp",
+}
+
+
+def norm(s: Optional[Any]) -> str:
+    if s is None:
+        return ""
+    s = str(s).strip().lower()
+    s = s.replace("ё", "е")
+    return _WS_RE.sub(" ", s)
+
+
+@lru_cache(maxsize=IRI_CACHE_SIZE)
+def _mint(doc_id: str, node_type: str, label: str, value: str, note: str) -> str:
+    # аргументы уже нормализованы: одинаковые сущности попадают в один ключ
+    prefix = PREFIXES.get(node_type, "ent")
+    slug = _SLUG_RE.sub("_", label)[:40].strip("_") or "x"
+    base = f"{doc_id}|{node_type}|{label}|{value}|{note}"
+    h = hashlib.sha1(base.encode("utf-8")).hexdigest()[:8]
+    return f"{prefix}_{slug}_{h}"
+
+
+def stable_id(doc_id: str, node_type: str, label: str, value: Optional[str], note: Optional[str]) -> str:
+    """
+    Детерминированный ID сущности (стабильный в рамках документа):
+    prefix_slug_hash8. Хэш считается один раз на нормализованный кортеж.
+    """
+    return _mint(doc_id, node_type, norm(label), norm(value), norm(note))
+
+
+def iri_cache_stats() -> Dict[str, int]:
+    info = _mint.cache_info()
+    return {"hits": info.hits, "misses": info.misses, "size": info.currsize, "maxsize": info.maxsize}
+
+
+def iri_cache_clear() -> None:
+    _mint.cache_clear()
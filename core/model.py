@@ -1,6 +1,6 @@
 # core/model.py
 from dataclasses import dataclass, field
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Sequence
 
 @dataclass
 class Criterion:
@@ -48,11 +48,11 @@ class Disease:
     id: str          # "ПереломНадколенника"
     label: str       # "ПН" и т.п.
     mkb_code: str
-    recommendations: List[Recommendation]
+    recommendations: Sequence[Recommendation]   # у загрузчика — ленивая LazyRecommendations
 
 @dataclass
 class GuidelineDocument:
     id: str              # doc_key
     title: str
     diseases: List[Disease]
-    raw: Dict[str, Any]  # исходный JSON при желании
+    raw: Dict[str, Any]  # исходный JSON при желании ({} — не сохраняли)
@@ -1,71 +1,137 @@
 # core/model_loader.py
+import json
+import re
+from collections.abc import Sequence
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Tuple, Union
 from .model import *
 
-def load_from_raw(doc_key: str, disease_key: str, raw: dict) -> GuidelineDocument:
-    d_obj = raw[doc_key][disease_key]
 
-    disease = Disease(
-        id="ПереломНадколенника",
-        label=disease_key.replace("(ПН)", "ПН").strip(),
-        mkb_code=d_obj.get("кодМКБ", ""),
-        recommendations=[],
-    )
+def parse_recommendation(rec_raw: Dict[str, Any], group_rule: str = "ALL") -> Recommendation:
+    """
+    JSON рекомендации -> Recommendation.
+    group_rule — правило группы критериев без "правилоВыбора".
+    """
+    gm_raw = rec_raw["группаМетодовЛечения"]
 
-    for rec_raw in d_obj["рекомендации"]:
-        gm_raw = rec_raw["группаМетодовЛечения"]
-
-        # методы
-        subgroups = []
-        for sub in gm_raw.get("подгруппыМетодов", []):
-            methods = [
-                TreatmentMethod(id=m["id"], label=m.get("label", m["id"]))
-                for m in sub.get("методыЛечения", [])
-            ]
-            subgroups.append(
-                MethodSubgroup(
-                    id=sub["id"],
-                    rule=sub.get("правилоВыбора", "ANY"),
-                    methods=methods,
-                )
+    # методы
+    subgroups = []
+    for sub in gm_raw.get("подгруппыМетодов", []):
+        methods = [
+            TreatmentMethod(id=m["id"], label=m.get("label", m["id"]))
+            for m in sub.get("методыЛечения", [])
+        ]
+        subgroups.append(
+            MethodSubgroup(
+                id=sub["id"],
+                rule=sub.get("правилоВыбора", "ANY"),
+                methods=methods,
             )
+        )
 
-        # критерии – рекурсивно
-        def parse_group(gr_raw) -> CriteriaGroup:
-            return CriteriaGroup(
-                id=gr_raw["id"],
-                rule=gr_raw.get("правилоВыбора", "ALL"),
-                criteria=[
-                    Criterion(
-                        id=c["id"],
-                        type=c.get("тип", ""),
-                        name=c.get("имя", c["id"]),
-                        value=c.get("значение"),
-                    )
-                    for c in gr_raw.get("критерии", [])
-                ],
-                subgroups=[parse_group(g) for g in gr_raw.get("подгруппыКритериев", [])],
-            )
+    # критерии – рекурсивно
+    def parse_group(gr_raw) -> CriteriaGroup:
+        return CriteriaGroup(
+            id=gr_raw["id"],
+            rule=gr_raw.get("правилоВыбора", group_rule),
+            criteria=[
+                Criterion(
+                    id=c["id"],
+                    type=c.get("тип", ""),
+                    name=c.get("имя", c["id"]),
+                    value=c.get("значение"),
+                )
+                for c in gr_raw.get("критерии", [])
+            ],
+            subgroups=[parse_group(g) for g in gr_raw.get("подгруппыКритериев", [])],
+        )
 
-        cg = gm_raw.get("группаКритериев")
-        criteria_group = parse_group(cg) if cg else None
+    cg = gm_raw.get("группаКритериев")
+    criteria_group = parse_group(cg) if cg else None
 
-        mg = MethodsGroup(
-            id=gm_raw["id"],
-            criteria_group=criteria_group,
-            subgroups=subgroups,
-        )
+    mg = MethodsGroup(
+        id=gm_raw["id"],
+        criteria_group=criteria_group,
+        subgroups=subgroups,
+    )
 
-        rec = Recommendation(
-            id=rec_raw["id"],
-            type=rec_raw.get("тип", ""),
-            udd=rec_raw.get("УДД"),
-            uur=str(rec_raw.get("УУР")) if rec_raw.get("УУР") else None,
-            page=int(rec_raw.get("номерСтраницы", 0) or 0),
-            text=rec_raw.get("оригинальныйТекст", ""),
-            methods_group=mg,
-        )
+    return Recommendation(
+        id=rec_raw["id"],
+        type=rec_raw.get("тип", ""),
+        udd=rec_raw.get("УДД"),
+        uur=str(rec_raw.get("УУР")) if rec_raw.get("УУР") else None,
+        page=int(rec_raw.get("номерСтраницы", 0) or 0),
+        text=rec_raw.get("оригинальныйТекст", ""),
+        methods_group=mg,
+    )
+
+
+class LazyRecommendations(Sequence):
+    """
+    Рекомендации заболевания, разбираемые при обращении.
+    Разобранные объекты не кэшируются: при обходе в памяти живёт одна
+    разобранная рекомендация, повторный обход разбирает JSON заново.
+    Сам исходный JSON (список raw) живёт, пока жив объект, — то есть
+    весь документ: объём памяти ограничен исходным файлом, а не одной
+    рекомендацией (см. iter_source).
+    """
+
+    __slots__ = ("_raw",)
+
+    def __init__(self, raw: List[Dict[str, Any]]):
+        self._raw = raw
+
+    @property
+    def raw(self) -> List[Dict[str, Any]]:
+        """Исходные JSON-объекты рекомендаций (например, для передачи в другой процесс)."""
+        return self._raw
+
+    def __len__(self) -> int:
+        return len(self._raw)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [parse_recommendation(r) for r in self._raw[i]]
+        return parse_recommendation(self._raw[i])
+
+    def __iter__(self) -> Iterator[Recommendation]:
+        for r in self._raw:
+            yield parse_recommendation(r)
 
-        disease.recommendations.append(rec)
+    def __repr__(self) -> str:
+        return f"LazyRecommendations({len(self._raw)})"
+
+
+_PAREN_RE = re.compile(r"\([^)]*\)")
+_WORD_RE = re.compile(r"\w+")
+
+def disease_id(disease_key: str, d_obj: Dict[str, Any]) -> str:
+    """
+    id заболевания: явное поле "id", иначе ключ без скобок в CamelCase
+    ("Перелом надколенника (ПН)" -> "ПереломНадколенника").
+    """
+    if d_obj.get("id"):
+        return str(d_obj["id"])
+    words = _WORD_RE.findall(_PAREN_RE.sub(" ", disease_key)) or _WORD_RE.findall(disease_key)
+    return "".join(w[:1].upper() + w[1:] for w in words) or "Заболевание"
+
+
+def parse_disease(disease_key: str, d_obj: Dict[str, Any]) -> Disease:
+    return Disease(
+        id=disease_id(disease_key, d_obj),
+        label=disease_key.replace("(ПН)", "ПН").strip(),
+        mkb_code=d_obj.get("кодМКБ", ""),
+        recommendations=LazyRecommendations(d_obj.get("рекомендации", [])),
+    )
+
+
+def is_disease(value: Any) -> bool:
+    return isinstance(value, dict) and "рекомендации" in value
+
+
+def load_from_raw(doc_key: str, disease_key: str, raw: dict) -> GuidelineDocument:
+    disease = parse_disease(disease_key, raw[doc_key][disease_key])
+    disease.recommendations = list(disease.recommendations)
 
     return GuidelineDocument(
         id=doc_key,
@@ -73,3 +139,57 @@ def load_from_raw(doc_key: str, disease_key: str, raw: dict) -> GuidelineDocumen
         diseases=[disease],
         raw=raw,
     )
+
+
+def iter_diseases(raw: Dict[str, Any]) -> Iterator[Tuple[str, Disease]]:
+    """(doc_key, Disease) для всех документов и заболеваний исходного JSON."""
+    for doc_key, doc_obj in raw.items():
+        if not isinstance(doc_obj, dict):
+            continue
+        for disease_key, d_obj in doc_obj.items():
+            if is_disease(d_obj):
+                yield doc_key, parse_disease(disease_key, d_obj)
+
+
+def iter_documents(raw: Dict[str, Any], keep_raw: bool = False) -> Iterator[GuidelineDocument]:
+    """
+    По GuidelineDocument на каждый ключ документа верхнего уровня, со всеми
+    его заболеваниями. Рекомендации ленивые (LazyRecommendations);
+    исходный JSON остаётся в doc.raw только при keep_raw=True.
+    """
+    for doc_key, doc_obj in raw.items():
+        if not isinstance(doc_obj, dict):
+            continue
+        diseases = [parse_disease(k, v) for k, v in doc_obj.items() if is_disease(v)]
+        if not diseases:
+            continue
+        yield GuidelineDocument(
+            id=doc_key,
+            title=doc_key,
+            diseases=diseases,
+            raw=raw if keep_raw else {},
+        )
+
+
+def iter_source(
+    source: Union[str, Path],
+    pattern: str = "*.json",
+    keep_raw: bool = False,
+) -> Iterator[GuidelineDocument]:
+    """
+    Документы из файла или каталога (рекурсивно по pattern).
+    Файлы читаются по одному: в памяти JSON только текущего файла.
+
+    Граница памяти — один файл, а не одна рекомендация: файл разбирается
+    json целиком, и рекомендации документа держат свою часть разобранного
+    JSON, пока документ жив. Потоковый разбор (ijson) сделал бы рекомендации
+    одноразовыми, а LazyRecommendations — последовательность с len и
+    срезами (на срезах raw строится шардирование core.parallel); большие
+    сборники стоит держать по файлу на документ.
+    """
+    path = Path(source)
+    files = sorted(path.rglob(pattern)) if path.is_dir() else [path]
+    for f in files:
+        raw = json.loads(f.read_text(encoding="utf-8"))
+        if isinstance(raw, dict):
+            yield from iter_documents(raw, keep_raw)
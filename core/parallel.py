@@ -0,0 +1,209 @@
+# core/parallel.py
+"""
+Параллельная генерация троек и TTL по рекомендациям.
+
+Документ режется на шарды (подряд идущие рекомендации одного заболевания),
+шарды обрабатываются в пуле процессов, результаты склеиваются строго в
+исходном порядке — вывод совпадает с последовательным путём.
+Выигрыш есть только при нескольких ядрах: на одном ядре передача шардов
+между процессами — чистые накладные расходы.
+
+Размер шарда подстраивается под рекомендации: шард набирается, пока
+оценка его строк (rec_weight) не превысит SHARD_WEIGHT, так что крупная
+рекомендация едет одна, а мелкие — пачкой. Шарды отправляются по мере
+чтения (ленивые рекомендации из model_loader не разбираются все сразу),
+в работе одновременно не больше workers * 2 шардов.
+
+Воркеры видят реестр RULES своего процесса: правила, добавленные в RULES
+во время работы, попадут туда только при fork-старте пула.
+"""
+import os
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import Callable, Iterable, Iterator, List, Optional, Tuple
+
+from .model import (
+    CriteriaGroup, Criterion, Disease, GuidelineDocument, MethodSubgroup, MethodsGroup,
+    Recommendation, TreatmentMethod,
+)
+from .model_loader import LazyRecommendations, parse_recommendation
+from .engine import ModelFrontend, emit_table
+from .triples_table import TripleTable
+
+# оценка строк на шард
+SHARD_WEIGHT = 20000
+
+
+def rec_weight(rec: Recommendation) -> int:
+    """Примерное число строк рекомендации в попарном режиме (методы x критерии + связи)."""
+    mg = rec.methods_group
+    methods = sum(len(s.methods) for s in mg.subgroups)
+    w = 1 + methods
+    stack = [mg.criteria_group] if mg.criteria_group else []
+    while stack:
+        g = stack.pop()
+        n = len(g.criteria)
+        w += n * (methods + 1) + n * (n - 1) // 2 + 1
+        stack.extend(g.subgroups)
+    return w
+
+
+def _stub_doc(doc: GuidelineDocument) -> GuidelineDocument:
+    return GuidelineDocument(id=doc.id, title=doc.title, diseases=[], raw={})
+
+
+def _stub_disease(d: Disease) -> Disease:
+    return Disease(id=d.id, label=d.label, mkb_code=d.mkb_code, recommendations=[])
+
+
+# --- упаковка рекомендаций для передачи в воркер ---
+# dataclass-деревья pickle собирает заново медленно (дороже самой генерации),
+# поэтому в воркер едут кортежи, а ленивые рекомендации — исходным JSON.
+
+def _pack_group(g: CriteriaGroup) -> tuple:
+    return (
+        g.id, g.rule,
+        tuple((c.id, c.type, c.name, c.value) for c in g.criteria),
+        tuple(_pack_group(sg) for sg in g.subgroups),
+    )
+
+
+def _unpack_group(t: tuple) -> CriteriaGroup:
+    gid, rule, crits, subs = t
+    return CriteriaGroup(
+        id=gid, rule=rule,
+        criteria=[Criterion(*c) for c in crits],
+        subgroups=[_unpack_group(sg) for sg in subs],
+    )
+
+
+def pack_recommendation(r: Recommendation) -> tuple:
+    mg = r.methods_group
+    return (
+        r.id, r.type, r.udd, r.uur, r.page, r.text,
+        mg.id,
+        _pack_group(mg.criteria_group) if mg.criteria_group else None,
+        tuple((sub.id, sub.rule, tuple((m.id, m.label) for m in sub.methods)) for sub in mg.subgroups),
+    )
+
+
+def unpack_recommendation(t: tuple) -> Recommendation:
+    rid, rtype, udd, uur, page, text, mg_id, cg, subs = t
+    return Recommendation(
+        id=rid, type=rtype, udd=udd, uur=uur, page=page, text=text,
+        methods_group=MethodsGroup(
+            id=mg_id,
+            criteria_group=_unpack_group(cg) if cg else None,
+            subgroups=[MethodSubgroup(sid, rule, [TreatmentMethod(*m) for m in ms]) for sid, rule, ms in subs],
+        ),
+    )
+
+
+def _unpack(payload: Tuple[str, list]) -> List[Recommendation]:
+    kind, items = payload
+    if kind == "raw":
+        return [parse_recommendation(r) for r in items]
+    return [unpack_recommendation(t) for t in items]
+
+
+def _shard_payload(d: Disease, start: int, recs: List[Recommendation]) -> Tuple[str, list]:
+    if isinstance(d.recommendations, LazyRecommendations):
+        return "raw", d.recommendations.raw[start:start + len(recs)]
+    return "packed", [pack_recommendation(r) for r in recs]
+
+
+def iter_shards(doc: GuidelineDocument, weight: int = SHARD_WEIGHT) -> Iterator[Tuple[int, Disease, Tuple[str, list]]]:
+    """
+    (индекс заболевания, заглушка заболевания, упакованные рекомендации шарда)
+    в порядке документа.
+    """
+    for di, d in enumerate(doc.diseases):
+        stub = _stub_disease(d)
+        chunk: List[Recommendation] = []
+        start = acc = 0
+        for i, rec in enumerate(d.recommendations):
+            chunk.append(rec)
+            acc += rec_weight(rec)
+            if acc >= weight:
+                yield di, stub, _shard_payload(d, start, chunk)
+                chunk, acc, start = [], 0, i + 1
+        # заболевание без рекомендаций — пустой шард (в TTL у него есть свой блок)
+        if chunk or not d.recommendations:
+            yield di, stub, _shard_payload(d, start, chunk)
+
+
+def ordered_map(executor: Executor, fn: Callable, items: Iterable[tuple], inflight: int) -> Iterator:
+    """executor.submit(fn, *item) с ограничением числа задач в работе; результаты — по порядку items."""
+    pending: deque = deque()
+    for item in items:
+        pending.append(executor.submit(fn, *item))
+        if len(pending) >= inflight:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+def _run(doc: GuidelineDocument, fn: Callable, args: Callable, workers: Optional[int], executor: Optional[Executor]) -> Iterator:
+    workers = workers or os.cpu_count() or 1
+    stub = _stub_doc(doc)
+    items = (args(stub, *shard) for shard in iter_shards(doc))
+    if executor is not None:
+        yield from ordered_map(executor, fn, items, workers * 2)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        yield from ordered_map(pool, fn, items, workers * 2)
+
+
+# --- тройки ---
+
+def _triples_shard(doc: GuidelineDocument, disease: Disease, payload: Tuple[str, list], criteria_mode: str) -> TripleTable:
+    disease = Disease(id=disease.id, label=disease.label, mkb_code=disease.mkb_code, recommendations=_unpack(payload))
+    shard = GuidelineDocument(id=doc.id, title=doc.title, diseases=[disease], raw={})
+    return emit_table(ModelFrontend(criteria_mode).units(shard))
+
+
+def generate_triples_parallel(
+    doc: GuidelineDocument,
+    criteria_mode: str,
+    workers: Optional[int] = None,
+    executor: Optional[Executor] = None,
+) -> TripleTable:
+    table = TripleTable()
+    shards = _run(doc, _triples_shard, lambda stub, di, d, payload: (stub, d, payload, criteria_mode), workers, executor)
+    for part in shards:
+        table.extend_table(part)
+    return table
+
+
+# --- TTL ---
+
+def _ttl_shard(doc_id: str, disease: Disease, payload: Tuple[str, list], with_disease: bool) -> str:
+    from .ttl_generator import disease_to_ttl, recommendation_to_ttl
+
+    lines: List[str] = disease_to_ttl(disease, doc_id) if with_disease else []
+    for r in _unpack(payload):
+        lines.extend(recommendation_to_ttl(disease, r, doc_id))
+    return "\n".join(lines)
+
+
+def iter_document_ttl_parallel(
+    doc: GuidelineDocument,
+    workers: Optional[int] = None,
+    executor: Optional[Executor] = None,
+) -> Iterator[str]:
+    """
+    Куски TTL документа в порядке последовательного iter_document_ttl:
+    "".join(...) совпадает с document_to_ttl(doc) байт в байт.
+    """
+    from .ttl_generator import ONTOLOGY_PREFIXES, prefix_lines
+
+    seen = set()
+
+    def args(stub, di, d, payload):
+        first = di not in seen
+        seen.add(di)
+        return stub.id, d, payload, first
+
+    yield "\n".join(prefix_lines(ONTOLOGY_PREFIXES))
+    for text in _run(doc, _ttl_shard, args, workers, executor):
+        yield "\n" + text
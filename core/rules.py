@@ -1,6 +1,8 @@
 # core/rules.py
+from abc import ABC, abstractmethod
 from dataclasses import dataclass
-from typing import List, Protocol
+from functools import cached_property
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Protocol, Tuple
 from .model import *
 from .triples_types import TripleRow
 import json
@@ -12,13 +14,58 @@ CONFIG_DIR = Path(__file__).resolve().parent.parent / "config"
 PREDICATES = json.loads((CONFIG_DIR / "predicates.json").read_text(encoding="utf-8"))
 CLASSES = json.loads((CONFIG_DIR / "classes.json").read_text(encoding="utf-8"))
 
+# --- таблицы, разрешённые один раз при импорте ---
+
+P_DIAGNOSIS = PREDICATES["diagnosis"]
+P_RECOMMENDED = PREDICATES["recommended"]
+P_VALUE = PREDICATES["value"]
+P_AND = PREDICATES["and"]
+P_OR = PREDICATES["or"]
+P_CRITERIA_GROUP = PREDICATES["criteria_group"]
+P_CRITERIA_SUBGROUP = PREDICATES["criteria_subgroup"]
+P_RULE = PREDICATES["rule"]
+
+class CriterionPredicates(dict):
+    """
+    Таблица: тип критерия -> (предикат, предикат с ", NOT") из
+    config/classes.json. Неизвестный тип разрешается при первом обращении
+    и запоминается. strip=True — тип с пробелами по краям ищется без них
+    (так делает converter.py); в core тип сравнивается точно.
+    """
+
+    def __init__(self, default: str, strip: bool = False):
+        suffix = PREDICATES["not_suffix"]
+        super().__init__(
+            (ctype, (PREDICATES[key], PREDICATES[key] + suffix))
+            for ctype, key in CLASSES["criterion_type_to_predicate"].items()
+        )
+        self.default = (default, default + suffix)
+        self.strip = strip
+
+    def __missing__(self, ctype) -> Tuple[str, str]:
+        key = (ctype or "").strip() if self.strip else None
+        preds = self[key] if key and key != ctype else self.default
+        self[ctype] = preds
+        return preds
+
+
+# неизвестный тип в core — "для"
+_CRITERION_PREDS = CriterionPredicates(PREDICATES["criterion_goal"])
+
 def pred_key(name: str) -> str:
     return PREDICATES[name]
 
 def map_criterion_predicate(ctype: str, negate: bool = False) -> str:
-    key = CLASSES["criterion_type_to_predicate"].get(ctype, "criterion_goal")
-    base = pred_key(key)
-    return base + (PREDICATES["not_suffix"] if negate else "")
+    return _CRITERION_PREDS[ctype][negate]
+
+
+# режимы выдачи критериев (CriteriaRule)
+CRITERIA_PAIRWISE = "pairwise"
+CRITERIA_COMPACT = "compact"
+CRITERIA_MODES = (CRITERIA_PAIRWISE, CRITERIA_COMPACT)
+
+# строка без doc/page/rec_text — они общие для всей рекомендации (Context)
+SPO = Tuple[str, str, str]
 
 
 @dataclass
@@ -26,6 +73,12 @@ class Context:
     doc: GuidelineDocument
     disease: Disease
     rec: Recommendation
+    criteria_mode: str = CRITERIA_PAIRWISE
+
+    @cached_property
+    def methods(self) -> List[str]:
+        """Метки методов рекомендации (общие для нескольких правил)."""
+        return [m.label for sub in self.rec.methods_group.subgroups for m in sub.methods]
 
 
 class Rule(Protocol):
@@ -33,120 +86,222 @@ class Rule(Protocol):
         ...
 
 
+class RowsRule(ABC):
+    """
+    База правил с ленивой выдачей: rows(ctx) отдаёт (subject, predicate, object),
+    apply(ctx) собирает из них TripleRow со значениями из контекста.
+    Правила только с apply() тоже работают (см. compile_rules).
+    """
+
+    @abstractmethod
+    def rows(self, ctx: Context) -> Iterator[SPO]:
+        ...
+
+    def apply(self, ctx: Context) -> List[TripleRow]:
+        doc, page, text = ctx.doc.id, ctx.rec.page, ctx.rec.text
+        return [TripleRow(s, p, o, doc, page, text) for s, p, o in self.rows(ctx)]
+
+
 # --- Конкретные правила ---
 
-class DiagnosisRule:
+class DiagnosisRule(RowsRule):
     """пациенты -> диагноз -> {болезнь}"""
 
-    def apply(self, ctx: Context) -> List[TripleRow]:
-        d = ctx.disease
-        r = ctx.rec
-        return [
-            TripleRow(
-                subject="пациенты",
-                predicate=pred_key("diagnosis"),
-                object=d.label,
-                doc=ctx.doc.id,
-                page=r.page,
-                rec_text=r.text,
-            )
-        ]
-
-
-class RecommendationRule:
+    def rows(self, ctx: Context) -> Iterator[SPO]:
+        yield "пациенты", P_DIAGNOSIS, ctx.disease.label
+
+
+class RecommendationRule(RowsRule):
     """{болезнь} -> рекомендуется -> {метод}"""
 
-    def apply(self, ctx: Context) -> List[TripleRow]:
-        d = ctx.disease
-        r = ctx.rec
-        triples = []
-        mg = r.methods_group
-        for sub in mg.subgroups:
-            for m in sub.methods:
-                triples.append(
-                    TripleRow(
-                        subject=d.label,
-                        predicate=pred_key("recommended"),
-                        object=m.label,
-                        doc=ctx.doc.id,
-                        page=r.page,
-                        rec_text=r.text,
-                    )
-                )
-        return triples
-
-
-class CriteriaRule:
+    def rows(self, ctx: Context) -> Iterator[SPO]:
+        d = ctx.disease.label
+        for m in ctx.methods:
+            yield d, P_RECOMMENDED, m
+
+
+class CriteriaRule(RowsRule):
     """
     Для каждой группы критериев создаём:
     - метод -> критерий {тип}
     - критерий -> значение
     - связь И / ИЛИ внутри группы
+
+    В режиме compact (ctx.criteria_mode) критерии привязываются не к каждому
+    методу и не друг к другу попарно, а через узел группы (его имя —
+    "<id рекомендации>/<id группы>": id групп уникальны только внутри
+    рекомендации):
+    - метод -> имеет группу критериев -> группа (корневая)
+    - группа -> правило выбора -> ALL/ANY/NOT
+    - группа -> критерий {тип} -> критерий
+    - критерий -> значение
+    - группа -> имеет подгруппу критериев -> подгруппа
+    Число строк линейно по числу методов и критериев; попарный вид
+    восстанавливает expand_pairwise().
+
+    Группы обходятся в прямом порядке явным стеком: критерии группы,
+    её связи, затем подгруппы по порядку.
+
+    predicates — таблица тип -> предикаты (по умолчанию из конфига);
+    empty_values=False — строка «значение» только для непустых значений
+    (так считает converter.py).
     """
 
-    def apply(self, ctx: Context) -> List[TripleRow]:
-        triples: List[TripleRow] = []
-        r = ctx.rec
-        mg = r.methods_group
-        methods = [m for sub in mg.subgroups for m in sub.methods]
+    def __init__(self, predicates: Optional[CriterionPredicates] = None, empty_values: bool = True):
+        self.predicates = _CRITERION_PREDS if predicates is None else predicates
+        self.empty_values = empty_values
+
+    def rows(self, ctx: Context) -> Iterator[SPO]:
+        if ctx.criteria_mode == CRITERIA_COMPACT:
+            return self.rows_compact(ctx)
+        return self.rows_pairwise(ctx)
 
-        def walk_group(g: CriteriaGroup, negate_ctx: bool = False):
-            rule = g.rule.upper()
+    def rows_pairwise(self, ctx: Context) -> Iterator[SPO]:
+        root = ctx.rec.methods_group.criteria_group
+        if not root:
+            return
+        methods = ctx.methods
+        preds = self.predicates
+        empty_values = self.empty_values
+        stack = [(root, False)]
+        while stack:
+            g, negate_ctx = stack.pop()
+            rule = (g.rule or "").upper()
             next_negate = negate_ctx or (rule == "NOT")
 
             # критерии
             for c in g.criteria:
-                pred = map_criterion_predicate(c.type, negate=next_negate)
-
+                pred = preds[c.type][next_negate]
+                name = c.name
                 for m in methods:
-                    triples.append(
-                        TripleRow(
-                            subject=m.label,
-                            predicate=pred,
-                            object=c.name,
-                            doc=ctx.doc.id,
-                            page=r.page,
-                            rec_text=r.text,
-                        )
-                    )
-
-                if c.value is not None:
-                    triples.append(
-                        TripleRow(
-                            subject=c.name,
-                            predicate=pred_key("value"),
-                            object=str(c.value),
-                            doc=ctx.doc.id,
-                            page=r.page,
-                            rec_text=r.text,
-                        )
-                    )
+                    yield m, pred, name
+                if c.value is not None and (empty_values or c.value):
+                    yield name, P_VALUE, str(c.value)
 
             # связь И / ИЛИ в пределах группы
             if len(g.criteria) >= 2 and rule in ("ALL", "ANY"):
-                link_pred = pred_key("and") if rule == "ALL" else pred_key("or")
+                link_pred = P_AND if rule == "ALL" else P_OR
                 names = [c.name for c in g.criteria]
                 for i in range(len(names)):
+                    a = names[i]
                     for j in range(i + 1, len(names)):
-                        triples.append(
-                            TripleRow(
-                                subject=names[i],
-                                predicate=link_pred,
-                                object=names[j],
-                                doc=ctx.doc.id,
-                                page=r.page,
-                                rec_text=r.text,
-                            )
-                        )
+                        yield a, link_pred, names[j]
 
             # подгруппы
+            for sg in reversed(g.subgroups):
+                stack.append((sg, next_negate))
+
+    def rows_compact(self, ctx: Context) -> Iterator[SPO]:
+        root = ctx.rec.methods_group.criteria_group
+        if not root:
+            return
+        prefix = f"{ctx.rec.id}/"
+        for m in ctx.methods:
+            yield m, P_CRITERIA_GROUP, prefix + root.id
+
+        # порядок строк — как у попарного обхода: критерии группы, затем подгруппы
+        preds = self.predicates
+        empty_values = self.empty_values
+        stack = [(root, False)]
+        while stack:
+            g, negate_ctx = stack.pop()
+            rule = (g.rule or "").upper()
+            next_negate = negate_ctx or (rule == "NOT")
+            node = prefix + g.id
+            yield node, P_RULE, rule
+            for c in g.criteria:
+                yield node, preds[c.type][next_negate], c.name
+                if c.value is not None and (empty_values or c.value):
+                    yield c.name, P_VALUE, str(c.value)
+            for sg in reversed(g.subgroups):
+                stack.append((sg, next_negate))
             for sg in g.subgroups:
-                walk_group(sg, next_negate)
+                yield node, P_CRITERIA_SUBGROUP, prefix + sg.id
+
+
+def _rows_of(rule) -> Callable[[Context], Iterable[SPO]]:
+    rows = getattr(rule, "rows", None)
+    if rows is not None:
+        return rows
+    # правило только с apply(): doc/page/rec_text его строк берутся из контекста
+    return lambda ctx: ((t.subject, t.predicate, t.object) for t in rule.apply(ctx))
+
+
+def compile_rules(rules: Iterable[Rule]) -> Callable[[Context], Iterator[SPO]]:
+    """
+    Сливает правила в один генератор на рекомендацию: строки всех правил
+    по порядку реестра, без промежуточных списков и TripleRow.
+    """
+    fns = [_rows_of(r) for r in rules]
+
+    def run(ctx: Context) -> Iterator[SPO]:
+        for fn in fns:
+            yield from fn(ctx)
+
+    return run
+
+
+def expand_pairwise(rows: Iterable[TripleRow]) -> Iterator[TripleRow]:
+    """
+    Лениво разворачивает строки режима compact в попарный вид
+    (метод -> критерий, связь И / ИЛИ) — в том же порядке, что выдаёт
+    CriteriaRule в режиме pairwise. Строки других правил проходят как есть.
+    Годится и TripleTable (итерация по ней отдаёт TripleRow).
+    """
+    p_group = P_CRITERIA_GROUP
+    p_sub = P_CRITERIA_SUBGROUP
+    p_rule = P_RULE
+    p_value = P_VALUE
+
+    methods: List[str] = []
+    collecting = False
+    group = None           # текущая группа: (id, правило, последняя строка)
+    names: List[str] = []
+
+    def links() -> Iterator[TripleRow]:
+        if group is None or len(names) < 2 or group[1] not in ("ALL", "ANY"):
+            return
+        gid, rule, last = group
+        pred = P_AND if rule == "ALL" else P_OR
+        for i in range(len(names)):
+            for j in range(i + 1, len(names)):
+                yield TripleRow(names[i], pred, names[j], last.doc, last.page, last.rec_text)
+
+    for t in rows:
+        p = t.predicate
+        if p == p_group:
+            if not collecting:
+                yield from links()
+                group, names, methods, collecting = None, [], [], True
+            methods.append(t.subject)
+            continue
+        collecting = False
+
+        if p == p_rule:
+            yield from links()
+            group, names = (t.subject, t.object, t), []
+            continue
+        if p == p_value:
+            yield t
+            continue
+        if p == p_sub:
+            # связи между критериями группы идут перед её подгруппами
+            yield from links()
+            names = []
+            continue
+        if group is not None and t.subject == group[0]:
+            for m in methods:
+                yield TripleRow(m, p, t.object, t.doc, t.page, t.rec_text)
+            names.append(t.object)
+            group = (group[0], group[1], t)
+            continue
 
-        if mg.criteria_group:
-            walk_group(mg.criteria_group, negate_ctx=False)
+        # строка другого правила / следующей рекомендации
+        yield from links()
+        group, names, methods = None, [], []
+        yield t
 
-        return triples
+    yield from links()
 
 
 # РЕЕСТР ПРАВИЛ – сюда можно добавлять новые правила
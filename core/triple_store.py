@@ -0,0 +1,285 @@
+# core/triple_store.py
+"""
+Постоянное хранилище троек в SQLite.
+
+Строки словарно кодируются: каждая строка (субъект, предикат, объект,
+документ, текст рекомендации) хранится один раз в terms, тройка — строка
+целых чисел. Индексы SPO / POS / OSP (с doc и src в хвосте) покрывают
+поиск по любому шаблону (s, p, o) и фильтры doc / source без чтения строк
+таблицы; фильтры только по doc или только по source идут по своим индексам.
+rowid тройки входит в каждый индекс и служит курсором страниц; строки
+таблицы и словарь читаются только для отдаваемой страницы.
+
+Тройки загружаются под именем источника (файл, граф): повторная загрузка
+источника с replace=True заменяет его строки. Загрузка — одна транзакция
+(удаление старых строк и все пачки по BATCH_ROWS строк): если источник
+строк или запись падают на полпути, в базе остаются прежние строки.
+
+    store = TripleStore("triples.sqlite")
+    store.load_table(generate_triples(doc), source="pn1")
+    rows, cursor = store.query(predicate="рекомендуется", limit=50)
+"""
+import sqlite3
+import threading
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from .triples_table import RowTuple, TripleTable
+from .triples_types import TripleRow
+
+BATCH_ROWS = 50000
+QUERY_LIMIT = 1000   # максимум строк на страницу
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS terms (
+    id INTEGER PRIMARY KEY,
+    value TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS sources (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS triples (
+    id INTEGER PRIMARY KEY,
+    s INTEGER NOT NULL,
+    p INTEGER NOT NULL,
+    o INTEGER NOT NULL,
+    doc INTEGER NOT NULL,
+    page NOT NULL,            -- как пришла: int из core, строка из графа редактора
+    rec INTEGER NOT NULL,
+    src INTEGER NOT NULL
+);
+-- индексы прежних версий: без doc/src, не покрывали фильтры
+DROP INDEX IF EXISTS triples_spo;
+DROP INDEX IF EXISTS triples_pos;
+DROP INDEX IF EXISTS triples_osp;
+DROP INDEX IF EXISTS triples_src;
+CREATE INDEX IF NOT EXISTS triples_spo_ds ON triples (s, p, o, doc, src);
+CREATE INDEX IF NOT EXISTS triples_pos_ds ON triples (p, o, s, doc, src);
+CREATE INDEX IF NOT EXISTS triples_osp_ds ON triples (o, s, p, doc, src);
+CREATE INDEX IF NOT EXISTS triples_doc_s ON triples (doc, src);
+CREATE INDEX IF NOT EXISTS triples_src_d ON triples (src, doc);
+"""
+
+# страница: сначала id по покрывающему индексу, затем строки и словарь только для неё
+SELECT_PAGE = """
+SELECT t.id, ts.value, tp.value, tob.value, td.value, t.page, tr.value
+FROM (SELECT id FROM triples t WHERE {where} ORDER BY id LIMIT ?) page
+JOIN triples t ON t.id = page.id
+JOIN terms ts ON ts.id = t.s
+JOIN terms tp ON tp.id = t.p
+JOIN terms tob ON tob.id = t.o
+JOIN terms td ON td.id = t.doc
+JOIN terms tr ON tr.id = t.rec
+ORDER BY t.id
+"""
+
+
+class TripleStore:
+    """
+    Тройки в файле SQLite (":memory:" — в памяти процесса).
+    Одно соединение на хранилище; вызовы из разных потоков сериализуются.
+    """
+
+    def __init__(self, path: str = ":memory:"):
+        self.path = path
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._lock = threading.Lock()
+        with self._lock:
+            if path != ":memory:":
+                self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript(SCHEMA)
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def __enter__(self) -> "TripleStore":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    # --- словарь ---
+
+    def _term_ids(self, values: Iterable[str], cache: Dict[str, int]) -> None:
+        """Досоздаёт строки values в terms и дописывает их id в cache (внутри транзакции)."""
+        new = [v for v in dict.fromkeys(values) if v not in cache]
+        if not new:
+            return
+        cur = self._conn
+        cur.executemany("INSERT OR IGNORE INTO terms (value) VALUES (?)", ((v,) for v in new))
+        # id читаем пачками по 500 (лимит параметров SQLite)
+        for i in range(0, len(new), 500):
+            part = new[i:i + 500]
+            marks = ",".join("?" * len(part))
+            for tid, value in cur.execute(f"SELECT id, value FROM terms WHERE value IN ({marks})", part):
+                cache[value] = tid
+
+    def _lookup(self, value: str) -> Optional[int]:
+        row = self._conn.execute("SELECT id FROM terms WHERE value = ?", (value,)).fetchone()
+        return row[0] if row else None
+
+    def _source_id(self, source: str, replace: bool) -> int:
+        """id источника (внутри транзакции загрузки); replace — его строки удаляются."""
+        cur = self._conn
+        cur.execute("INSERT OR IGNORE INTO sources (name) VALUES (?)", (source,))
+        sid = cur.execute("SELECT id FROM sources WHERE name = ?", (source,)).fetchone()[0]
+        if replace:
+            cur.execute("DELETE FROM triples WHERE src = ?", (sid,))
+        return sid
+
+    # --- загрузка ---
+
+    def load_rows(self, rows: Iterable[RowTuple], source: str = "", replace: bool = True, batch: int = BATCH_ROWS) -> int:
+        """
+        Строки (subject, predicate, object, doc, page, rec_text) под источником source.
+        Строки читаются пачками по batch (в памяти одна пачка), но вся загрузка —
+        одна транзакция: исключение из rows или записи откатывает и замену
+        источника. Возвращает число строк.
+        """
+        cache: Dict[str, int] = {}
+        it = iter(rows)
+        n = 0
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                src = self._source_id(source, replace)
+                while True:
+                    chunk = list(islice(it, batch))
+                    if not chunk:
+                        break
+                    self._term_ids((v for r in chunk for v in (r[0], r[1], r[2], r[3], r[5])), cache)
+                    self._conn.executemany(
+                        "INSERT INTO triples (s, p, o, doc, page, rec, src) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                        ((cache[s], cache[p], cache[o], cache[d], "" if pg is None else pg, cache[t], src) for s, p, o, d, pg, t in chunk),
+                    )
+                    n += len(chunk)
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return n
+
+    def load_table(self, table: TripleTable, source: str = "", replace: bool = True, batch: int = BATCH_ROWS) -> int:
+        """
+        TripleTable: словарь таблицы и тексты рекомендаций кодируются один раз,
+        строки идут в базу прямо из колонок. Одна транзакция, как в load_rows.
+        """
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                src = self._source_id(source, replace)
+                cache: Dict[str, int] = {}
+                self._term_ids(table.strings, cache)
+                self._term_ids(table.rec_texts, cache)
+                terms = [cache[s] for s in table.strings]
+                texts = [cache[t] for t in table.rec_texts]
+                rows = zip(table.subject, table.predicate, table.object, table.doc, table.page, table.rec)
+                n = 0
+                while True:
+                    chunk = [(terms[s], terms[p], terms[o], terms[d], pg, texts[r], src) for s, p, o, d, pg, r in islice(rows, batch)]
+                    if not chunk:
+                        break
+                    self._conn.executemany(
+                        "INSERT INTO triples (s, p, o, doc, page, rec, src) VALUES (?, ?, ?, ?, ?, ?, ?)", chunk
+                    )
+                    n += len(chunk)
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return n
+
+    def drop_source(self, source: str) -> int:
+        """Удаляет строки источника; возвращает их число."""
+        with self._lock:
+            row = self._conn.execute("SELECT id FROM sources WHERE name = ?", (source,)).fetchone()
+            if row is None:
+                return 0
+            self._conn.execute("BEGIN")
+            n = self._conn.execute("DELETE FROM triples WHERE src = ?", (row[0],)).rowcount
+            self._conn.execute("DELETE FROM sources WHERE id = ?", (row[0],))
+            self._conn.execute("COMMIT")
+            return n
+
+    # --- запросы ---
+
+    def _where(self, subject, predicate, object, doc, source) -> Optional[Tuple[List[str], List[int]]]:
+        """Условия по шаблону; None — какая-то строка шаблона не встречается в базе."""
+        conds: List[str] = []
+        args: List[int] = []
+        for col, value in (("s", subject), ("p", predicate), ("o", object), ("doc", doc)):
+            if value is None:
+                continue
+            tid = self._lookup(value)
+            if tid is None:
+                return None
+            conds.append(f"t.{col} = ?")
+            args.append(tid)
+        if source is not None:
+            row = self._conn.execute("SELECT id FROM sources WHERE name = ?", (source,)).fetchone()
+            if row is None:
+                return None
+            conds.append("t.src = ?")
+            args.append(row[0])
+        return conds, args
+
+    def query(
+        self,
+        subject: Optional[str] = None,
+        predicate: Optional[str] = None,
+        object: Optional[str] = None,
+        doc: Optional[str] = None,
+        source: Optional[str] = None,
+        limit: int = 100,
+        cursor: int = 0,
+    ) -> Tuple[List[TripleRow], Optional[int]]:
+        """
+        Тройки по шаблону (None — любое значение), по возрастанию id,
+        страница из limit строк после курсора cursor.
+        Возвращает (строки, курсор следующей страницы или None).
+        """
+        limit = max(1, min(int(limit), QUERY_LIMIT))
+        with self._lock:
+            where = self._where(subject, predicate, object, doc, source)
+            if where is None:
+                return [], None
+            conds, args = where
+            conds.append("t.id > ?")
+            sql = SELECT_PAGE.format(where=" AND ".join(conds))
+            rows = self._conn.execute(sql, (*args, int(cursor), limit + 1)).fetchall()
+        more = len(rows) > limit
+        rows = rows[:limit]
+        out = [TripleRow(s, p, o, d, pg, t) for _, s, p, o, d, pg, t in rows]
+        return out, (rows[-1][0] if more else None)
+
+    def iter_query(self, subject=None, predicate=None, object=None, doc=None, source=None, page_size: int = QUERY_LIMIT) -> Iterator[TripleRow]:
+        """Все совпадения постранично."""
+        cursor: Optional[int] = 0
+        while cursor is not None:
+            rows, cursor = self.query(subject, predicate, object, doc, source, page_size, cursor)
+            yield from rows
+
+    def count(self, subject=None, predicate=None, object=None, doc=None, source=None) -> int:
+        with self._lock:
+            where = self._where(subject, predicate, object, doc, source)
+            if where is None:
+                return 0
+            conds, args = where
+            sql = "SELECT COUNT(*) FROM triples t" + (f" WHERE {' AND '.join(conds)}" if conds else "")
+            return self._conn.execute(sql, args).fetchone()[0]
+
+    def sources(self) -> List[str]:
+        with self._lock:
+            return [r[0] for r in self._conn.execute("SELECT name FROM sources ORDER BY name")]
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            c = self._conn
+            return {
+                "triples": c.execute("SELECT COUNT(*) FROM triples").fetchone()[0],
+                "terms": c.execute("SELECT COUNT(*) FROM terms").fetchone()[0],
+                "sources": c.execute("SELECT COUNT(*) FROM sources").fetchone()[0],
+            }
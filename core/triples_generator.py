@@ -1,14 +1,26 @@
 # core/triples_generator.py
-from typing import List
+from .engine import ModelFrontend, emit_table
 from .model import GuidelineDocument
-from .triples_types import TripleRow
-from .rules import RULES, Context
+from .triples_table import TripleTable
+from .parallel import generate_triples_parallel
+from .rules import CRITERIA_MODES, CRITERIA_PAIRWISE
 
-def generate_triples(doc: GuidelineDocument) -> List[TripleRow]:
-    triples: List[TripleRow] = []
-    for disease in doc.diseases:
-        for rec in disease.recommendations:
-            ctx = Context(doc=doc, disease=disease, rec=rec)
-            for rule in RULES:
-                triples.extend(rule.apply(ctx))
-    return triples
+def generate_triples(doc: GuidelineDocument, criteria_mode: str = CRITERIA_PAIRWISE, workers: int = 1) -> TripleTable:
+    """
+    Тройки документа в колоночной таблице: строки интернированы,
+    текст каждой рекомендации хранится один раз.
+    Итерация по таблице отдаёт TripleRow.
+
+    criteria_mode: "pairwise" — как раньше (метод x критерий, попарные связи
+    И / ИЛИ); "compact" — критерии через узел группы, см. CriteriaRule.
+    Попарный вид из compact: rules.expand_pairwise(table).
+
+    workers > 1 — рекомендации обрабатываются шардами в пуле процессов
+    (core.parallel); строки и их порядок те же, что при workers=1.
+    """
+    if criteria_mode not in CRITERIA_MODES:
+        raise ValueError(f"unknown criteria_mode: {criteria_mode}")
+    if workers > 1:
+        return generate_triples_parallel(doc, criteria_mode, workers)
+    # правила реестра слиты в один генератор строк на рекомендацию
+    return emit_table(ModelFrontend(criteria_mode).units(doc))
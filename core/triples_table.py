@@ -0,0 +1,176 @@
+# core/triples_table.py
+from array import array
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+from .triples_types import TripleRow
+
+# строка таблицы в «плоском» виде: subject, predicate, object, doc, page, rec_text
+RowTuple = Tuple[str, str, str, str, int, str]
+
+
+class TripleTable:
+    """
+    Колоночное хранилище троек.
+
+    Строки (субъекты, предикаты, объекты, документы) интернируются в общий
+    словарь, колонки — массивы int. Текст рекомендации хранится один раз на
+    рекомендацию: строка таблицы ссылается на него индексом в колонке rec.
+
+    Итерация отдаёт TripleRow, так что таблицу можно передавать туда,
+    где раньше ожидали List[TripleRow].
+    """
+
+    __slots__ = ("strings", "_ids", "rec_texts", "subject", "predicate", "object", "doc", "page", "rec")
+
+    def __init__(self):
+        self.strings: List[str] = []
+        self._ids: Dict[str, int] = {}
+        self.rec_texts: List[str] = []
+        self.subject = array("I")
+        self.predicate = array("I")
+        self.object = array("I")
+        self.doc = array("I")
+        self.page = array("i")
+        self.rec = array("I")
+
+    # --- наполнение ---
+
+    def intern(self, s: str) -> int:
+        i = self._ids.get(s)
+        if i is None:
+            i = len(self.strings)
+            self.strings.append(s)
+            self._ids[s] = i
+        return i
+
+    def add_rec(self, text: str) -> int:
+        """Регистрирует текст рекомендации, возвращает его индекс для append()."""
+        self.rec_texts.append(text)
+        return len(self.rec_texts) - 1
+
+    def append(self, subject: str, predicate: str, object: str, doc: str, page: int, rec: int) -> None:
+        intern = self.intern
+        self.subject.append(intern(subject))
+        self.predicate.append(intern(predicate))
+        self.object.append(intern(object))
+        self.doc.append(intern(doc))
+        self.page.append(int(page))
+        self.rec.append(rec)
+
+    def extend_spo(self, rows: Iterable[Tuple[str, str, str]], doc: str, page: int, rec: int) -> int:
+        """
+        Добавляет строки (subject, predicate, object) с общими doc/page/rec
+        (одна рекомендация): doc интернируется один раз. Возвращает число строк.
+        """
+        intern = self.intern
+        ids = self._ids
+        sub, pred, obj = self.subject.append, self.predicate.append, self.object.append
+        d = intern(doc)
+        page = int(page)
+        n = 0
+        for s, p, o in rows:
+            i = ids.get(s)
+            sub(intern(s) if i is None else i)
+            i = ids.get(p)
+            pred(intern(p) if i is None else i)
+            i = ids.get(o)
+            obj(intern(o) if i is None else i)
+            n += 1
+        self.doc.extend([d] * n)
+        self.page.extend([page] * n)
+        self.rec.extend([rec] * n)
+        return n
+
+    def extend_table(self, other: "TripleTable") -> None:
+        """Дописывает строки другой таблицы (строки переинтернируются, тексты рекомендаций — следом за своими)."""
+        remap = [self.intern(s) for s in other.strings]
+        base = len(self.rec_texts)
+        self.rec_texts.extend(other.rec_texts)
+        self.subject.extend([remap[i] for i in other.subject])
+        self.predicate.extend([remap[i] for i in other.predicate])
+        self.object.extend([remap[i] for i in other.object])
+        self.doc.extend([remap[i] for i in other.doc])
+        self.page.extend(other.page)
+        self.rec.extend([base + r for r in other.rec])
+
+    def append_row(self, row: TripleRow, rec: Optional[int] = None) -> None:
+        """
+        Добавляет TripleRow. Если rec не указан, текст рекомендации
+        сравнивается с последним зарегистрированным и добавляется при отличии.
+        """
+        if rec is None:
+            if not self.rec_texts or self.rec_texts[-1] != row.rec_text:
+                self.add_rec(row.rec_text)
+            rec = len(self.rec_texts) - 1
+        self.append(row.subject, row.predicate, row.object, row.doc, row.page, rec)
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[TripleRow]) -> "TripleTable":
+        table = cls()
+        for row in rows:
+            table.append_row(row)
+        return table
+
+    # --- чтение ---
+
+    def __len__(self) -> int:
+        return len(self.subject)
+
+    def iter_tuples(self, indices: Optional[Iterable[int]] = None) -> Iterator[RowTuple]:
+        """Строки как кортежи без создания TripleRow (для писателей)."""
+        st = self.strings
+        texts = self.rec_texts
+        if indices is None:
+            for s, p, o, d, pg, r in zip(self.subject, self.predicate, self.object, self.doc, self.page, self.rec):
+                yield st[s], st[p], st[o], st[d], pg, texts[r]
+            return
+        for i in indices:
+            yield (
+                st[self.subject[i]], st[self.predicate[i]], st[self.object[i]],
+                st[self.doc[i]], self.page[i], texts[self.rec[i]],
+            )
+
+    def __iter__(self) -> Iterator[TripleRow]:
+        for t in self.iter_tuples():
+            yield TripleRow(*t)
+
+    def row(self, i: int) -> TripleRow:
+        return TripleRow(*next(self.iter_tuples((i,))))
+
+    def to_rows(self) -> List[TripleRow]:
+        return list(self)
+
+    def filter(
+        self,
+        subject: Optional[str] = None,
+        predicate: Optional[str] = None,
+        object: Optional[str] = None,
+        doc: Optional[str] = None,
+        where: Optional[Callable[[RowTuple], bool]] = None,
+    ) -> "TripleTable":
+        """
+        Новая таблица со строками, совпавшими по заданным полям
+        (сравнение по id интернированной строки) и предикату where.
+        """
+        conds = []
+        for col, value in ((self.subject, subject), (self.predicate, predicate), (self.object, object), (self.doc, doc)):
+            if value is None:
+                continue
+            sid = self._ids.get(value)
+            if sid is None:
+                return TripleTable()
+            conds.append((col, sid))
+
+        out = TripleTable()
+        rec_map: Dict[int, int] = {}
+        for i in range(len(self)):
+            if any(col[i] != sid for col, sid in conds):
+                continue
+            if where is not None and not where(next(self.iter_tuples((i,)))):
+                continue
+            r = self.rec[i]
+            nr = rec_map.get(r)
+            if nr is None:
+                nr = rec_map[r] = out.add_rec(self.rec_texts[r])
+            st = self.strings
+            out.append(st[self.subject[i]], st[self.predicate[i]], st[self.object[i]], st[self.doc[i]], self.page[i], nr)
+        return out
@@ -1,128 +1,509 @@
 # core/ttl_generator.py
-from typing import List
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Union
 from .model import *
+from .iri import stable_id
+from .triples_table import TripleTable
+import gzip
+from itertools import chain
 import json
+import re
+import zlib
 from pathlib import Path
 
 CONFIG_DIR = Path(__file__).resolve().parent.parent / "config"
 PROPS = json.loads((CONFIG_DIR / "properties.json").read_text(encoding="utf-8"))
 CLASSES = json.loads((CONFIG_DIR / "classes.json").read_text(encoding="utf-8"))
 
+PREDICATES_VALUE = json.loads((CONFIG_DIR / "predicates.json").read_text(encoding="utf-8"))["value"]
+
 NS = PROPS["ns"]
 P = PROPS["properties"]
 
+# примерный размер куска текста, который отдают потоковые писатели
+TTL_CHUNK_SIZE = 64 * 1024
+
+
+def iter_text_chunks(blocks: Iterable[List[str]], chunk_size: int = TTL_CHUNK_SIZE) -> Iterator[str]:
+    """
+    Склеивает блоки строк в куски текста примерно по chunk_size символов.
+    "".join(результат) == "\n".join(все строки всех блоков).
+    Первый блок (обычно префиксы) отдаётся сразу, не дожидаясь остальных.
+    """
+    buf: List[str] = []
+    size = 0
+    started = False
+    first = True
+    for block in blocks:
+        if block:
+            text = "\n".join(block)
+            if started:
+                buf.append("\n")
+            buf.append(text)
+            size += len(text) + 1
+            started = True
+        if buf and (first or size >= chunk_size):
+            yield "".join(buf)
+            buf = []
+            size = 0
+            first = False
+    if buf:
+        yield "".join(buf)
+
+
+def write_chunks(path: Union[str, Path], chunks: Iterable[str], compress: bool = False) -> None:
+    """
+    Пишет поток кусков в файл по мере поступления (без сборки всей строки).
+    compress=True — gzip (имя файла не меняется, .gz добавляет вызывающий).
+    """
+    opener = gzip.open if compress else open
+    with opener(path, "wt", encoding="utf-8") as f:
+        for chunk in chunks:
+            f.write(chunk)
+
+
 def iri(local: str) -> str:
     return f"ex:{local}"
 
 def lit(s: str) -> str:
-    s = str(s).replace("\\", "\\\\").replace('"', '\\"')
-    return f"\"{s}\"@ru"
+    return f"\"{escape_turtle(str(s))}\"@ru"
 
 
-def disease_to_ttl(d: Disease, doc_id: str) -> List[str]:
-    lines = []
-    lines.append(f"{iri(d.id)} a ex:{PROPS['classes']['Disease']} ;")
-    lines.append(f"    {P['mkb']} \"{d.mkb_code}\" .")
-    lines.append("")
-    return lines
+# ---------------- Модель -> поток утверждений ----------------
+# Онтологический TTL документа (классы/свойства из config/properties.json).
+# Свойства P[...] пишутся как есть (без префикса), числа — лексемами.
 
+ONTOLOGY_PREFIXES = {
+    "ex": "http://example.org/ontology#",
+    "rdf": "http://www.w3.org/1999/02/22-rdf-syntax-ns#",
+    "rdfs": "http://www.w3.org/2000/01/rdf-schema#",
+    "owl": "http://www.w3.org/2002/07/owl#",
+    "xsd": "http://www.w3.org/2001/XMLSchema#",
+}
 
-def recommendation_to_ttl(d: Disease, r: Recommendation, doc_id: str) -> List[str]:
-    lines: List[str] = []
 
+# классы как термы (ex:...)
+C = {k: f"ex:{v}" for k, v in PROPS["classes"].items()}
+C_METHOD_SUBGROUP = "ex:ПодгруппаМетодовЛечения"
+C_CRITERION = "ex:Критерий"
+CRITERION_CLASS = {t: f"ex:{cls}" for t, cls in CLASSES["criterion_type_to_class"].items()}
+
+
+def disease_statements(d: Disease, doc_id: str) -> Iterator[Optional[tuple]]:
+    s = f"ex:{d.id}"
+    yield s, "rdf:type", C["Disease"]
+    yield s, P["mkb"], Literal(d.mkb_code)
+    yield None
+
+
+def recommendation_statements(d: Disease, r: Recommendation, doc_id: str) -> Iterator[Optional[tuple]]:
     # индивид рекомендации
-    lines.append(f"{iri(r.id)} a ex:{PROPS['classes']['Recommendation']} ;")
-    lines.append(f"    {P['source']} {lit(doc_id)} ;")
-    lines.append(f"    {P['appliesTo']} {iri(d.id)} ;")
+    s = f"ex:{r.id}"
+    yield s, "rdf:type", C["Recommendation"]
+    yield s, P["source"], RuLiteral(doc_id)
+    yield s, P["appliesTo"], f"ex:{d.id}"
     if r.udd is not None:
-        lines.append(f"    {P['udd']} {r.udd} ;")
+        yield s, P["udd"], str(r.udd)
     if r.uur is not None:
-        lines.append(f"    {P['uur']} {lit(r.uur)} ;")
-    lines.append(f"    {P['page']} {r.page} ;")
-    lines.append(f"    {P['originalText']} {lit(r.text)} ;")
-    lines.append(
-        f"    {P['hasMethodsGroup']} {iri(r.methods_group.id)} ."
-    )
-    lines.append("")
+        yield s, P["uur"], RuLiteral(r.uur)
+    yield s, P["page"], str(r.page)
+    yield s, P["originalText"], RuLiteral(r.text)
+    yield s, P["hasMethodsGroup"], f"ex:{r.methods_group.id}"
+    yield None
 
     # MethodsGroup
     mg = r.methods_group
-    lines.append(f"{iri(mg.id)} a ex:{PROPS['classes']['MethodsGroup']} ;")
+    s = f"ex:{mg.id}"
+    yield s, "rdf:type", C["MethodsGroup"]
     if mg.criteria_group:
-        lines.append(
-            f"    {P['hasCriteriaGroup']} {iri(mg.criteria_group.id)} ;"
-        )
-    if mg.subgroups:
-        subs = ", ".join(iri(sg.id) for sg in mg.subgroups)
-        lines.append(f"    {P['hasMethodSubgroup']} {subs} .")
-    else:
-        lines[-1] = lines[-1].rstrip(" ;") + " ."
-    lines.append("")
+        yield s, P["hasCriteriaGroup"], f"ex:{mg.criteria_group.id}"
+    p = P["hasMethodSubgroup"]
+    for sg in mg.subgroups:
+        yield s, p, f"ex:{sg.id}"
+    yield None
 
     # Подгруппы и методы
+    p_rule, p_method = P["selectionRule"], P["hasMethod"]
+    c_method = C["Method"]
     for sg in mg.subgroups:
-        lines.append(
-            f"{iri(sg.id)} a ex:ПодгруппаМетодовЛечения ;"
-        )
-        lines.append(
-            f"    {P['selectionRule']} {lit(sg.rule)} ;"
-        )
-        mids = ", ".join(iri(m.id) for m in sg.methods)
-        lines.append(f"    {P['hasMethod']} {mids} .")
-        lines.append("")
+        s = f"ex:{sg.id}"
+        yield s, "rdf:type", C_METHOD_SUBGROUP
+        yield s, p_rule, RuLiteral(sg.rule)
         for m in sg.methods:
-            lines.append(f"{iri(m.id)} a ex:{PROPS['classes']['Method']} ;")
-            lines.append(f"    rdfs:label {lit(m.label)} .")
+            yield s, p_method, f"ex:{m.id}"
+        yield None
+        for m in sg.methods:
+            ms = f"ex:{m.id}"
+            yield ms, "rdf:type", c_method
+            yield ms, "rdfs:label", RuLiteral(m.label)
+            yield None
+
+    # Критерии: группа, её критерии, затем подгруппы (прямой обход)
+    if not mg.criteria_group:
+        return
+    p_crit, p_sub, p_label, p_value = P["hasCriterion"], P["hasCriteriaSubgroup"], P["label"], P["value"]
+    stack = [(mg.criteria_group, C["CriteriaGroup"])]
+    while stack:
+        g, cls = stack.pop()
+        s = f"ex:{g.id}"
+        yield s, "rdf:type", cls
+        yield s, p_rule, RuLiteral(g.rule)
+        for c in g.criteria:
+            yield s, p_crit, f"ex:{c.id}"
+        for sg in g.subgroups:
+            yield s, p_sub, f"ex:{sg.id}"
+        yield None
+
+        for c in g.criteria:
+            cs = f"ex:{c.id}"
+            yield cs, "rdf:type", CRITERION_CLASS.get(c.type, C_CRITERION)
+            yield cs, p_label, RuLiteral(c.name)
+            if c.value is not None:
+                yield cs, p_value, RuLiteral(str(c.value))
+            yield None
+
+        for sg in reversed(g.subgroups):
+            stack.append((sg, C["CriteriaSubgroup"]))
+
+
+def document_statements(doc: GuidelineDocument) -> Iterator[Optional[tuple]]:
+    def parts():
+        for d in doc.diseases:
+            yield disease_statements(d, doc.id)
+            for r in d.recommendations:
+                yield recommendation_statements(d, r, doc.id)
+    return chain.from_iterable(parts())
+
+
+def statement_lines(statements: Iterable) -> List[str]:
+    return [line for block in grouped_lines(statements) for line in block]
+
+
+def disease_to_ttl(d: Disease, doc_id: str) -> List[str]:
+    return statement_lines(disease_statements(d, doc_id))
+
+
+def recommendation_to_ttl(d: Disease, r: Recommendation, doc_id: str) -> List[str]:
+    return statement_lines(recommendation_statements(d, r, doc_id))
+
+
+def iter_document_ttl(doc: GuidelineDocument, chunk_size: int = TTL_CHUNK_SIZE, workers: int = 1) -> Iterator[str]:
+    """
+    TTL документа кусками: в памяти одновременно только строки одной
+    рекомендации, а не весь документ.
+    workers > 1 — шарды рекомендаций в пуле процессов (core.parallel),
+    куски тогда размером с шард; склеенный текст тот же.
+    """
+    if workers > 1:
+        from .parallel import iter_document_ttl_parallel
+        return iter_document_ttl_parallel(doc, workers)
+    return iter_statements_text(document_statements(doc), ONTOLOGY_PREFIXES, "grouped", chunk_size)
+
+
+def document_to_ttl(doc: GuidelineDocument, workers: int = 1) -> str:
+    return "".join(iter_document_ttl(doc, workers=workers))
+
+
+def write_document_ttl(doc: GuidelineDocument, path: Union[str, Path], workers: int = 1) -> None:
+    write_chunks(path, iter_document_ttl(doc, workers=workers))
+
+
+_LOCAL_RE = re.compile(r"\W+")
+
+def pred_local(pred: str) -> str:
+    """'критерий пациент, NOT' -> 'критерий_пациент_NOT' (допустимое локальное имя)."""
+    return _LOCAL_RE.sub("_", pred.replace("ё", "е").replace("Ё", "Е")).strip("_")
+
+
+def iter_table_ttl(table: TripleTable, chunk_size: int = TTL_CHUNK_SIZE) -> Iterator[str]:
+    """
+    Плоский TTL по таблице троек: сущность на каждую интернированную строку
+    (IRI и rdfs:label выдаются один раз), далее по оператору на тройку.
+    Предикат 'значение' пишется литералом.
+    """
+    st = table.strings
+
+    def blocks():
+        yield [
+            '@prefix ex: <http://example.org/ontology#> .',
+            '@prefix rdfs: <http://www.w3.org/2000/01/rdf-schema#> .',
+            "",
+        ]
+
+        ent_iri: dict = {}
+        pred_names = {}
+
+        def ent(doc_i: int, s_i: int, block: List[str]) -> str:
+            key = (doc_i, s_i)
+            v = ent_iri.get(key)
+            if v is None:
+                v = ent_iri[key] = iri(stable_id(st[doc_i], "ent", st[s_i], None, None))
+                block.append(f"{v} rdfs:label {lit(st[s_i])} .")
+            return v
+
+        for s, p, o, d in zip(table.subject, table.predicate, table.object, table.doc):
+            block: List[str] = []
+            pl = pred_names.get(p)
+            if pl is None:
+                pl = pred_names[p] = pred_local(st[p])
+            subj = ent(d, s, block)
+            if st[p] == PREDICATES_VALUE:
+                block.append(f"{subj} ex:{pl} {lit(st[o])} .")
+            else:
+                block.append(f"{subj} ex:{pl} {ent(d, o, block)} .")
+            yield block
+
+    return iter_text_chunks(blocks(), chunk_size)
+
+
+def table_to_ttl(table: TripleTable) -> str:
+    return "".join(iter_table_ttl(table))
+
+
+# ---------------- Statement writers ----------------
+# Поток утверждений: (subject, predicate, object) либо None — граница блока
+# (в плоском Turtle между блоками пустая строка). subject/predicate и
+# IRI-объекты — префиксные имена ("ex:...") или готовые лексемы (числа),
+# литералы — Literal. Это общее представление всех конвертеров (core.engine).
+
+TTL_STYLES = ("turtle", "compact", "ntriples", "grouped")
+
+# сколько строк копится перед тем, как отдать блок дальше
+STATEMENT_BATCH = 512
+
+# длиннее — объекты предиката в compact-стиле идут по одному на строку
+COMPACT_LINE_WIDTH = 100
+
+
+class Literal(str):
+    """
+    Строковый литерал в потоке утверждений (значение — сама строка).
+    Вид задают подклассы: LongLiteral — в тройных кавычках (длинные тексты),
+    RuLiteral — "..."@ru. Подкласс str, чтобы создание стоило как у строки.
+    """
+    __slots__ = ()
+    long = False
+    lang: Optional[str] = None
+
+    @property
+    def value(self) -> str:
+        return str.__str__(self)
+
+
+class LongLiteral(Literal):
+    __slots__ = ()
+    long = True
+
+
+class RuLiteral(Literal):
+    __slots__ = ()
+    lang = "ru"
+
+
+def escape_turtle(s: str) -> str:
+    """Экранирование строки в кавычках Turtle (общее для всех конвертеров)."""
+    return s.replace("\\", "\\\\").replace('"', '\\"')
+
+
+def turtle_term(t) -> str:
+    cls = t.__class__
+    if cls is str:
+        return t
+    s = t.replace("\\", "\\\\").replace('"', '\\"')
+    if cls is RuLiteral:
+        return f'"{s}"@ru'
+    s = f'"""{s}"""' if t.long else f'"{s}"'
+    return f"{s}@{t.lang}" if t.lang else s
+
+
+_NT_IRI_ESCAPES = {c: f"%{ord(c):02X}" for c in ' <>"{}|^`\\'}
+XSD_NS = "http://www.w3.org/2001/XMLSchema#"
+# голые лексемы потока (числа, true/false) -> тип xsd, как их читает Turtle
+_NT_LEXEMES = (
+    (re.compile(r"[+-]?[0-9]+\Z"), "integer"),
+    (re.compile(r"[+-]?[0-9]*\.[0-9]+\Z"), "decimal"),
+    (re.compile(r"[+-]?([0-9]+\.?[0-9]*|\.[0-9]+)[eE][+-]?[0-9]+\Z"), "double"),
+    (re.compile(r"(true|false)\Z"), "boolean"),
+)
+_NT_NAME = re.compile(r"\w+\Z")
+
+
+def ntriples_literal(s: str) -> str:
+    return '"' + s.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n").replace("\r", "\\r") + '"'
+
+
+def ntriples_iri(ns: str, local: str) -> str:
+    return "<" + ns + "".join(_NT_IRI_ESCAPES.get(c, c) for c in local) + ">"
+
+
+def ntriples_term(t, prefixes: Dict[str, str]) -> str:
+    """
+    Терм потока -> N-Triples. Префиксное имя — полный IRI; числа и true/false —
+    литералы xsd; голое имя (свойства P[...] модели) — IRI в пространстве NS;
+    прочие лексемы — строковые литералы.
+    """
+    if isinstance(t, Literal):
+        s = ntriples_literal(t)
+        return f"{s}@{t.lang}" if t.lang else s
+    pfx, sep, local = t.partition(":")
+    if sep and pfx in prefixes:
+        return ntriples_iri(prefixes[pfx], local)
+    for rx, xsd_type in _NT_LEXEMES:
+        if rx.match(t):
+            return f"{ntriples_literal(t)}^^<{XSD_NS}{xsd_type}>"
+    if _NT_NAME.match(t):
+        return ntriples_iri(NS, t)
+    return ntriples_literal(t)
+
+
+def prefix_lines(prefixes: Dict[str, str]) -> List[str]:
+    return [f"@prefix {p}: <{ns}> ." for p, ns in prefixes.items()] + [""]
+
+
+def flat_blocks(statements: Iterable, prefixes: Dict[str, str]) -> Iterator[List[str]]:
+    """Одно утверждение — одна строка `s p o .`."""
+    yield prefix_lines(prefixes)
+    lines: List[str] = []
+    for st in statements:
+        if st is None:
             lines.append("")
+            yield lines
+            lines = []
+            continue
+        s, p, o = st
+        lines.append(f"{s} {p} {turtle_term(o)} .")
+        if len(lines) >= STATEMENT_BATCH:
+            yield lines
+            lines = []
+    yield lines
+
 
-    # Criteria
-    def emit_group(g: CriteriaGroup, root: bool):
-        cls = PROPS["classes"]["CriteriaGroup"] if root else PROPS["classes"]["CriteriaSubgroup"]
-        lines.append(f"{iri(g.id)} a ex:{cls} ;")
-        lines.append(f"    {P['selectionRule']} {lit(g.rule)} ;")
+def subject_lines(s: str, preds: Sequence, width: Optional[int] = None) -> List[str]:
+    """
+    Одно предложение Turtle: `s p1 o1, o2 ;` / `    p2 o3 .`.
+    preds — пары (предикат, объекты); rdf:type пишется как `a`.
+    width — объекты длиннее этого переносятся по одному на строку.
+    """
+    lines = []
+    head = f"{s} "
+    for p, objs in preds:
+        if p == "rdf:type":
+            p = "a"
+        objs_text = ", ".join(objs)
+        if width is not None and len(objs) > 1 and len(objs_text) > width:
+            objs_text = ",\n        ".join(objs)
+        lines.append(f"{head}{p} {objs_text} ;")
+        head = "    "
+    lines[-1] = lines[-1][:-2] + " ."
+    return lines
 
-        if g.criteria:
-            cids = ", ".join(iri(c.id) for c in g.criteria)
-            lines.append(f"    {P['hasCriterion']} {cids} ;")
 
-        if g.subgroups:
-            sids = ", ".join(iri(sg.id) for sg in g.subgroups)
-            lines.append(f"    {P['hasCriteriaSubgroup']} {sids} .")
-        else:
-            lines[-1] = lines[-1].rstrip(" ;") + " ."
+def compact_blocks(statements: Iterable, prefixes: Dict[str, str]) -> Iterator[List[str]]:
+    """
+    Turtle с группировкой: все предикаты субъекта через `;`,
+    все объекты предиката через `,`. Повторы (s, p, o) схлопываются.
+    Субъекты и предикаты идут в порядке первого появления.
+    """
+    yield prefix_lines(prefixes)
+    by_subject: Dict[str, Dict[str, Dict[str, None]]] = {}
+    for st in statements:
+        if st is None:
+            continue
+        s, p, o = st
+        objs = by_subject.setdefault(s, {}).setdefault(p, {})
+        objs[turtle_term(o)] = None
+
+    for s, preds in by_subject.items():
+        lines = subject_lines(s, [(p, list(objs)) for p, objs in preds.items()], COMPACT_LINE_WIDTH)
         lines.append("")
+        yield lines
 
-        # сами критерии
-        for c in g.criteria:
-            cls_name = CLASSES["criterion_type_to_class"].get(c.type, "Критерий")
-            lines.append(f"{iri(c.id)} a ex:{cls_name} ;")
-            lines.append(f"    {P['label']} {lit(c.name)} ;")
-            if c.value is not None:
-                lines.append(f"    {P['value']} {lit(c.value)} .")
-            else:
-                lines[-1] = lines[-1].rstrip(" ;") + " ."
+
+def grouped_lines(statements: Iterable) -> Iterator[List[str]]:
+    """
+    Turtle по блокам без префиксов: подряд идущие утверждения одного субъекта —
+    одно предложение через `;`, подряд идущие объекты одного предиката — через `,`.
+    После блока (None) — пустая строка. В отличие от compact, в памяти только
+    текущие блоки (не больше STATEMENT_BATCH строк) и повторы не схлопываются.
+    """
+    lines: List[str] = []
+    subj = pred = None
+    cur = ""            # незакрытая строка текущего предложения
+    for st in statements:
+        if st is None:
+            if subj is not None:
+                lines.append(cur + " .")
+                subj = pred = None
             lines.append("")
+            if len(lines) >= STATEMENT_BATCH:
+                yield lines
+                lines = []
+            continue
+        s, p, o = st
+        if o.__class__ is not str:
+            o = turtle_term(o)
+        if s == subj:
+            if p == pred:
+                cur += ", " + o
+                continue
+            lines.append(cur + " ;")
+            cur = f"    {'a' if p == 'rdf:type' else p} {o}"
+        else:
+            if subj is not None:
+                lines.append(cur + " .")
+            cur = f"{s} {'a' if p == 'rdf:type' else p} {o}"
+            subj = s
+        pred = p
+    if subj is not None:
+        lines.append(cur + " .")
+    if lines:
+        yield lines
 
-        for sg in g.subgroups:
-            emit_group(sg, root=False)
 
-    if mg.criteria_group:
-        emit_group(mg.criteria_group, root=True)
+def grouped_blocks(statements: Iterable, prefixes: Dict[str, str]) -> Iterator[List[str]]:
+    """Префиксы, затем grouped_lines: один блок потока — один абзац Turtle."""
+    yield prefix_lines(prefixes)
+    yield from grouped_lines(statements)
 
-    return lines
+
+def ntriples_blocks(statements: Iterable, prefixes: Dict[str, str]) -> Iterator[List[str]]:
+    """N-Triples: полные IRI, без префиксов и пустых строк."""
+    lines: List[str] = []
+    for st in statements:
+        if st is None:
+            yield lines
+            lines = []
+            continue
+        s, p, o = st
+        lines.append(f"{ntriples_term(s, prefixes)} {ntriples_term(p, prefixes)} {ntriples_term(o, prefixes)} .")
+        if len(lines) >= STATEMENT_BATCH:
+            yield lines
+            lines = []
+    lines.append("")
+    yield lines
+
+
+STYLE_WRITERS = {
+    "turtle": flat_blocks,
+    "compact": compact_blocks,
+    "ntriples": ntriples_blocks,
+    "grouped": grouped_blocks,
+}
+
+
+def iter_statements_text(
+    statements: Iterable,
+    prefixes: Dict[str, str],
+    style: str = "turtle",
+    chunk_size: int = TTL_CHUNK_SIZE,
+) -> Iterator[str]:
+    return iter_text_chunks(STYLE_WRITERS[style](statements, prefixes), chunk_size)
 
 
-def document_to_ttl(doc: GuidelineDocument) -> str:
-    lines = [
-        '@prefix ex: <http://example.org/ontology#> .',
-        '@prefix rdf: <http://www.w3.org/1999/02/22-rdf-syntax-ns#> .',
-        '@prefix rdfs: <http://www.w3.org/2000/01/rdf-schema#> .',
-        '@prefix owl: <http://www.w3.org/2002/07/owl#> .',
-        '@prefix xsd: <http://www.w3.org/2001/XMLSchema#> .',
-        ""
-    ]
-    for d in doc.diseases:
-        lines.extend(disease_to_ttl(d, doc.id))
-        for r in d.recommendations:
-            lines.extend(recommendation_to_ttl(d, r, doc.id))
-    return "\n".join(lines)
+def gzip_chunks(chunks: Iterable[str], level: int = 6) -> Iterator[bytes]:
+    """Потоковое gzip-сжатие кусков текста (utf-8)."""
+    comp = zlib.compressobj(level, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = comp.compress(chunk.encode("utf-8"))
+        if data:
+            yield data
+    yield comp.flush()
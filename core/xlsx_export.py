@@ -1,17 +1,102 @@
-# core/xlsx_export.py
-from typing import List
+from typing import Any, Dict, Iterable, Optional, Sequence, Union, IO
 from openpyxl import Workbook
-from .triples_types import TripleRow
+from .triples_table import TripleTable
 
-def export_triples_to_xlsx(triples: List[TripleRow], path: str) -> None:
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "Triples"
+TRIPLES_HEADER = ["subject", "predicate", "object", "doc", "page", "rec_text"]
+TEXTS_HEADER = ["key", "rec_text"]
 
-    # заголовки
-    ws.append(["subject", "predicate", "object", "doc", "page", "rec_text"])
 
-    for t in triples:
-        ws.append([t.subject, t.predicate, t.object, t.doc, t.page, t.rec_text])
+def write_xlsx_rows(
+    target: Union[str, IO[bytes]],
+    header: Sequence[str],
+    rows: Iterable[Sequence[Any]],
+    title: str = "Triples",
+    extra_sheets: Optional[Dict[str, Iterable[Sequence[Any]]]] = None,
+) -> None:
+    """
+    Потоковая запись строк в XLSX (write-only режим openpyxl):
+    строки сразу уходят во временный файл листа, память не растёт с их числом.
+    target — путь или бинарный file-like объект.
+    extra_sheets — доп. листы {название: строки}, пишутся после основного.
+    """
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet(title)
+    ws.append(list(header))
+    for row in rows:
+        ws.append(list(row))
 
-    wb.save(path)
+    for name, sheet_rows in (extra_sheets or {}).items():
+        extra = wb.create_sheet(name)
+        for row in sheet_rows:
+            extra.append(list(row))
+
+    wb.save(target)
+
+
+def export_triples_to_xlsx(
+    triples: Iterable[Any],
+    path: Union[str, IO[bytes]],
+    texts_sheet: bool = False,
+    doc: str = "",
+    page: Any = "",
+    rec_text: str = "",
+) -> None:
+    """
+    Экспорт троек (TripleRow или любые объекты с subject/predicate/object,
+    например api.main.Triple) — принимает любой итератор, не только список.
+    У объектов без doc/page/rec_text берутся значения по умолчанию из аргументов.
+
+    texts_sheet=True: текст рекомендации пишется один раз на лист "Texts",
+    а в колонке rec_text остаётся ключ вида T1, T2, ...
+
+    TripleTable читается напрямую по колонкам, без создания TripleRow.
+    """
+    if isinstance(triples, TripleTable):
+        _export_table(triples, path, texts_sheet)
+        return
+
+    text_keys: Dict[str, str] = {}
+
+    def rows():
+        for t in triples:
+            text = getattr(t, "rec_text", rec_text)
+            if texts_sheet:
+                key = text_keys.get(text)
+                if key is None:
+                    key = f"T{len(text_keys) + 1}"
+                    text_keys[text] = key
+                text = key
+            yield (
+                t.subject,
+                t.predicate,
+                t.object,
+                getattr(t, "doc", doc),
+                getattr(t, "page", page),
+                text,
+            )
+
+    extra = None
+    if texts_sheet:
+        # генератор читает text_keys уже после того, как основной лист записан
+        def texts():
+            yield TEXTS_HEADER
+            for text, key in text_keys.items():
+                yield (key, text)
+        extra = {"Texts": texts()}
+
+    write_xlsx_rows(path, TRIPLES_HEADER, rows(), extra_sheets=extra)
+
+
+def _export_table(table: TripleTable, path: Union[str, IO[bytes]], texts_sheet: bool) -> None:
+    if not texts_sheet:
+        write_xlsx_rows(path, TRIPLES_HEADER, table.iter_tuples())
+        return
+
+    # тексты в таблице уже хранятся по одному на рекомендацию: ключ = T{индекс+1}
+    st = table.strings
+    rows = (
+        (st[s], st[p], st[o], st[d], pg, f"T{r + 1}")
+        for s, p, o, d, pg, r in zip(table.subject, table.predicate, table.object, table.doc, table.page, table.rec)
+    )
+    texts = [TEXTS_HEADER] + [(f"T{i + 1}", text) for i, text in enumerate(table.rec_texts)]
+    write_xlsx_rows(path, TRIPLES_HEADER, rows, extra_sheets={"Texts": texts})
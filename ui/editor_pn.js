@@ -1384,6 +1384,76 @@ async function backendToTriples(graph) {
   return await resp.json();
 }
 
+// ======= инкрементальная сессия: на backend уходят только правки =======
+let triplesSession = null; // { id, doc, nodes: Map, links: Map, triples: Map }
+
+function sessionNodeSig(n) {
+  // координаты/размеры на тройки не влияют — в дельту не попадают
+  return JSON.stringify([n.label || "", n.value ?? null, n.note ?? null, n.type || ""]);
+}
+function sessionLinkKey(l) { return `${l.source}\u0000${l.target}`; }
+function sessionTripleKey(t) { return `${t.subject}\u0000${t.predicate}\u0000${t.object}`; }
+
+function sessionSnapshot(graph) {
+  return {
+    doc: JSON.stringify(graph.doc || {}),
+    nodes: new Map(graph.nodes.map(n => [n.id, { node: n, sig: sessionNodeSig(n) }])),
+    links: new Map(graph.links.map(l => [sessionLinkKey(l), l]))
+  };
+}
+
+async function backendSessionOpen(graph) {
+  const resp = await fetch(`${API_BASE}/api/graph/session`, {
+    method: "POST",
+    headers: { "Content-Type": "application/json" },
+    body: JSON.stringify(graph)
+  });
+  if (!resp.ok) throw new Error("Ошибка backend при открытии сессии");
+  const data = await resp.json();
+  triplesSession = {
+    id: data.session_id,
+    ...sessionSnapshot(graph),
+    triples: new Map(data.triples.map(t => [sessionTripleKey(t), t]))
+  };
+  return data.triples;
+}
+
+// Тройки текущего графа: первый вызов открывает сессию, дальше отправляем дельту.
+async function backendSessionTriples(graph) {
+  const snap = sessionSnapshot(graph);
+  if (!triplesSession || triplesSession.doc !== snap.doc) {
+    return await backendSessionOpen(graph);
+  }
+
+  const delta = { add_nodes: [], update_nodes: [], remove_nodes: [], add_links: [], remove_links: [] };
+  snap.nodes.forEach((v, id) => {
+    const old = triplesSession.nodes.get(id);
+    if (!old) delta.add_nodes.push(v.node);
+    else if (old.sig !== v.sig) delta.update_nodes.push(v.node);
+  });
+  triplesSession.nodes.forEach((_, id) => { if (!snap.nodes.has(id)) delta.remove_nodes.push(id); });
+  snap.links.forEach((l, key) => {
+    const old = triplesSession.links.get(key);
+    if (!old || (old.predicate || "") !== (l.predicate || "")) delta.add_links.push(l);
+  });
+  triplesSession.links.forEach((l, key) => { if (!snap.links.has(key)) delta.remove_links.push(l); });
+
+  const resp = await fetch(`${API_BASE}/api/graph/session/${triplesSession.id}/delta`, {
+    method: "POST",
+    headers: { "Content-Type": "application/json" },
+    body: JSON.stringify(delta)
+  });
+  if (resp.status === 404) return await backendSessionOpen(graph); // сессия вытеснена на сервере
+  if (!resp.ok) throw new Error("Ошибка backend при обновлении троек");
+  const data = await resp.json();
+
+  data.removed.forEach(t => triplesSession.triples.delete(sessionTripleKey(t)));
+  data.added.forEach(t => triplesSession.triples.set(sessionTripleKey(t), t));
+  triplesSession.nodes = snap.nodes;
+  triplesSession.links = snap.links;
+  return Array.from(triplesSession.triples.values());
+}
+
 
 
 
@@ -2028,7 +2098,7 @@ function normalizeToGraphOnly(payload) {
       const graph = normalizeToGraphOnly(lastPayload);
 
       const ttl = await backendToTTL(graph);         // уже есть у тебя :contentReference[oaicite:2]{index=2}
-      const triples = await backendToTriples(graph); // уже есть у тебя :contentReference[oaicite:3]{index=3}
+      const triples = await backendSessionTriples(graph); // повторная конвертация шлёт только правки
 
       downloadFile("recommendation.ttl", ttl, "text/turtle;charset=utf-8");
       downloadFile("triples.json", JSON.stringify({ graph, triples }, null, 2), "application/json;charset=utf-8");